@@ -9,9 +9,9 @@
 import stackless as ss
 
 import sys, os.path, os, imp, logging
-from heapq import heappush
 
-from sim_events import ComparableEvent, SignalEvent, DelayEvent
+from sim_events import ComparableEvent, DelayEvent, Driver, driverKey
+from std        import decode
                 
 #------------------------------------------------------------------------------
 #
@@ -20,11 +20,13 @@ from sim_events import ComparableEvent, SignalEvent, DelayEvent
 def waitFor(t=sys.maxint):
     
     # If called as 'waitFor()', then will essentially wait for ever (sys.maxint)
+    # t is in ns
     
-    # Put DelayEvent on queue
+    # Schedule DelayEvent
     task    = ss.getcurrent()
     process = task.proc
-    heappush(process.sim.queue, DelayEvent(process, t))
+    sim     = process.sim
+    sim.schedule(DelayEvent(process, sim.nsToTicks(t)))
             
     # Here process that called wait.. suspends
     task.proc.channel.receive()
@@ -242,7 +244,7 @@ class Process:
     
     __slots__ = ('sim', 'key', 'name', 'id', 'module', 'initialize', 'setup',
                  'run_start', 'run_step', 'run_loop', 'scheduleAssignment',
-                 'vm_name', 'task', 'channel', 'wakeups','__getstate__','__setstate__' 
+                 'vm_name', 'task', 'channel', 'wakeups', 'drivers', '__getstate__','__setstate__' 
                  )
 
     def __init__(self):       
@@ -287,6 +289,7 @@ class Process:
         self.task.proc = self        
         self.channel   = ss.channel()
         self.wakeups = []
+        self.drivers = {}           # signal -> Driver, see driverKey
             
     #----
         
@@ -305,9 +308,20 @@ class Process:
         # target  = aSignal
         # operand = aValue
         # delay   = aTime in ns        
-        # reject & inertial are ignored for now
+        # reject  = pulse rejection limit in ns
         
-        heappush(self.queue, SignalEvent(self, target, operand, float(delay)))
+        sim = self.sim
+        
+        key = driverKey(target)
+        try:
+            driver = self.drivers[key]
+        except KeyError:
+            driver = self.drivers[key] = Driver(sim, key)
+        
+        if reject != None:
+            reject = sim.nsToTicks(reject)
+            
+        driver.assign(operand, sim.nsToTicks(delay), reject, inertial, target)
             
 #----
 
@@ -325,8 +339,7 @@ class Process:
         
         while True:
             self.waitOn(sig)
-            # Yes, this is correct
-            if '%s' % sig == '0':
+            if '%s' % sig == '1':
                 break                             
 
     #----
@@ -335,8 +348,7 @@ class Process:
         
         while True:
             self.waitOn(sig)
-            # Yes, this is correct
-            if '%s' % sig == '1':
+            if '%s' % sig == '0':
                 break                             
     #----
      
@@ -383,10 +395,10 @@ class ClockProcess(ComparableEvent):
         self.inst    = CPinstance(signal)
         self.priority = 1
 
-        # Simulation stuff
+        # Simulation stuff, t_high & t_low are in ns
         self.signal  = signal
-        self.t_high  = t_high
-        self.t_low   = t_low
+        self.t_high  = sim.nsToTicks(t_high)
+        self.t_low   = sim.nsToTicks(t_low)
         self.time    = self.t_high
         
         self.channel = CPchannel()
@@ -398,12 +410,13 @@ class ClockProcess(ComparableEvent):
         
     def run_start(self, sim=None):
         
-        # Start high
+        # Start high, the first event keeps it high for t_high
         self.signal._val = 3
+        self.enc_val     = 3
         self.time        = self.t_high 
         self.wakeups     = []
         
-        heappush(self.queue, self)
+        self.queue.push(self)
        
     #----
     # This method is called when an instance of this class is popped from the
@@ -411,9 +424,11 @@ class ClockProcess(ComparableEvent):
      
     def operate(self, cycle):
         
-        sig      = self.signal
-        sig.last = sig.current
+        sig = self.signal
+        sig.last_val  = sig._val
+        sig.evt_time  = self.time
         sig.evt_cycle = cycle
+        sig._val      = self.enc_val
             
         # Process transitions for VDC file
         if sig.vcd_mgr:
@@ -421,20 +436,17 @@ class ClockProcess(ComparableEvent):
             for node in sig.vcd_nodes:
                 sig.vcd_mgr.VCD_transition(sig, node, self.time)
         
-        # Schedule next event. This is now compatible with JumpNotRising
-        old_time = self.time
-        if sig._val == 3:            
-            sig._val = 2
-            sig.current = ('1', self.time)
+        # Schedule next event. This is compatible with JumpNotRising
+        if self.enc_val == 3:            
+            self.enc_val = 2
             self.time += self.t_high
             
         else:
-            sig._val = 3
-            sig.current = ('0', self.time)
+            self.enc_val = 3
             self.time += self.t_low
             
         # Self is put on event queue like a SignalEvent
-        heappush(self.queue, self)
+        self.queue.push(self)
         
         # Return a list of VMs
         return sig.waiting
@@ -442,7 +454,7 @@ class ClockProcess(ComparableEvent):
     #----
     
     def __str__(self):
-        return 'ClockProcess event: %s <= %s at %.2f' % (self.signal.name, self.signal.current, self.time)
+        return 'ClockProcess event: %s <= %s at %d' % (self.signal.name, decode[self.enc_val], self.time)
         
     #----
             
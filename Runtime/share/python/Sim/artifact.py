@@ -0,0 +1,429 @@
+#------------------------------------------------------------------------------
+#
+#   artifact.py - 10/18/26
+#
+#   design.ser, written by Serializer.save & loaded by Serializer.load. The
+#   file is memory mapped read-only, simulations of the same design share
+#   its pages, and each part is decoded when it is first used:
+#
+#    signal table - one column per field, indexed by sid: kind, direction,
+#                   low index, width & offset of the initial value, offset
+#                   of the name & spec. The initial values are laid out like
+#                   ValueStore.data, the store is one copy of them. A signal
+#                   object is only created when its sid is used (SignalTable)
+#
+#    code         - a record per code object, processes that share code
+#                   (see ProcessBuilder.share) share the record. The code
+#                   object is marshalled, the constants marshal can't write
+#                   (StdLogic literals, library functions) are pickled apart
+#
+#    processes    - a record per process, loaded by BytecodeProcess.run_start
+#
+#    settings     - marshalled: resolution, tiering threshold, sensitivity
+#                   lists, Python testbench modules & library functions
+#
+#    hierarchy    - the pickled DesignHierarchy, only loaded for a VCD file
+#
+#   Layout, little endian: header, a table of (offset, size) of the sections
+#   in the order of the sections list, the sections. Columns & record indexes
+#   start at a multiple of 4.
+#
+#------------------------------------------------------------------------------
+
+import struct, marshal, mmap, types
+import cPickle as pickle
+from pickle    import Pickler
+from cStringIO import StringIO
+from array     import array
+
+from std import StdLogic, StdLogicVector
+import codegen
+
+magic   = 'PYVHDLSA'
+version = 1
+
+header  = '<8sIIII'        # magic, version, signals, code records, processes
+
+# Signal kinds
+SCALAR = 0
+VECTOR = 1
+
+# Columns of the signal table & record indexes, name & array type code
+columns = [('kind', 'B'), ('dir', 'b'), ('low', 'i'), ('width', 'I'), ('offset', 'I'),
+           ('meta_index', 'I'), ('code_index', 'I'), ('proc_index', 'I')]
+
+sections = [name for name, code in columns] + ['values', 'meta', 'code', 'proc',
+                                               'settings', 'hierarchy']
+
+#------------------------------------------------------------------------------
+#
+# Write the Serializer serial to path
+
+def save(path, serial):
+
+    data = {}
+
+    # Signal table
+    for name, code in columns:
+        data[name] = array(code)
+
+    values = array('B')
+    meta   = []
+
+    for sid, sig in enumerate(serial.signals):
+
+        if sig.sid != sid:
+            raise ValueError('Signal %s has sid %d, expected %d' % (sig.name, sig.sid, sid))
+
+        if isinstance(sig, StdLogicVector):
+            kind, direction, low = VECTOR, sig._dir, sig._min
+        elif isinstance(sig, StdLogic):
+            kind, direction, low = SCALAR, 0, 0
+        else:
+            raise ValueError('Signal %s is a %s' % (sig.name, sig.__class__.__name__))
+
+        val = sig.getVal()
+
+        data['kind'].append(kind)
+        data['dir'].append(direction)
+        data['low'].append(low)
+        data['width'].append(len(val))
+        data['offset'].append(len(values))
+
+        values.extend(val)
+        meta.append(marshal.dumps((sig.name, sig.spec, sig.is_variable)))
+
+    data['values'] = values.tostring()
+    data['meta_index'], data['meta'] = records(meta)
+
+    # Code & process records
+    codes     = []
+    code_ids  = {}          # id of the shared function or source -> record
+    processes = []
+
+    for pid, proc in enumerate(serial.processes):
+
+        if proc.pid != pid:
+            raise ValueError('Process %s has pid %d, expected %d' % (proc.name, proc.pid, pid))
+
+        if proc.source != None:
+            shared = proc.source
+        else:
+            shared = proc.bytecode_vm
+
+        try:
+            index = code_ids[id(shared)]
+        except KeyError:
+            index = code_ids[id(shared)] = len(codes)
+            codes.append(dumpFunction(proc.bytecode_vm, proc.source))
+
+        state = dumpState((proc.variables, proc.text_bc))
+        processes.append(marshal.dumps((proc.name, proc.key, index, proc.sid_table, state)))
+
+    data['code_index'], data['code'] = records(codes)
+    data['proc_index'], data['proc'] = records(processes)
+
+    settings = {}
+    settings['resolution']    = serial.resolution
+    settings['hot_threshold'] = serial.hot_threshold
+    settings['sensitivity']   = serial.sensitivity
+    settings['modules']       = serial.modules
+    settings['functions']     = serial.functions
+
+    data['settings']  = marshal.dumps(settings)
+    data['hierarchy'] = pickle.dumps(serial.hierarchy, 2)
+
+    # Section offsets, after the header & the section table
+    pos   = struct.calcsize(header) + 8 * len(sections)
+    table = []
+    for name in sections:
+        if isinstance(data[name], array):
+            data[name] = littleEndian(data[name])
+        pos += -pos % 4
+        table.append((pos, len(data[name])))
+        pos += len(data[name])
+
+    ser_file = open(path, 'wb')
+    ser_file.write(struct.pack(header, magic, version, len(serial.signals), len(codes),
+                               len(processes)))
+    for offset, size in table:
+        ser_file.write(struct.pack('<II', offset, size))
+
+    pos = struct.calcsize(header) + 8 * len(sections)
+    for name, (offset, size) in zip(sections, table):
+        ser_file.write('\0' * (offset - pos))
+        ser_file.write(data[name])
+        pos = offset + size
+
+    ser_file.close()
+
+#----
+#
+# Index & data of a list of records, the index has the start of each record
+# and the end of the last
+
+def records(blobs):
+
+    index = array('I', [0])
+    for blob in blobs:
+        index.append(index[-1] + len(blob))
+
+    return index, ''.join(blobs)
+
+#----
+
+def littleEndian(values):
+
+    if struct.pack('=H', 1) != struct.pack('<H', 1):
+        values = array(values.typecode, values)
+        values.byteswap()
+
+    return values.tostring()
+
+#----
+#
+# The code record of a process function f, source is the (file name, source,
+# consts) of a codegen process. The code is marshalled without the constants
+# that marshal can't write. Also used for the results of build jobs (see
+# SimBuilder.buildJobs)
+
+def dumpFunction(f, source=None):
+
+    if source != None:
+        file_name = source[0]
+    else:
+        file_name = None
+
+    # A codegen process from the object store is only its source
+    if f == None:
+        file_name, text, consts = source
+        f = types.FunctionType(codegen.sourceCode(text, file_name), {}, 'vm_process', (consts,))
+
+    code   = f.func_code
+    consts = list(code.co_consts)
+    extra  = []
+    for i, const in enumerate(consts):
+        try:
+            marshal.dumps(const)
+        except ValueError:
+            extra.append((i, const))
+            consts[i] = None
+
+    # The code is rebuilt with its names interned, marshal writes interned
+    # strings apart & the names of a function loaded from the object store
+    # aren't interned. The record doesn't depend on where the code came from
+    code  = replaceConsts(code, consts)
+    state = dumpState((extra, f.func_defaults))
+    return marshal.dumps((intern(f.func_name), file_name, code, state))
+
+#----
+#
+# The function of a code record with globals g, & the file name of its
+# source, None for bytecode
+
+def loadFunction(record, g):
+
+    name, file_name, code, state = marshal.loads(record)
+    extra, defaults = pickle.loads(state)
+
+    if extra:
+        consts = list(code.co_consts)
+        for i, const in extra:
+            consts[i] = const
+        code = replaceConsts(code, consts)
+
+    return types.FunctionType(code, g, name, defaults), file_name
+
+#----
+#
+# Pickle of the state of a record. cPickle doesn't memoize an object that
+# only it refers to, its output depends on reference counts, the Python
+# pickler memoizes every object
+
+def dumpState(state):
+
+    f = StringIO()
+    Pickler(f, 2).dump(state)
+    return f.getvalue()
+
+#----
+
+def replaceConsts(code, consts):
+
+    return types.CodeType(code.co_argcount, code.co_nlocals, code.co_stacksize,
+                          code.co_flags, code.co_code, tuple(consts), code.co_names,
+                          code.co_varnames, code.co_filename, intern(code.co_name),
+                          code.co_firstlineno, code.co_lnotab, code.co_freevars,
+                          code.co_cellvars)
+
+#------------------------------------------------------------------------------
+#
+# A design.ser opened for reading
+
+class Reader(object):
+
+    def __init__(self, path):
+
+        ser_file = open(path, 'rb')
+        try:
+            self.mm = mmap.mmap(ser_file.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            ser_file.close()
+
+        tag, ver, n_signals, n_codes, n_processes = struct.unpack_from(header, self.mm)
+        if tag != magic:
+            raise ValueError('%s is not a simulation artifact' % path)
+        if ver != version:
+            raise ValueError('%s version %d, expected %d' % (path, ver, version))
+
+        self.n_signals   = n_signals
+        self.n_processes = n_processes
+
+        pos = struct.calcsize(header)
+        self.sections = {}
+        for name in sections:
+            self.sections[name] = struct.unpack_from('<II', self.mm, pos)
+            pos += 8
+
+        for name, code in columns:
+            offset, size = self.sections[name]
+            setattr(self, name, Column(self.mm, offset, code, size // struct.calcsize(code)))
+
+        self.functions = [None] * n_codes       # code record -> (function, file name)
+
+    #----
+
+    def section(self, name):
+        offset, size = self.sections[name]
+        return self.mm[offset:offset + size]
+
+    #----
+    #
+    # Record i of the records of section name
+
+    def record(self, name, index, i):
+
+        offset = self.sections[name][0]
+        return self.mm[offset + index[i]:offset + index[i + 1]]
+
+    #----
+
+    def settings(self):
+        return marshal.loads(self.section('settings'))
+
+    #----
+
+    def hierarchy(self):
+        return pickle.loads(self.section('hierarchy'))
+
+    #----
+    #
+    # Signal sid, attached to its value in the ValueStore store (a copy of
+    # the values section)
+
+    def signal(self, sid, store):
+
+        name, spec, is_variable = marshal.loads(self.record('meta', self.meta_index, sid))
+        buf    = store.data
+        offset = self.offset[sid]
+        width  = self.width[sid]
+
+        state = {'name' : name, 'spec' : spec, 'sid' : sid, 'is_variable' : is_variable}
+
+        if self.kind[sid] == VECTOR:
+            sig = object.__new__(StdLogicVector)
+            state['_val'] = buf[offset:offset + width]
+            state['_dir'] = self.dir[sid]
+            state['_min'] = self.low[sid]
+            state['_max'] = self.low[sid] + width - 1
+        else:
+            sig = object.__new__(StdLogic)
+            state['_val'] = buf[offset]
+
+        sig.__setstate__(state)
+        store.attach(sig)
+        return sig
+
+    #----
+    #
+    # The BytecodeProcess attributes of process pid, functions have the
+    # globals g. A code record is loaded once for the processes sharing it
+
+    def process(self, pid, g):
+
+        name, key, index, sid_table, state = marshal.loads(self.record('proc', self.proc_index, pid))
+        variables, text_bc = pickle.loads(state)
+
+        if self.functions[index] == None:
+            self.functions[index] = loadFunction(self.record('code', self.code_index, index), g)
+
+        # The source of a codegen process is its file name
+        f, source = self.functions[index]
+
+        return [pid, name, f, variables, key, source, text_bc, sid_table]
+
+#------------------------------------------------------------------------------
+#
+# A column of numbers in the mapped file
+
+class Column(object):
+
+    __slots__ = ('mm', 'pos', 'fmt', 'size', 'n')
+
+    def __init__(self, mm, pos, code, n):
+
+        self.mm   = mm
+        self.pos  = pos
+        self.fmt  = '<' + code
+        self.size = struct.calcsize(self.fmt)
+        self.n    = n
+
+    #----
+
+    def __getitem__(self, i):
+
+        if i < 0 or i >= self.n:
+            raise IndexError('column index %d out of range' % i)
+
+        return struct.unpack_from(self.fmt, self.mm, self.pos + i * self.size)[0]
+
+    #----
+
+    def __len__(self):
+        return self.n
+
+#------------------------------------------------------------------------------
+#
+# The signals of SimExe sim, indexed by sid. A signal is created from the
+# signal table of reader when it is first used, a view on its value in the
+# ValueStore store
+
+class SignalTable(object):
+
+    def __init__(self, reader, sim, store):
+
+        self.reader  = reader
+        self.sim     = sim
+        self.store   = store
+        self.signals = [None] * reader.n_signals
+
+    #----
+
+    def __getitem__(self, sid):
+
+        sig = self.signals[sid]
+        if sig is None:
+            sig = self.signals[sid] = self.reader.signal(sid, self.store)
+            sig.initialize(self.sim)
+
+        return sig
+
+    #----
+
+    def __len__(self):
+        return len(self.signals)
+
+    #----
+
+    def loaded(self):
+        return len([sig for sig in self.signals if sig is not None])
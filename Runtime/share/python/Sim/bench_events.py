@@ -0,0 +1,155 @@
+#------------------------------------------------------------------------------
+#
+#   bench_events.py - 10/18/26
+#
+#   Event queue microbenchmark, reports events per second.
+#
+#   legacy - heapq of event objects compared with a Python __lt__, a new
+#            event object for every transaction (the original sim.queue)
+#   heap   - HeapScheduler, (time, priority, seq, event) tuples, pooled events
+#   wheel  - WheelScheduler, pooled events
+#
+# Command: python bench_events.py [n_drivers] [n_steps]
+#
+#------------------------------------------------------------------------------
+
+import sys, random
+
+from heapq     import heappush, heappop
+from time      import clock
+
+from scheduler  import makeScheduler
+from sim_events import SignalEvent, Driver
+
+#------------------------------------------------------------------------------
+#
+# Stand-ins for the simulator objects used by events
+
+class BenchSim(object):
+
+    def __init__(self, queue):
+        self.queue   = queue
+        self.time    = 0
+        self.drivers = {}
+
+    #----
+
+    def schedule(self, evt):
+        self.queue.push(evt)
+
+#----
+
+class BenchSignal(object):
+
+    name = 'bench'
+
+    def updateValue(self, other, cycle, time):
+        return ()
+
+#------------------------------------------------------------------------------
+#
+# The original event representation
+
+class LegacyEvent(object):
+
+    __slots__ = ('target', 'operand', 'time', 'priority')
+
+    evt_id = 1
+
+    def __init__(self, target, operand, time):
+
+        self.target   = target
+        self.operand  = operand
+        self.time     = time
+        self.priority = LegacyEvent.evt_id
+        LegacyEvent.evt_id += 1
+
+    def __lt__(self, other):
+
+        if self.time == other.time:
+            return self.priority < other.priority
+
+        return self.time < other.time
+
+    def operate(self, cycle):
+        return self.target.updateValue(self.operand, cycle, self.time)
+
+#----
+
+def runLegacy(delays, n_drivers):
+
+    queue   = []
+    signals = [BenchSignal() for i in range(n_drivers)]
+    time    = 0
+    events  = 0
+
+    for step in delays:
+        for sig, delay in zip(signals, step):
+            heappush(queue, LegacyEvent(sig, 1, time + delay))
+
+        # Run all events at the next time
+        evt = heappop(queue)
+        time = evt.time
+        evt.operate(0)
+        events += 1
+        while queue and queue[0].time == time:
+            heappop(queue).operate(0)
+            events += 1
+
+    return events
+
+#----
+
+def runScheduler(kind, delays, n_drivers):
+
+    sim     = BenchSim(makeScheduler(kind))
+    queue   = sim.queue
+    drivers = [Driver(sim, BenchSignal()) for i in range(n_drivers)]
+    events  = 0
+
+    for step in delays:
+        for driver, delay in zip(drivers, step):
+            driver.assign(1, delay, 0, False)
+
+        # Run all events at the next time
+        sim.time = queue.peek().time
+        for evt in queue.popTime():
+            evt.operate(0)
+            events += 1
+
+    return events
+
+#------------------------------------------------------------------------------
+
+def main(n_drivers=200, n_steps=2000):
+
+    # Each driver has a fixed delay, so no transactions are superseded
+    random.seed(1)
+    fixed  = [random.choice((1, 1, 1, 2, 5, 10, 50)) for i in range(n_drivers)]
+    delays = [fixed] * n_steps
+
+    print 'Event queue benchmark: %d drivers, %d steps' % (n_drivers, n_steps)
+
+    base = None
+    for kind in ['legacy', 'heap', 'wheel']:
+
+        SignalEvent.pool = []
+        Driver.pool      = []
+
+        start = clock()
+        if kind == 'legacy':
+            events = runLegacy(delays, n_drivers)
+        else:
+            events = runScheduler(kind, delays, n_drivers)
+        elapsed = clock() - start
+
+        rate = events / elapsed
+        if base == None:
+            base = rate
+
+        print '  %-6s %8d events  %7.3f s  %10.0f events/s  x%.2f' % (kind, events, elapsed, rate, rate / base)
+
+    print 'SignalEvent pool: %d, transaction pool: %d' % (len(SignalEvent.pool), len(Driver.pool))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,195 @@
+#------------------------------------------------------------------------------
+#
+#   bench_parser.py - 10/18/26
+#
+#   design.txt parser benchmark, reports lines per second and the time to
+#   build the Design of generated designs. A design is a chain of n_inst
+#   instances of a module with n_proc processes, each process is a clocked
+#   register with a reset like the ones of the plasma design.
+#
+#   Each design.txt is parsed with logging off and with logging at DEBUG to
+#   a file, the level sim_exec.py uses. It is then converted to design.bin
+#   (see design_ir.py), which is parsed with logging off.
+#
+# Command: python bench_parser.py [n_inst] [n_proc]
+#
+#------------------------------------------------------------------------------
+
+import sys, os, logging, tempfile
+
+from time import clock
+
+import design_ir
+from design_parser import Design, LineGenerator
+
+vector = 'STD_LOGIC_ARRAY 31 DOWNTO 0'
+
+process = '''PROCESS P%(j)d U%(i)d:WORK.STAGE(LOGIC)
+BEGIN_CODE
+0 ENTER CONTEXT
+1 NEW OBJECT CONSTANT A : STD_ULOGIC DBID 990
+2 NEW OBJECT CONSTANT B : STD_ULOGIC DBID 991
+3 PUSH OBJECT CONSTANT A : STD_ULOGIC
+4 PUSH OBJECT SIGNAL RESET : STD_LOGIC
+5 MAP
+6 PUSH OBJECT CONSTANT B : STD_ULOGIC
+7 PUSH STATIC VALUE 1
+8 MAP
+9 CALL FUNCTION "="(CONSTANT A : STD_ULOGIC, CONSTANT B : STD_ULOGIC) RETURN BOOLEAN
+10 EXIT CONTEXT
+11 JUMP NC 16
+12 PUSH OBJECT SIGNAL %(target)s : ARRAY  31 DOWNTO 0 OF STD_LOGIC
+13 PUSH LITERAL "00000000000000000000000000000000"
+14 POP T F F
+15 JUMP 42
+16 ENTER CONTEXT
+17 NEW OBJECT CONSTANT A : BOOLEAN DBID 817
+18 NEW OBJECT CONSTANT B : BOOLEAN DBID 818
+19 PUSH OBJECT CONSTANT A : BOOLEAN
+20 PUSH OBJECT SIGNAL CLK : STD_LOGIC
+21 ATTRIBUTE OP EVENT
+22 MAP
+23 PUSH OBJECT CONSTANT B : BOOLEAN
+24 ENTER CONTEXT
+25 NEW OBJECT CONSTANT A : STD_ULOGIC DBID 990
+26 NEW OBJECT CONSTANT B : STD_ULOGIC DBID 991
+27 PUSH OBJECT CONSTANT A : STD_ULOGIC
+28 PUSH OBJECT SIGNAL CLK : STD_LOGIC
+29 MAP
+30 PUSH OBJECT CONSTANT B : STD_ULOGIC
+31 PUSH STATIC VALUE 1
+32 MAP
+33 CALL FUNCTION "="(CONSTANT A : STD_ULOGIC, CONSTANT B : STD_ULOGIC) RETURN BOOLEAN
+34 EXIT CONTEXT
+35 MAP
+36 CALL FUNCTION "AND"(CONSTANT A : BOOLEAN, CONSTANT B : BOOLEAN) RETURN BOOLEAN
+37 EXIT CONTEXT
+38 JUMP NC 42
+39 PUSH OBJECT SIGNAL %(target)s : ARRAY  31 DOWNTO 0 OF STD_LOGIC
+40 PUSH OBJECT SIGNAL A : ARRAY  31 DOWNTO 0 OF STD_LOGIC
+41 POP T F F
+42 PUSH OBJECT SIGNAL CLK : STD_LOGIC
+43 SCHEDULE EVENT WAKEUP
+44 PUSH OBJECT SIGNAL RESET : STD_LOGIC
+45 SCHEDULE EVENT WAKEUP
+46 WAIT
+47 PUSH OBJECT SIGNAL CLK : STD_LOGIC
+48 JUMP EVENT 51
+49 PUSH OBJECT SIGNAL RESET : STD_LOGIC
+50 JUMP EVENT 51
+51 CANCEL ALL WAKEUPS
+52 JUMP 0
+53 JUMP 0
+END_CODE
+END_PROCESS'''
+
+#------------------------------------------------------------------------------
+#
+# design.txt of a chain of n_inst instances, process 0 of each drives the
+# output port, the others drive local signals
+
+def generate(n_inst, n_proc):
+
+    lines = ['DESIGN BENCH', 'INSTANCE BENCH WORK.TOP']
+    lines.append('LOCAL SIGNAL CLK NONE STD_LOGIC')
+    lines.append('LOCAL SIGNAL RESET NONE STD_LOGIC')
+    for i in range(n_inst + 1):
+        lines.append('LOCAL SIGNAL S%d NONE %s' % (i, vector))
+    lines += ['END_INSTANCE', 'MODULE BENCH WORK.TOP']
+
+    for i in range(n_inst):
+        lines.append('INSTANCE U%d WORK.STAGE(LOGIC)' % i)
+        lines.append('LOCAL SIGNAL CLK IN STD_LOGIC')
+        lines.append('LOCAL SIGNAL RESET IN STD_LOGIC')
+        lines.append('LOCAL SIGNAL A IN %s' % vector)
+        lines.append('LOCAL SIGNAL Y OUT %s' % vector)
+        for j in range(1, n_proc):
+            lines.append('LOCAL SIGNAL T%d NONE %s' % (j, vector))
+        lines.append('MAPPING IN CLK CLK STD_LOGIC')
+        lines.append('MAPPING IN RESET RESET STD_LOGIC')
+        lines.append('MAPPING IN A S%d %s' % (i, vector))
+        lines.append('MAPPING OUT Y S%d %s' % (i + 1, vector))
+        lines.append('END_INSTANCE')
+    lines.append('END_MODULE')
+
+    for i in range(n_inst):
+        lines.append('MODULE U%d WORK.STAGE(LOGIC)' % i)
+        for j in range(n_proc):
+            target = j and 'T%d' % j or 'Y'
+            lines.append(process % {'i' : i, 'j' : j, 'target' : target})
+        lines.append('END_MODULE')
+
+    lines.append('SUBPROGRAM FUNCTION "="(CONSTANT A : STD_ULOGIC, CONSTANT B : STD_ULOGIC) RETURN BOOLEAN')
+    lines.append('SUBPROGRAM FUNCTION "AND"(CONSTANT A : BOOLEAN, CONSTANT B : BOOLEAN) RETURN BOOLEAN')
+    lines.append('END_DESIGN')
+    return '\n'.join(lines) + '\n'
+
+#----
+#
+# Seconds to read & split every line, and to build the Design
+
+def parse(file_name):
+
+    start = clock()
+    lines = LineGenerator(open(file_name, 'r'))
+    try:
+        while True:
+            lines.next()
+    except StopIteration:
+        pass
+    read = clock() - start
+
+    start = clock()
+    design = Design(file_name)
+    design.build()
+    build = clock() - start
+
+    return lines.line_no, read, build
+
+#------------------------------------------------------------------------------
+
+def main(n_inst=1000, n_proc=4):
+
+    print 'design.txt parser benchmark: %d processes per instance' % n_proc
+
+    tmp_dir  = tempfile.mkdtemp()
+    txt_name = os.path.join(tmp_dir, 'design.txt')
+    bin_name = os.path.join(tmp_dir, 'design.bin')
+    log_name = os.path.join(tmp_dir, 'sim_log.txt')
+
+    logging.basicConfig(filename=log_name, filemode='w', level=logging.DEBUG)
+
+    for n in [n_inst // 10, n_inst]:
+
+        txt_file = open(txt_name, 'w')
+        txt_file.write(generate(n, n_proc))
+        txt_file.close()
+
+        start = clock()
+        design_ir.main(txt_name, bin_name)
+        convert = clock() - start
+
+        # logging.disable(level) turns off the messages up to level
+        runs = [(txt_name, 'off', logging.CRITICAL), (txt_name, 'DEBUG', logging.NOTSET),
+                (bin_name, 'off', logging.CRITICAL)]
+
+        for dsn_name, name, level in runs:
+
+            logging.disable(level)
+            n_lines, read, build = parse(dsn_name)
+
+            args = (n, os.path.basename(dsn_name), name, os.path.getsize(dsn_name), n_lines,
+                    read, build, n_lines / build)
+            print '  %5d instances  %s logging %-5s  %9d bytes  %7d lines  read %6.3f s  build %6.3f s  %9.0f lines/s' % args
+
+        print '  design.bin written in %.3f s' % convert
+
+    print 'sim_log.txt: %d bytes' % os.path.getsize(log_name)
+
+    logging.shutdown()
+    for name in [txt_name, bin_name, log_name]:
+        os.remove(name)
+    os.rmdir(tmp_dir)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
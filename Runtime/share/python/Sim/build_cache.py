@@ -0,0 +1,103 @@
+#------------------------------------------------------------------------------
+#
+#   build_cache.py - 10/18/26
+#
+#   Build cache for design.ser. The key is a hash of design.txt, the
+#   simulator source (the .py files of this package, with the VHDL library
+#   modules), the Python version and the SimBuilder options. It is saved
+#   in design.key when design.ser is written, a run with the same key
+#   loads design.ser and skips the design parser & SimBuilder.
+#
+#   Testbenches & memory images are read by SimExe, editing them doesn't
+#   change the key.
+#
+#------------------------------------------------------------------------------
+
+import os, sys
+from hashlib import sha1
+
+ser_path = 'design.ser'
+key_path = 'design.key'
+
+# Digest of the simulator source, computed once
+source_digest = None
+
+#------------------------------------------------------------------------------
+#
+# Hash of the .py files of the Sim package, in path order
+
+def sourceDigest():
+
+    global source_digest
+    if source_digest != None:
+        return source_digest
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    h = sha1()
+
+    for path, dirs, files in sorted(os.walk(root)):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.endswith('.py'):
+                continue
+            file_name = os.path.join(path, name)
+            h.update(os.path.relpath(file_name, root).replace('\\', '/'))
+            src_file = open(file_name, 'rb')
+            h.update(src_file.read())
+            src_file.close()
+
+    source_digest = h.hexdigest()
+    return source_digest
+
+#----
+#
+# Key of a build of the design in dsn_path, options are the SimBuilder
+# arguments that change design.ser
+
+def designKey(dsn_path, options):
+
+    h = sha1()
+
+    dsn_file = open(dsn_path, 'rb')
+    h.update(dsn_file.read())
+    dsn_file.close()
+
+    h.update(sourceDigest())
+    h.update(sys.version)
+    h.update(repr(sorted(options.items())))
+
+    return h.hexdigest()
+
+#------------------------------------------------------------------------------
+#
+# True if design.ser was built with key
+
+def isCurrent(key):
+
+    if not os.path.exists(ser_path) or not os.path.exists(key_path):
+        return False
+
+    key_file = open(key_path, 'r')
+    saved = key_file.read().strip()
+    key_file.close()
+
+    return saved == key
+
+#----
+#
+# Record the key of the design.ser just written
+
+def save(key):
+
+    key_file = open(key_path, 'w')
+    key_file.write(key + '\n')
+    key_file.close()
+
+#----
+#
+# Forget the key, before design.ser is rebuilt
+
+def clear():
+
+    if os.path.exists(key_path):
+        os.remove(key_path)
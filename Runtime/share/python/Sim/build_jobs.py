@@ -0,0 +1,119 @@
+#------------------------------------------------------------------------------
+#
+#   build_jobs.py - 10/18/26
+#
+#   Parallel process compilation, SimBuilder jobs > 1 (sim_exec.py --jobs N).
+#   SimBuilder links every ProcessBuilder, the processes that are not in the
+#   object store are then compiled by a pool of worker processes, one job per
+#   process key. A worker runs ProcessBuilder.compile and returns the
+#   marshalled code object (see artifact.dumpFunction) with the pickled rest
+#   of the result. SimBuilder applies the results in process order, so the
+#   build is the same for any number of jobs.
+#
+#   The workers are forked & inherit the design, on a platform without
+#   os.fork the processes are compiled serially.
+#
+#------------------------------------------------------------------------------
+
+import os, gc
+import cPickle as pickle
+import multiprocessing
+
+import artifact
+
+# The ProcessBuilders of the jobs, set before the pool is forked
+builders = []
+
+#------------------------------------------------------------------------------
+
+def available():
+    return hasattr(os, 'fork')
+
+#----
+#
+# Compile the ProcessBuilders vms with n worker processes, returns the
+# results in the order of vms
+
+def run(vms, n):
+
+    global builders
+    builders = vms
+
+    # A worker only lives for the build, the cyclic garbage collector is off
+    # so it doesn't walk (& copy the pages of) the design it inherits
+    pool = multiprocessing.Pool(n, gc.disable)
+    try:
+        chunk   = max(1, len(vms) // (n * 4))
+        results = pool.map(compileJob, range(len(vms)), chunk)
+    finally:
+        pool.close()
+        pool.join()
+        builders = []
+
+    return [decode(result) for result in results]
+
+#----
+#
+# Worker, compile builder i
+
+def compileJob(i):
+
+    vm  = builders[i]
+    sim = vm.sim
+
+    # Code is shared by SimBuilder, in process order
+    sim.shared   = {}
+    sim.peephole = {}
+
+    vm.compile()
+
+    result = {}
+    result['sid_table']   = vm.sid_table
+    result['sensitivity'] = vm.sensitivity
+    result['source']      = vm.source
+    result['peephole']    = sim.peephole
+
+    if sim.tiered and vm.source == None:
+        result['text_bc'] = vm.text_bc
+    else:
+        result['text_bc'] = None
+
+    if vm.ir != None:
+        result['ir'] = vm.ir.summary(sim.dump_ir)
+    else:
+        result['ir'] = None
+
+    # The key the code is shared with, see ProcessBuilder.share
+    if vm.share_key != None and portable(vm.share_key):
+        result['share'] = vm.share_key
+    else:
+        result['share'] = None
+
+    return artifact.dumpFunction(vm.bytecode_vm, vm.source), pickle.dumps(result, 2)
+
+#----
+
+def decode(result):
+
+    code, state = result
+
+    result = pickle.loads(state)
+    result['code'] = code
+
+    return result
+
+#----
+#
+# False if the share key has the id of an object (see interp.constKey), ids
+# of the objects of different workers or builds can't be compared
+
+def portable(key):
+
+    if isinstance(key, tuple):
+        if len(key) == 2 and key[0] == 'id':
+            return False
+        for item in key:
+            if not portable(item):
+                return False
+
+    return True
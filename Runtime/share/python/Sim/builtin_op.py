@@ -16,6 +16,12 @@ import logging, dis
 def binary_op(L, R, op):
     
     if op == 'EQUAL':
+        # Compare packed values if there are no metavalues
+        l, lm = L.packed()
+        r, rm = R.packed()
+        if not (lm | rm) and len(L) == len(R):
+            return l == r
+        
         return L.getVal() == R.getVal()
     
     if op == 'OR':
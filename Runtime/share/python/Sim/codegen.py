@@ -0,0 +1,642 @@
+#------------------------------------------------------------------------------
+#
+#   codegen.py - 10/18/26
+#
+#   Python source backend. A process is generated as the source of a
+#   generator function, vm_process(vm, signals, variables, consts), that
+#   runs like the bytecode built by ProcessBuilder.buildBytecode() but
+#   needs no byteplay, so it can be compiled by any Python.
+#
+#   The vm_op list of the process is put in the IR (ir.build) and each
+#   statement becomes a line of source. Jumps are turned back into the
+#   structured code they came from:
+#
+#    JUMP NC / CLOCK EDGE forward       - if / else
+#    a jump back to a statement         - while True, continue & break
+#    SWITCH                             - a binary search of if / else on
+#                                         the arm index
+#
+#   Objects that can't be written as literals (StdLogic, look-up tables
+#   ...) are passed in the consts tuple, the default of the last argument,
+#   and unpacked to locals by the preamble. CodegenError is raised for
+#   code that can't be generated, e.g. a jump into an if, the process is
+#   then built as bytecode.
+#
+#------------------------------------------------------------------------------
+
+import os, types
+from bisect import bisect_left
+
+from vm_op import jumpTargets
+import ir
+
+# Values written as literals
+literal_types = (bool, int, long, float, str, type(None))
+
+# Statements generated by Generator.stmt(), jumps are generated by
+# Generator.region()
+plain_stmts = set(['PopOp', 'ScheduleDelayOp', 'ScheduleEventOp', 'WaitOp', 'StopOp',
+                   'AssignOp', 'WaitSetOp'])
+
+#------------------------------------------------------------------------------
+
+class CodegenError(Exception):
+    pass
+
+#------------------------------------------------------------------------------
+#
+# Source of one process. stmts are the IR statements in code order, index
+# maps a zcode address to the statement that starts there
+
+class Generator(object):
+
+    def __init__(self, vm):
+
+        self.vm     = vm
+        self.lines  = []
+        self.indent = 1
+
+        self.consts = []            # values passed in consts
+        self.names  = {}            # id(value) -> local name
+
+        proc = ir.build(vm)
+        if proc is None:
+            raise CodegenError('%s can not be put in the IR' % vm.vm_name())
+
+        self.stmts  = list(proc.statements())
+        self.labels = [stmtLabel(stmt) for stmt in self.stmts]
+
+        # Statement indexes each statement jumps to, and the statements
+        # that jump back to each statement
+        self.jumps = []
+        self.back  = {}
+        for i, stmt in enumerate(self.stmts):
+            targets = [self.index(adrs) for adrs in jumpTargets(stmt.op)]
+            self.jumps.append(targets)
+            for target in targets:
+                if target <= i:
+                    self.back.setdefault(target, []).append(i)
+
+        # Ops flagged by ProcessBuilder, by code index
+        code = vm.code
+        self.static_ops = set([id(code[i]) for i in vm.static_ops])
+        self.int_ops    = set([id(code[i]) for i in vm.int_ops])
+
+        # Expressions of POP targets for AGGREGATE
+        self.targets = {}
+
+    #----
+
+    def line(self, text):
+        self.lines.append('    ' * self.indent + text)
+
+    #----
+    #
+    # Index of the statement a jump to zcode address adrs goes to. Jumps to
+    # removed ops go to the next op
+
+    def index(self, adrs):
+        return bisect_left(self.labels, adrs)
+
+    #----
+    #
+    # Local holding a value that is not a literal
+
+    def const(self, value):
+
+        if type(value) in literal_types:
+            if type(value) in (int, long):
+                return '%d' % value
+            return repr(value)
+
+        name = self.names.get(id(value))
+        if name is None:
+            name = self.names[id(value)] = 'k__%d' % len(self.consts)
+            self.consts.append(value)
+
+        return name
+
+    #---------------------------------------------------------------------------
+    #
+    # Expressions
+
+    def expr(self, node):
+
+        text = self.value(node)
+        if id(node.op) in self.int_ops:
+            # std_ulogic argument of an inlined operation
+            text = '%s.getVal()[0]' % text
+
+        return text
+
+    #----
+
+    def value(self, node):
+
+        name = node.name
+        op   = node.op
+        args = node.args
+
+        if name in ('PushSigOp', 'PushVarOp'):
+            if name == 'PushSigOp':
+                local = self.vm.sigName(op.object.sid)
+            else:
+                local = 'var__%d' % op.object.sid
+            if op.as_int:
+                return '%s_buf[%s_off]' % (local, local)
+            if isVector(op.object) and len(op.object) == 1:
+                # SLV(0 DOWNTO 0) is pushed as its element 0
+                return 'SLVRange_bc2(%s, 0)' % local
+            return local
+
+        if name in ('PushLitOp', 'PushConstOp', 'PushFoldedOp'):
+            if getattr(op, 'delay_ticks', None) != None:
+                return self.const(op.delay_ticks)
+            if op.as_int:
+                return self.const(op.value.getVal()[0])
+            return self.const(op.value)
+
+        if name == 'RangeCreateOp':
+            return op.loc_name
+
+        if name == 'LoadTempOp':
+            return op.name
+
+        if name == 'StoreTempOp':
+            # Computed before the statement that uses it
+            self.line('%s = %s' % (op.name, self.expr(args[0])))
+            return op.name
+
+        if name == 'IndexOp':
+            return 'SLVRange_bc2(%s, %s)' % (self.expr(args[0]), self.expr(args[1]))
+
+        if name == 'AttributeOp':
+            method = op.methods.get(op.attr_name)
+            if method is None:
+                raise CodegenError('Attribute %s is not supported' % op.attr_name)
+            return '%s.%s()' % (self.expr(args[0]), method)
+
+        if name == 'BinaryOp':
+            return 'binary_op(%s, %s, %r)' % (self.expr(args[0]), self.expr(args[1]), op.op)
+
+        if name == 'BinaryEqualOp':
+            return '(str(%s) == str(%s))' % (self.expr(args[0]), self.expr(args[1]))
+
+        if name == 'AggregateOp':
+            target = self.targets.get(id(node.peek))
+            if target is None:
+                raise CodegenError('AGGREGATE without a POP target')
+            return 'SLVRange_bc3(str(%s), %s)' % (self.expr(args[0]), target)
+
+        if name == 'CallOp':
+            return self.call(node)
+
+        raise CodegenError('%s is not supported' % name)
+
+    #----
+
+    def call(self, node):
+
+        op   = node.op
+        args = [self.expr(arg) for arg in node.args]
+
+        if op.inline:
+            # Operands are encoded values, see ProcessBuilder.inlineScalarOps
+            if op.table is None:
+                return '(%s == %s)' % tuple(args)
+
+            text = '%s[%s]' % (self.const(op.table), ']['.join(args))
+            if op.materialize:
+                text = 'std_values[%s]' % text
+            return text
+
+        lib_dict = self.vm.sim.lib_dict
+        if op.signature in lib_dict:
+            f = lib_dict[op.signature]
+            if len(args) != f.func_code.co_argcount:
+                raise CodegenError('%s called with %d arguments' % (op.signature, len(args)))
+            return '%s_lcl(%s)' % (f.__name__, ', '.join(args))
+
+        # Method of the first operand, see CallOp.genBytecode
+        if op.argc == 2:
+            if op.klass.__name__ == 'Integer':
+                native = {'add_op' : '+', 'sub_op' : '-', 'gt_op' : '>'}
+                return '(%s %s %s)' % (args[0], native[op.op_name], args[1])
+            return '%s.%s(%s)' % (args[0], op.op_name, args[1])
+
+        return '%s.%s()' % (args[0], op.op_name)
+
+    #---------------------------------------------------------------------------
+    #
+    # Statements
+
+    def stmt(self, stmt):
+
+        name = stmt.name
+        op   = stmt.op
+        vm   = self.vm
+
+        if id(op) in self.static_ops:
+            # Static sensitivity, registered once by SimExe
+            return
+
+        self.line('# %s' % zcodeText(stmt))
+
+        if name == 'PopOp':
+
+            target = self.expr(stmt.args[0])
+            self.targets[id(stmt.args[0])] = target
+            value = self.expr(stmt.args[1])
+
+            if not op.d_flag:
+                delay = '0'
+            elif op.prescaled:
+                delay = self.expr(stmt.args[2])
+            else:
+                delay = '%s // %d' % (self.expr(stmt.args[2]), vm.sim.fs_per_tick)
+
+            if op.i_flag:
+                self.line('scheduleAssignment(%s, %s, %s)' % (target, value, delay))
+            else:
+                # Transport delay
+                self.line('scheduleAssignment(%s, %s, %s, None, False)' % (target, value, delay))
+
+        elif name == 'AssignOp':
+
+            # Driver bound by the preamble
+            args = [self.expr(stmt.args[0])]
+
+            if op.d_flag and op.prescaled:
+                args.append(self.expr(stmt.args[1]))
+            elif op.d_flag:
+                args.append('%s // %d' % (self.expr(stmt.args[1]), vm.sim.fs_per_tick))
+
+            self.line('%s(%s)' % (vm.driverName(op.target), ', '.join(args)))
+
+        elif name == 'ScheduleDelayOp':
+            delay = self.expr(stmt.args[0])
+            if not op.prescaled:
+                delay = '%s // %d' % (delay, vm.sim.fs_per_tick)
+            self.line('scheduleDelay(%s)' % delay)
+
+        elif name == 'ScheduleEventOp':
+            self.line('waitOn(%s)' % self.expr(stmt.args[0]))
+
+        elif name == 'WaitOp':
+            self.line('yield vm')
+
+        elif name == 'WaitSetOp':
+            if not op.static:
+                for sig in op.sigs:
+                    self.line('waitOn(%s)' % vm.sigName(sig.object.sid))
+            self.line('yield vm')
+
+        elif name == 'StopOp':
+            self.line('return')
+
+    #---------------------------------------------------------------------------
+    #
+    # Control flow. region() generates the statements lo <= i < hi, which
+    # are entered at lo. Falling off the end goes to statement follow, so a
+    # jump to follow is a jump to hi. loops are the (head, exit) of the
+    # enclosing while loops, innermost last
+
+    def region(self, lo, hi, follow, loops, loop_at=None):
+
+        start = len(self.lines)
+        i = lo
+        while i < hi:
+
+            stmt = self.stmts[i]
+            name = stmt.name
+
+            # A jump back to i starts a loop
+            if i != loop_at:
+                back = [j for j in self.back.get(i, []) if j < hi]
+                if back:
+                    end = max(back) + 1
+                    self.line('while True:')
+                    self.indent += 1
+                    self.region(i, end, end, loops + [(i, end)], i)
+                    last = self.stmts[end - 1]
+                    if not (last.name in ('JumpUOp', 'JumpTOp', 'JumpEOp', 'EventOrOp') and self.jumps[end - 1] == [i]):
+                        self.line('break')
+                    self.indent -= 1
+                    i = end
+                    continue
+
+            if name in ('JumpUOp', 'JumpTOp', 'JumpEOp', 'EventOrOp'):
+                self.line('# %s' % zcodeText(stmt))
+                target = self.target(stmt.op.new_pc, hi, follow)
+                self.jump(target, i, hi, follow, loops)
+                i += 1
+
+            elif name in ('JumpNCOp', 'JumpNotRisingOp', 'ClockEdgeOp'):
+                i = self.branch(i, hi, follow, loops)
+
+            elif name == 'SwitchOp':
+                i = self.switch(i, hi, follow, loops)
+
+            elif name in plain_stmts:
+                self.stmt(stmt)
+                i += 1
+
+            else:
+                raise CodegenError('%s is not supported' % name)
+
+        # Comments are not a block
+        if not [text for text in self.lines[start:] if not text.lstrip().startswith('#')]:
+            self.line('pass')
+
+    #----
+    #
+    # Index of a jump target in region ending at hi, hi for follow
+
+    def target(self, adrs, hi, follow):
+
+        target = self.index(adrs)
+        if target == follow:
+            return hi
+        return target
+
+    #----
+    #
+    # Unconditional jump from statement i, condition is the text of the
+    # condition for a conditional jump
+
+    def jump(self, target, i, hi, follow, loops, condition=None):
+
+        loop_head, loop_exit = (loops or [(None, None)])[-1]
+
+        if target == hi and i == hi - 1 and condition is None:
+            # Falls off the end of the region
+            return
+
+        if target == loop_head:
+            text = 'continue'
+        elif loop_exit is not None and (target == loop_exit or (target == hi and follow == loop_exit)):
+            text = 'break'
+        else:
+            raise CodegenError('Jump from %d to %d can not be structured' % (self.labels[i], target))
+
+        if condition is None:
+            self.line(text)
+        else:
+            self.line('if %s:' % condition)
+            self.line('    %s' % text)
+
+    #----
+    #
+    # Conditional jump at statement i, the code that follows it when the
+    # jump is not taken becomes an if, and the code after a JUMP at the end
+    # of it an else. Returns the index of the next statement
+
+    def branch(self, i, hi, follow, loops):
+
+        stmt = self.stmts[i]
+        self.line('# %s' % zcodeText(stmt))
+
+        if stmt.name == 'JumpNCOp':
+            stay = self.expr(stmt.args[0])
+        elif stmt.name == 'ClockEdgeOp':
+            name = self.vm.sigName(stmt.op.object.sid)
+            stay = '%s_buf[%s_off] == 3 and %s.evt_cycle == sim_lcl.current_cycle' % (name, name, name)
+        else:
+            stay = 'not %s.not_rising_op()' % self.vm.sigName(stmt.op.object.sid)
+
+        target = self.target(stmt.op.new_pc, hi, follow)
+
+        if not i < target <= hi:
+            self.jump(target, i, hi, follow, loops, 'not (%s)' % stay)
+            return i + 1
+
+        # A JUMP at the end of the if skips the else
+        end  = None
+        last = self.stmts[target - 1]
+        if target - 1 > i and last.name == 'JumpUOp':
+            end = self.target(last.op.new_pc, hi, follow)
+            if not target < end <= hi:
+                end = None
+
+        self.line('if %s:' % stay)
+        self.indent += 1
+
+        if end is None:
+            self.region(i + 1, target, followOf(target, hi, follow), loops)
+            self.indent -= 1
+            return target
+
+        self.region(i + 1, target - 1, followOf(end, hi, follow), loops)
+        self.indent -= 1
+        self.line('else:')
+        self.indent += 1
+        self.region(target, end, followOf(end, hi, follow), loops)
+        self.indent -= 1
+        return end
+
+    #----
+    #
+    # SWITCH at statement i. Arm k is the code from its target to the next
+    # one, it ends with a JUMP past the others arm. Returns the index of the
+    # next statement
+
+    def switch(self, i, hi, follow, loops):
+
+        stmt = self.stmts[i]
+        op   = stmt.op
+        self.line('# %s' % zcodeText(stmt))
+
+        starts = [self.target(adrs, hi, follow) for adrs in op.targets]
+        if starts[0] != i + 1 or starts != sorted(set(starts)) or starts[-1] > hi:
+            raise CodegenError('SWITCH at %s can not be structured' % op.label)
+
+        # The end of the case
+        last = self.stmts[starts[1] - 1]
+        if last.name != 'JumpUOp':
+            raise CodegenError('SWITCH at %s arm 0 does not end with a JUMP' % op.label)
+        end = self.target(last.op.new_pc, hi, follow)
+        if not starts[-1] <= end <= hi:
+            raise CodegenError('SWITCH at %s can not be structured' % op.label)
+
+        arms = []
+        for k in range(len(starts) - 1):
+            last = self.stmts[starts[k + 1] - 1]
+            if last.name != 'JumpUOp' or self.target(last.op.new_pc, hi, follow) != end:
+                raise CodegenError('SWITCH at %s arm %d does not end with a JUMP' % (op.label, k))
+            arms.append((starts[k], starts[k + 1] - 1))
+        arms.append((starts[-1], end))
+
+        self.line('switch__arm = %s.get(%s.packed(), %d)' % (self.const(op.table),
+                                                             self.expr(stmt.args[0]), len(arms) - 1))
+        self.dispatch(arms, 0, len(arms), followOf(end, hi, follow), loops)
+        return end
+
+    #----
+    #
+    # Arms lo <= k < hi of a SWITCH
+
+    def dispatch(self, arms, lo, hi, follow, loops):
+
+        if hi - lo == 1:
+            first, last = arms[lo]
+            self.region(first, last, follow, loops)
+            return
+
+        mid = (lo + hi) // 2
+        self.line('if switch__arm < %d:' % mid)
+        self.indent += 1
+        self.dispatch(arms, lo, mid, follow, loops)
+        self.indent -= 1
+        self.line('else:')
+        self.indent += 1
+        self.dispatch(arms, mid, hi, follow, loops)
+        self.indent -= 1
+
+    #---------------------------------------------------------------------------
+    #
+    # Source of the process function
+
+    def source(self, var_ids):
+
+        vm = self.vm
+
+        self.region(0, len(self.stmts), None, [])
+        body, self.lines = self.lines, []
+
+        # Preamble, the locals used by the body. signals are the instance's
+        # signals in slot order (see ProcessBuilder.bindSignals)
+        for sid in vm.sid_table:
+            self.line('%s = signals[%d]' % (vm.sigName(sid), vm.slots[sid]))
+
+        for sid in var_ids:
+            self.line('var__%d = variables[%d]' % (sid, sid))
+
+        for name in sorted(vm.int_sids):
+            self.line('%s_buf = %s._buf' % (name, name))
+            self.line('%s_off = %s._off' % (name, name))
+
+        for func_name in vm.called:
+            self.line('%s_lcl = %s' % (func_name, func_name))
+
+        completed = set()
+        for op in vm.ranges.op_list:
+            if op.loc_name in completed:
+                continue
+            completed.add(op.loc_name)
+            if op.klass == 'VARIABLE':
+                target = 'variables[%d]' % op.sid
+            else:
+                target = 'signals[%d]' % vm.slots[op.sid]
+            self.line('%s = SLVRange(%s, %r, %d, %d)' % (op.loc_name, target,
+                                                        op.ascending, op.left, op.right))
+
+        for name, target in vm.drivers:
+            self.line('%s = vm.driver(%s)' % (name, target))
+
+        if [stmt for stmt in self.stmts if stmt.name == 'ClockEdgeOp']:
+            self.line('sim_lcl = vm.sim')
+
+        if self.consts:
+            names = ['k__%d' % i for i in range(len(self.consts))]
+            self.line('%s, = consts' % ', '.join(names))
+
+        self.line('scheduleAssignment = vm.scheduleAssignment')
+        self.line('scheduleDelay = vm.scheduleDelay')
+        self.line('waitOn = vm.waitOn')
+
+        preamble, self.lines = self.lines, []
+
+        head = [
+            '#' + '-' * 78,
+            '#',
+            '#   %s %d - %s' % (vm.name, vm.id, vm.inst.key),
+            '#',
+            '#   Generated by codegen.py',
+            '#',
+            '#' + '-' * 78,
+            '',
+            'def vm_process(vm, signals, variables, consts=None):',
+            '',
+        ]
+
+        return '\n'.join(head + preamble + [''] + body) + '\n'
+
+#------------------------------------------------------------------------------
+#
+# Helper functions
+
+def isVector(obj):
+    return obj.__class__.__name__ == 'StdLogicVector'
+
+#----
+#
+# Where a region ending at hi goes when it ends at target
+
+def followOf(target, hi, follow):
+    if target == hi:
+        return follow
+    return target
+
+#----
+#
+# zcode address of a statement, -1 ops are temps
+
+def stmtLabel(stmt):
+
+    ops = []
+    stmt.ops(ops)
+    for op in ops:
+        if int(op.label) >= 0:
+            return int(op.label)
+
+    return -1
+
+#----
+
+def zcodeText(stmt):
+    return '%d %s' % (stmtLabel(stmt), ir.describe(stmt.op))
+
+#------------------------------------------------------------------------------
+#
+# Generate the source of a ProcessBuilder, returns the source & the consts
+
+def generate(vm, var_ids):
+
+    gen = Generator(vm)
+    return gen.source(var_ids), tuple(gen.consts)
+
+#----
+#
+# Compile the source of a process to a function with globals g
+
+def compileSource(source, file_name, consts, g):
+    return types.FunctionType(sourceCode(source, file_name), g, 'vm_process', (consts,))
+
+#----
+#
+# The code object of the vm_process function of a source
+
+def sourceCode(source, file_name):
+
+    code = compile(source, file_name, 'exec')
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType) and const.co_name == 'vm_process':
+            return const
+
+    raise CodegenError('No vm_process in %s' % file_name)
+
+#----
+#
+# Write the source of a process to directory path, returns the file name
+
+def save(path, vm, source):
+
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    file_name = os.path.join(path, '%d_%s.py' % (vm.id, vm.name.lower()))
+    src_file = open(file_name, 'w')
+    src_file.write(source)
+    src_file.close()
+
+    return file_name
@@ -0,0 +1,309 @@
+#------------------------------------------------------------------------------
+#
+#   design_ir.py - 10/18/26
+#
+#   design.bin, the compact binary form of design.txt. It is written by
+#   pysim_boot.py (Jython, so this module only uses the Python 2.5 library)
+#   and loaded by design_parser.LineGenerator. design.txt is still written
+#   when pysim_boot.write_text is set, as a debug rendering.
+#
+#   Layout, little endian:
+#
+#    header  - magic, version, flags (FLAG_WIDE: token ids are 32 bit)
+#    strings - count, byte length & the sorted distinct tokens joined by '\n'
+#    lines   - count & the number of tokens of each line (16 bit)
+#    tokens  - count & the string index of each token (16 or 32 bit)
+#
+#   Code blocks only keep the zcode CodeOptimizer uses: the NEW & MAP
+#   lines of a CALL context and the PUSHes of its formal parameters are
+#   dropped, the other lines & jump targets are renumbered. Types of
+#   $$UNIVERSAL_INTEGER$$ are changed to INTEGER.
+#
+#   Command: python design_ir.py [design.txt] [design.bin]
+#
+#------------------------------------------------------------------------------
+
+import os, sys, struct, gc
+from array import array
+
+magic   = 'PYVHDLIR'
+version = 1
+
+FLAG_WIDE = 1
+
+header = '<8sHH'
+
+txt_path = 'design.txt'
+bin_path = 'design.bin'
+
+#------------------------------------------------------------------------------
+#
+# File object for the design.txt lines of pysim_boot.py, text is an optional
+# file the lines are also written to. The lines are encoded on close()
+
+class Writer(object):
+
+    def __init__(self, file_obj, text=None):
+
+        self.f     = file_obj
+        self.text  = text
+        self.parts = []
+
+        self.softspace = 0      # for print >>
+
+    #----
+
+    def write(self, s):
+
+        if self.text != None:
+            self.text.write(s)
+
+        self.parts.append(s)
+
+    #----
+
+    def close(self):
+
+        # design.txt is closed first, design.bin is only parsed when it is
+        # newer (see designPath)
+        if self.text != None:
+            self.text.close()
+
+        encode(self.f, ''.join(self.parts))
+        self.f.close()
+
+#------------------------------------------------------------------------------
+#
+# Write the design.txt lines of data to f as design.bin
+
+def encode(f, data):
+
+    words   = []        # tokens of all lines
+    lengths = []        # number of tokens of each line
+    code    = None      # lines of the current code block
+
+    for line in data.split('\n'):
+
+        tokens = line.split()
+        if not tokens:
+            continue
+
+        if code != None:
+            if '$$UNIVERSAL_INTEGER$$' in line:
+                tokens = [universalInteger(token) for token in tokens]
+            code.append(tokens)
+            if tokens[0] == 'END_CODE':
+                for tokens in compactCode(code):
+                    words.extend(tokens)
+                    lengths.append(len(tokens))
+                code = None
+            continue
+
+        words.extend(tokens)
+        lengths.append(len(tokens))
+        if tokens[0] == 'BEGIN_CODE':
+            code = []
+
+    # Intern the tokens, ids are indexes in the sorted table
+    table = sorted(set(words))
+    index = dict(zip(table, xrange(len(table))))
+    ids   = map(index.__getitem__, words)
+
+    if len(table) > 0xffff:
+        flags, code = FLAG_WIDE, 'I'
+    else:
+        flags, code = 0, 'H'
+
+    strings = '\n'.join(table)
+
+    f.write(struct.pack(header, magic, version, flags))
+    f.write(struct.pack('<II', len(table), len(strings)))
+    f.write(strings)
+
+    f.write(struct.pack('<I', len(lengths)))
+    packArray(f, 'H', lengths)
+    f.write(struct.pack('<I', len(ids)))
+    packArray(f, code, ids)
+
+#----
+
+def packArray(f, code, values):
+
+    values = array(code, values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    f.write(values.tostring())
+
+#------------------------------------------------------------------------------
+#
+# The lines of design.bin data as lists of tokens, ValueError if data is
+# not a complete design.bin
+
+def decode(data):
+
+    checkSize(data, 0, struct.calcsize(header) + 8)
+
+    tag, ver, flags = struct.unpack_from(header, data)
+    if tag != magic:
+        raise ValueError('not a design.bin file')
+    if ver != version:
+        raise ValueError('design.bin version %d, expected %d' % (ver, version))
+
+    pos = struct.calcsize(header)
+    n_strings, size = struct.unpack_from('<II', data, pos)
+    pos += 8
+    checkSize(data, pos, size)
+    strings = data[pos:pos + size].split('\n')
+    pos += size
+
+    lengths, pos = unpackArray(data, pos, 'H')
+
+    if flags & FLAG_WIDE:
+        ids, pos = unpackArray(data, pos, 'I')
+    else:
+        ids, pos = unpackArray(data, pos, 'H')
+
+    if len(strings) != n_strings or sum(lengths) != len(ids):
+        raise ValueError('design.bin is corrupt')
+
+    try:
+        tokens = map(strings.__getitem__, ids.tolist())
+    except IndexError:
+        raise ValueError('design.bin is corrupt')
+
+    # A line is a new list, the collector would scan them all a few times
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        lines = []
+        i = 0
+        for n in lengths:
+            lines.append(tokens[i:i + n])
+            i += n
+    finally:
+        if enabled:
+            gc.enable()
+
+    return lines
+
+#----
+
+def unpackArray(data, pos, code):
+
+    checkSize(data, pos, 4)
+    n = struct.unpack_from('<I', data, pos)[0]
+    pos += 4
+
+    values = array(code)
+    checkSize(data, pos, n * values.itemsize)
+    values.fromstring(data[pos:pos + n * values.itemsize])
+    if sys.byteorder != 'little':
+        values.byteswap()
+
+    return values, pos + n * values.itemsize
+
+#----
+
+def checkSize(data, pos, size):
+
+    if len(data) < pos + size:
+        raise ValueError('design.bin is truncated')
+
+#------------------------------------------------------------------------------
+#
+# The code lines of a BEGIN_CODE block (END_CODE is the last) without the
+# lines that CodeOptimizer.context() ignores. Labels are renumbered, a jump
+# to a dropped line goes to the next line that is kept
+
+def compactCode(code):
+
+    keep = []
+    args = []       # formal parameter names of each open context
+
+    for tokens in code[:-1]:
+
+        tag = tokens[1]
+        if tag == 'ENTER':
+            args.append(set())
+
+        elif tag == 'EXIT':
+            args.pop()
+
+        elif args and tag == 'NEW':
+            args[-1].add(tokens[4])
+            keep.append(False)
+            continue
+
+        elif args and tag == 'MAP':
+            keep.append(False)
+            continue
+
+        elif args and tokens[1:4] == ['PUSH', 'OBJECT', 'CONSTANT'] and tokens[4] in args[-1]:
+            keep.append(False)
+            continue
+
+        keep.append(True)
+
+    # New label of each old label, the label of the next kept line if dropped
+    labels = []
+    n = 0
+    for k in keep:
+        labels.append(n)
+        if k:
+            n += 1
+    labels.append(n)
+
+    result = []
+    for i, tokens in enumerate(code[:-1]):
+        if not keep[i]:
+            continue
+        tokens[0] = str(labels[i])
+        if tokens[1] == 'JUMP':
+            tokens[-1] = str(labels[int(tokens[-1])])
+        result.append(tokens)
+
+    result.append(code[-1])
+    return result
+
+#----
+
+def universalInteger(token):
+
+    if token.startswith('$$UNIVERSAL_INTEGER$$'):
+        return token.replace('$$UNIVERSAL_INTEGER$$', 'INTEGER')
+
+    return token
+
+#------------------------------------------------------------------------------
+#
+# The design file to parse, design.bin unless design.txt is newer
+
+def designPath():
+
+    if not os.path.exists(bin_path):
+        return txt_path
+
+    if os.path.exists(txt_path) and os.path.getmtime(txt_path) > os.path.getmtime(bin_path):
+        return txt_path
+
+    return bin_path
+
+#----
+#
+# Convert a design.txt to design.bin
+
+def main(src=txt_path, dest=bin_path):
+
+    src_file = open(src, 'r')
+    data = src_file.read()
+    src_file.close()
+
+    dest_file = open(dest, 'wb')
+    encode(dest_file, data)
+    dest_file.close()
+
+    args = (src, os.path.getsize(src), dest, os.path.getsize(dest))
+    print '%s: %d bytes, %s: %d bytes' % args
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -8,7 +8,9 @@
 
 from vm_op import *
 
-import std, logging
+import std, logging, gc
+import design_ir
+from design_ir import universalInteger
 from StringIO import StringIO
 
 #------------------------------------------------------------------------------
@@ -20,47 +22,118 @@ class Parsing_Exception(Exception):
  
 #------------------------------------------------------------------------------
 #
-# A generator of split lines from a file
+# Set trace to log every design.txt line and the CodeOptimizer steps
+
+trace = False
+
+#------------------------------------------------------------------------------
+#
+# A generator of split lines from a file. The file is read at once, a line
+# of design.txt is split when it is used. design.bin is already split and
+# its code is compact (see design_ir.py), a .bin file without its magic is
+# rejected by design_ir.decode
 
 class LineGenerator(object):
     
     def __init__(self, file_obj):    
-        self.f = file_obj
-        self.line_no = 0
-        self.line = ''
+        data = file_obj.read()
+        file_obj.close()
+        
+        name = getattr(file_obj, 'name', '')
+        if data.startswith(design_ir.magic) or name.endswith('.bin'):
+            try:
+                self.buf = design_ir.decode(data)
+            except ValueError, msg:
+                raise Parsing_Exception, 'Design Parsing Error: %s' % msg
+            self.compact = True
+        else:
+            self.buf = data.split('\n')
+            self.compact = False
         
+        self.line_no = 0
         self.current = []
         
+    #----
+    #
+    # The current line, for messages
+    
+    def getLine(self):
+        return ' '.join(self.current)
+        
+    line = property(getLine)
+    
     #----
         
     def next(self):
         
-        while True:
-    
-            self.line = self.f.readline()
-            self.line_no += 1
-    
-            # At EOF    
-            if not self.line:
-                break
+        buf = self.buf
+        i   = self.line_no
+        
+        while i < len(buf):
     
-            # Strip /n
-            self.line = self.line[:-1]
-            logging.warning('design.txt: %s' % self.line)
-
-            # Skip empty lines
-            if len(self.line.replace(' ', '')) == 0:
-                continue
+            line = buf[i]
+            i += 1
+            
+            if self.compact:
+                tokens = line
+            else:
+                tokens = line.split()
                 
-            break
+            if trace:
+                logging.warning('design.txt: %s' % ' '.join(tokens))
+            
+            # Skip empty lines
+            if tokens:
+                self.line_no = i
+                self.current = tokens
+                return tokens
+        
+        # EOF
+        self.line_no = i
+        raise StopIteration
+        
+    #----
+    #
+    # The lines after the current line up to & including the first line
+    # starting with end, as lists of tokens. $$UNIVERSAL_INTEGER$$ types
+    # are changed to INTEGER
+    
+    def block(self, end):
         
-        if not self.line:
-            # EOF
-            self.f.close()    
-            raise StopIteration
+        buf   = self.buf
+        start = self.line_no
+        lines = []
         
-        self.current = self.line.split()
-        return self.current
+        for i in xrange(start, len(buf)):
+            
+            line = buf[i]
+            
+            if self.compact:
+                if line[0] == end:
+                    self.line_no = i + 1
+                    self.current = line
+                    return buf[start:i + 1]
+                continue
+            
+            if trace:
+                logging.warning('design.txt: %s' % line)
+            
+            tokens = line.split()
+            if not tokens:
+                continue
+                
+            if '$$UNIVERSAL_INTEGER$$' in line:
+                tokens = [universalInteger(token) for token in tokens]
+                
+            lines.append(tokens)
+            
+            if tokens[0] == end:
+                self.line_no = i + 1
+                self.current = tokens
+                return lines
+                
+        args = (end, len(buf))
+        raise Parsing_Exception, "Design Parsing Error: expected '%s' before line %d" % args
         
     #----
         
@@ -85,7 +158,7 @@ class Design():
     def __init__(self, design_file_name):
         
         self.file_name = design_file_name        
-        self.lines     = LineGenerator(file(design_file_name, 'r'))
+        self.lines     = LineGenerator(file(design_file_name, 'rb'))
         
         self.name      = ''
         
@@ -99,8 +172,28 @@ class Design():
         
         self.functions = [] # List of called subprogram function objects 
       
+    #----
+    #
+    # The parser allocates many small lists that all stay alive, the cyclic
+    # garbage collector is paused while it runs
+    
     def build(self):
         
+        enabled = gc.isenabled()
+        gc.disable()
+        
+        try:
+            self.doBuild()
+        finally:
+            if enabled:
+                gc.enable()
+                
+        logging.info('design.txt: %d lines' % self.lines.line_no)
+        
+    #----
+        
+    def doBuild(self):
+        
         global op_set
         
         # Parse design.txt
@@ -868,17 +961,11 @@ class Code():
     def build(self):
         logging.warning('Processing code for pid: %s' % self.process.pid)
             
-        self.code_buf = []
-        while True:
-             # Create a list of the code           
-            self.lines.next()
-            self.code_buf.append(self.lines.current)
-            if self.lines.expect('END_CODE'):                    
-                break            
-            
+        # Create a list of the code
+        self.code_buf = self.lines.block('END_CODE')
             
         # New code processing
-        cc = CodeOptimizer(self.code_buf, self.inst.constants, self.process)
+        cc = CodeOptimizer(self.code_buf, self.inst.constants, self.process, self.lines.compact)
         cc.analyze()                
         self.code = cc.to_VM_Op()
             
@@ -991,10 +1078,11 @@ class Code():
 
 class CodeOptimizer():
 
-    def __init__(self, code_buf, constants, proc):
+    def __init__(self, code_buf, constants, proc, compact=False):
         self.code_buf  = code_buf   # code as a list of tokenized z-code strings
         self.constants = constants  # constants dict
         self.proc      = proc
+        self.compact   = compact    # code of design.bin, see design_ir.compactCode
         
         self.pc        = 0          # code_buf index
         self.stack     = []         # For nested contexts
@@ -1035,10 +1123,7 @@ class CodeOptimizer():
                 except KeyError:
                     self.jmp_data[target] = [adrs]
                     
-            # Also change $$UNIVERSAL_INTEGER$$ to INTEGER
-            for j, token in enumerate(code):
-                if token.startswith('$$UNIVERSAL_INTEGER$$'):
-                    code[j] = token.replace('$$UNIVERSAL_INTEGER$$', 'INTEGER')
+            # $$UNIVERSAL_INTEGER$$ was changed to INTEGER by LineGenerator.block()
                     
             # Populate default buf_data
             self.buf_data.append([False, -1])
@@ -1072,7 +1157,8 @@ class CodeOptimizer():
        
     def analyze(self):
         
-        logging.warning('  CodeOptimizer.analyze()')
+        if trace:
+            logging.warning('  CodeOptimizer.analyze()')
         # Pass 1  -  Optimize calls to built-in functions
         wait_flag = False
         while True:
@@ -1087,7 +1173,8 @@ class CodeOptimizer():
                 
             if inst[1] == 'WAIT':
                 wait_flag = True
-                logging.error('%s WAIT at %s' % ( self.proc.name, inst[0]))
+                if trace:
+                    logging.error('%s WAIT at %s' % ( self.proc.name, inst[0]))
                                            
             if inst[1] == 'ENTER':
                 self.stack    = []
@@ -1118,7 +1205,8 @@ class CodeOptimizer():
                 
     def context(self):
         
-        logging.warning('  ENTERING CONTEXT %d @ %s' % (len(self.stack), self.get_inst(-1)[0]))
+        if trace:
+            logging.warning('  ENTERING CONTEXT %d @ %s' % (len(self.stack), self.get_inst(-1)[0]))
         self.stack.append(self.pc)
         
         # List of function call arg names
@@ -1159,8 +1247,9 @@ class CodeOptimizer():
                 # Set keep flag for this instruction
                 self.buf_data[fix_pc][0] = True
                 
-                if signature in std.method_map.keys():
-                    logging.warning('  Built_in')                    
+                if signature in std.method_map:
+                    if trace:
+                        logging.warning('  Built_in')                    
 
                 elif signature == '"-"(CONSTANT A : $$UNIVERSAL_INTEGER$$, CONSTANT B : $$UNIVERSAL_INTEGER$$) RETURN $$UNIVERSAL_INTEGER$$':
                     pass 
@@ -1173,7 +1262,8 @@ class CodeOptimizer():
                     # Here instructions that were not kept must be restored
                     # so a VHDL function or procedure call can be processed 
                     
-                logging.warning('  EXITING CONTEXT %d @ %d\n' % (len(self.stack)-1, self.pc-1))
+                if trace:
+                    logging.warning('  EXITING CONTEXT %d @ %d\n' % (len(self.stack)-1, self.pc-1))
                 self.stack.pop()
                 return
             
@@ -1211,8 +1301,15 @@ class CodeOptimizer():
     def do_rising(self, pc):        
           
         self.pc = pc
+        
+        # Offsets of the matched instructions, compact code has no NEW, MAP
+        # or formal parameter PUSH lines
+        if self.compact:
+            enter, value, equal, logic_and, jump = -2, 3, 4, 6, 8
+        else:
+            enter, value, equal, logic_and, jump = -5, 10, 12, 15, 17
 
-        inst = self.get_inst(-5)
+        inst = self.get_inst(enter)
         if inst[1] != 'ENTER':
             # Not what we are looking for
             return
@@ -1223,19 +1320,19 @@ class CodeOptimizer():
             return
         
         sig_name = inst[4]
-        inst = self.get_inst(10)
+        inst = self.get_inst(value)
         if ' '.join(inst[1:]) != 'PUSH STATIC VALUE 1':
             return
                 
-        inst = self.get_inst(12)
+        inst = self.get_inst(equal)
         if ' '.join(inst[1:4]) != 'CALL FUNCTION "="(CONSTANT':
             return
                 
-        inst = self.get_inst(15)
+        inst = self.get_inst(logic_and)
         if ' '.join(inst[1:4]) != 'CALL FUNCTION "AND"(CONSTANT':
             return
                 
-        inst = self.get_inst(17)
+        inst = self.get_inst(jump)
         if ' '.join(inst[1:3]) != 'JUMP NC':
             return
         
@@ -1244,13 +1341,13 @@ class CodeOptimizer():
         
         # Update code_buf
         p = pc-1
-        self.buf_data[p-4][0] = False
+        self.buf_data[pc+enter][0] = False
 
         while True:
             # Set keep to false
             self.buf_data[p][0] = False
             p += 1
-            if p == pc+17:
+            if p == pc+jump:
                 # Substitute JUMP NR instruction
                 self.code_buf[p] = ('%d JUMP NR %s %s' % (p, sig_name, address)).split()
                 break
@@ -1369,7 +1466,8 @@ class CodeOptimizer():
                        
         # Assemble instructions to corresponding vm_op classes            
     
-        logging.warning('Assemble instructions to method calls started')
+        if trace:
+            logging.warning('Assemble instructions to method calls started')
         tag = 'NOP'    
         for i, inst in enumerate(self.code_buf[:-1]):
             
@@ -1429,7 +1527,8 @@ class CodeOptimizer():
                 logging.warning('Assembler:  %s not implemented yet' % inst)
                 raise Exception
         
-        logging.warning('Assembler done')    
+        if trace:
+            logging.warning('Assembler done')    
         return self.code
 
     #-------------------
@@ -1470,7 +1569,8 @@ class CodeOptimizer():
         op = inst[2]
         
         if op == 'CREATE':
-            logging.warning('>>> RangeCreateOp(%s)' % inst)
+            if trace:
+                logging.warning('>>> RangeCreateOp(%s)' % inst)
             self.code.append(RangeCreateOp(inst))
          
         elif op == 'APPLY':
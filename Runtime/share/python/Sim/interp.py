@@ -8,9 +8,20 @@
 
 # Project file imports
 from design_parser import Design, Parsing_Exception
-from sim_events import ComparableEvent, SignalEvent, DelayEvent
+from sim_events import ComparableEvent, DelayEvent, Driver, RangeDriver, driverKey
 from PyModule import PyModule
 from vcd_dump import IDchar, VCD_File
+from scheduler import makeScheduler
+from sim_time import fsPerTick, ticksPerNs
+from value_store import ValueStore
+
+import ir
+import codegen
+import tier
+import peephole
+import object_store
+import artifact
+import build_jobs
 
 # Needed by bytecode virtual machines
 from std import StdLogic, StdLogicVector, SLVRange, SLVRange_bc, SLVRange_bc2, SLVRange_bc3 ,binary_op
@@ -19,7 +30,6 @@ from std import StdLogic, StdLogicVector, SLVRange, SLVRange_bc, SLVRange_bc2, S
 import stackless as ss
 import sys, os, logging
 
-from heapq       import heappush, heappop
 from collections import deque
 from time        import clock
 from dis         import dis, disassemble
@@ -37,9 +47,6 @@ import types
 
 python_version = '.'.join(str(x) for x in version_info[:2])
 
-# For serialization
-import pickle as g_pickle
-
 #------------------------------------------------------------------------------
 #
 # Exception class for SimBuilder errors
@@ -49,67 +56,77 @@ class Simulation_Exception(Exception):
 
 #------------------------------------------------------------------------------
 #
-# Exception class for sim.queue markers
-
-class MarkerException(Exception):
-    pass
-
-#------------------------------------------------------------------------------
-#
-# Exception class for sim.queue StopEvent
-
-class StopException(Exception):
-    pass
-
-#------------------------------------------------------------------------------
-#
-# Class for simulation serialization / de-serialization
+# Class for simulation serialization / de-serialization, design.ser is a
+# memory mapped artifact (see artifact.py)
 
 class Serializer(object):
   
     def __init__(self):
                 
-        self.signals   = []
-        self.processes = []
+        self.signals   = []         # signals, a SignalTable once loaded
+        self.processes = []         # BytecodeProcess objects by pid
         self.modules   = []
-        self.functions = []
-        self.hierarchy = None
+        self.functions  = []
+        self.hierarchy  = None      # loaded by loadHierarchy()
+        self.resolution = 'ns'
+        self.hot_threshold = tier.hot_threshold
+        
+        self.sensitivity = {}       # sid -> list of pids
+        
+        self.reader = None          # artifact.Reader of design.ser
                   
     #----
     
     def save(self):
-                
-        jpk_file  = open('design.ser', 'wb')
-               
-        container = {}         
-        container['signals']   = self.signals
-        container['modules']   = self.modules 
-        container['processes'] = self.processes
-        
-        container['functions'] = self.functions
-        container['hierarchy'] = self.hierarchy
-         
-        # Serialize the container object
-        g_pickle.dump(container, jpk_file)                              
-        jpk_file.close() 
+        artifact.save('design.ser', self)
 
     #----
+    #
+    # Load the settings, signals & processes are loaded when they are used
  
     def load(self):
 
-        jpk_file = open('design.ser', 'rb')
-        container = g_pickle.load(jpk_file)                                        
-        jpk_file.close()
+        try:
+            self.reader = artifact.Reader('design.ser')
+        except ValueError, msg:
+            raise Simulation_Exception, 'design.ser not loaded: %s, rebuild it' % msg
+            
+        settings = self.reader.settings()
+        
+        self.modules   = settings['modules']       
+        self.functions = settings['functions']
         
-        self.signals   = container['signals']
-        self.modules   = container['modules']       
-        self.processes = container['processes']
+        self.resolution = settings['resolution']
+        self.hot_threshold = settings['hot_threshold']
         
-        self.functions = container['functions']
-        self.hierarchy = container['hierarchy']
+        self.sensitivity = settings['sensitivity']
+        
+        self.processes = [BytecodeProcess.unloaded(self.reader, pid) for pid in
+                          xrange(self.reader.n_processes)]
         
         print "serializer.load done"
         print
+        
+    #----
+    #
+    # Values of the signal table & the signals of SimExe sim
+    
+    def loadSignals(self, sim):
+        
+        reader = self.reader
+        store  = ValueStore.fromTable(reader.section('values'), reader.offset, reader.width)
+        self.signals = artifact.SignalTable(reader, sim, store)
+        
+        return store, self.signals
+        
+    #----
+    
+    def loadHierarchy(self):
+        
+        if self.hierarchy == None and self.reader != None:
+            self.hierarchy = self.reader.hierarchy()
+            
+        return self.hierarchy
 
 #------------------------------------------------------------------------------
 #
@@ -117,15 +134,29 @@ class Serializer(object):
 
 class SimExe(object):
     
+    # scheduler is 'wheel' (timing wheel) or 'heap' (reference heapq queue)
+    #
+    # Times are integer ticks, the tick size is the resolution saved
+    # in design.ser by SimBuilder
     
-    def __init__(self):
+    def __init__(self, scheduler='wheel'):
         
         self.vm_list    = []
         self.current_vm = None         
-        self.queue      = []
+        self.scheduler  = scheduler
+        self.queue      = None         # Setup by deserialize()
+        self.store      = None         # ValueStore, setup by deserialize()
+        self.next_delta = []           # events for the next delta cycle
         
-        self.time       = 0.0 
-        self.runtime    = 0.0
+        self.resolution   = 'ns'
+        self.fs_per_tick  = fsPerTick(self.resolution)
+        self.ticks_per_ns = ticksPerNs(self.resolution)
+        
+        self.hot_threshold = tier.hot_threshold
+        
+        self.time       = 0 
+        self.runtime    = 0
+        self.stop_time  = 0
         
         self.stepping   = False        # If True, single-step VMs
         
@@ -138,6 +169,9 @@ class SimExe(object):
         self.hierarchy  = None
         
         self.current_cycle = 0
+        
+        self.drivers    = {}           # id(signal) -> Drivers of the signal
+        self.dropped    = 0            # redundant assignments, see Driver.assign
                                                   
     #-------------------------------------------------------
     #
@@ -169,17 +203,26 @@ class SimExe(object):
         
         self.serial.load()
         
-        # Deserialize signals 
-        self.signals = self.serial.signals
+        # Setup the time base & event queue before testbench setup uses them
+        self.resolution   = self.serial.resolution
+        self.hot_threshold = self.serial.hot_threshold
+        self.fs_per_tick  = fsPerTick(self.resolution)
+        self.ticks_per_ns = ticksPerNs(self.resolution)
         
-        for sig in self.signals:
-            sig.initialize(self)
+        # One wheel slot per ns
+        if self.scheduler == 'wheel':
+            self.queue = makeScheduler('wheel', width=self.ticks_per_ns)
+        else:
+            self.queue = makeScheduler(self.scheduler)
+        
+        # Signal values are one sid indexed store, a signal is created
+        # & initialized when its sid is first used
+        self.store, self.signals = self.serial.loadSignals(self)
         
-        # Deserialize processes        
+        # Processes, loaded when they are started
         self.testProcesses = self.serial.processes
         
-        # Deserialize instance hierarchy info.
-        self.hierarchy = self.serial.hierarchy
+        # The instance hierarchy is loaded by VCD_open
         
 #         print
 #         print 'Deserialized hierarchy:'
@@ -204,35 +247,59 @@ class SimExe(object):
         if self.vcd != None:
             self.vcd.GenerateHeader()
 
-        # Setup stop time event
+        # Setup stop time
         if time != None:
-            heappush(self.queue, StopEvent(self, time + self.time))
+            self.stop_time = self.nsToTicks(time) + self.time
         else:
-            heappush(self.queue, StopEvent(self, self.runtime + self.time))
+            self.stop_time = self.runtime + self.time
                     
-        # Setup vm_list with bytecodeProcesses
+        # Setup vm_list with bytecodeProcesses, testProcesses are in pid order
                          
-        bytecodeProcesses = [None for i in range(len(self.testProcesses))]
-        for k, p in self.testProcesses.items():
-            bytecodeProcesses[p.pid] = p
-            
-        self.vm_list = bytecodeProcesses + self.vm_list
+        self.vm_list = self.testProcesses + self.vm_list
 
         #===============================================
         
         # Initialize virtual machines          
         for vm in self.vm_list:
             vm.run_start(self)
+            
+        # Register processes with static sensitivity lists
+        for sid, pids in self.serial.sensitivity.items():
+            waiting = self.signals[sid].waiting
+            for pid in pids:
+                waiting.add(self.vm_list[pid])
                   
         # Setup a start events for all VMs
-        heappush(self.queue, StartEvent(self.vm_list))                  
+        self.queue.push(StartEvent(self.vm_list))                  
 
+    #----
+    #
+    # Log how many tiered processes were compiled, the rest stayed cold
+    
+    def tierReport(self):
+        
+        tiered = [vm for vm in self.vm_list if isinstance(vm, BytecodeProcess) and
+                  vm.activations != None]
+        if len(tiered) == 0:
+            return
+        
+        compiled = [vm for vm in tiered if vm.text_bc == None]
+        args = (len(compiled), len(tiered), self.hot_threshold)
+        logging.info('TIERED: %d of %d processes compiled, threshold %d activations' % args)
+        
+        for vm in tiered:
+            if vm.text_bc != None:
+                logging.info('  interpreted: %s, %d activations' % (vm.vm_name(), vm.activations))
+        
     #----
     
     def run(self):
         
         # Run simulation
         self.processEvents()
+        self.tierReport()
+        
+        logging.info('DROPPED: %d zero delay assignments of the current value' % self.dropped)
         
         # Simulation done        
         if self.vcd:
@@ -240,11 +307,22 @@ class SimExe(object):
             self.vcd.close()
             self.vcd = None
                       
+        self.next_delta = []
         while len(self.queue):
-            evt = heappop(self.queue)
+            evt = self.queue.pop()
 #             logging.info('   event %s, time: %.3f' % (evt, evt.time))                                   
      
      #----       
+    #
+    # Event processing follows the VHDL simulation cycle. Each delta cycle
+    # has a signal update phase, where the events in the current delta are
+    # applied, then a process execution phase, where the processes woken by
+    # those updates are resumed. Events scheduled for the current time go to
+    # next_delta, everything later goes to the scheduler (sim.queue).
+    #
+    # cycle numbers every delta cycle of the simulation, it is not reset when
+    # time advances. Signals stamp events with it, so 'EVENT & edge tests 
+    # are a single compare with current_cycle.
         
     def processEvents(self):
         
@@ -252,16 +330,13 @@ class SimExe(object):
         
         try:
             
-            evt = heappop(self.queue)
+            evt = self.queue.pop()
             self.time = evt.time
 
             if (self.vcd != None):
                 self.vcd.genInitial(self.signals)
             
             vm_list = evt.operate(0)
-            if vm_list == None:
-                # Got a stop event
-                return
             
             for vm in vm_list:
                 vm.channel.send(None)
@@ -272,7 +347,7 @@ class SimExe(object):
             raise Exception
         
         except RuntimeError:
-            logging.info('RuntimeError in process %s at %.3f' % (vm.name, evt.time))
+            logging.info('RuntimeError in process %s at %d' % (vm.name, evt.time))
             raise Exception
                     
         except UnboundLocalError, msg:
@@ -283,59 +358,67 @@ class SimExe(object):
         #---------------------------------------------
         # Processing for all events after first event
         #---------------------------------------------
-                      
-        heappush(self.queue, MarkerEvent(self.time))        
+        
+        queue      = self.queue
+        stop_time  = self.stop_time
         resume_set = set()
+        cycle      = 0
+        
         self.current_cycle = 0
         
+        # The first delta cycle after startup is cycle 0
+        current = self.next_delta
+        self.next_delta = []
+        
         try:
                        
             while True:
                 
-                #---------------------------------------------                                                
-                # accumulate events until a marker is reached
-                #---------------------------------------------
-
-                while True:
+                if current:
+                    
+                    #--------------------
+                    # Signal update phase
+                    #--------------------
                     
-                    try:
-                        evt = heappop(self.queue)
-                        resume_set = resume_set.union(set(evt.operate(self.current_cycle)))
+                    for evt in current:
+                        resume_set.update(evt.operate(cycle))
                         
-                    except MarkerException:                                                
-                        break    
+                    #-------------------------
+                    # Process execution phase
+                    #-------------------------
                     
-                #-------------
-                # Now run VMs
-                #-------------
+                    for vm in resume_set:
+                        vm.channel.send(None)                                            
+                        vm.wakeups = []
+                                          
+                    resume_set.clear()
                 
-                # Reset value used to keep signal events in FIFO order in event queue  
-                SignalEvent.evt_id  = 1
-                                           
-                for vm in resume_set:
-                    vm.channel.send(None)                                            
-                    vm.wakeups = []
-                                      
-                resume_set = set()                        
+                #--------------------------
+                # Select next delta or time
+                #--------------------------
                 
-                evt = self.queue[0]                
-                if not isinstance(evt, StopEvent):                
-                    heappush(self.queue, MarkerEvent(evt.time))
+                if self.next_delta:
+                    # Another delta cycle at the current time
+                    current = self.next_delta
+                    self.next_delta = []
                     
-                if evt.time > self.time:
-                    self.time = evt.time
-                    # Reset cycle counter 
-                    self.current_cycle = 0
                 else:
-                    # Increment cycle count
-                    self.current_cycle += 1
+                    if not len(queue):
+                        break
+                    
+                    time = queue.peek().time
+                    if time > stop_time:
+                        print
+                        print 'Simulation done (StopEvent)'
+                        print
+                        return
+                    
+                    current   = queue.popTime()
+                    self.time = time
+                    
+                cycle += 1
+                self.current_cycle = cycle
                 
-        except StopException:
-            print
-            print 'Simulation done (StopEvent)'
-            print
-            return
-        
         except RuntimeError:
             # Occurs at end of simulation when there is nothing to run
             # print 'RuntimeError'
@@ -345,10 +428,33 @@ class SimExe(object):
         print 'Simulation done'
         print
         
+    #----
+    #
+    # Put an event in the next delta cycle, or on the queue if it is in the future
+    
+    def schedule(self, evt):
+        
+        if evt.time == self.time:
+            self.next_delta.append(evt)
+        else:
+            self.queue.push(evt)
+        
     #----
        
     def run_time(self, t):
-        self.runtime = float(t)
+        self.runtime = self.nsToTicks(t)
+                              
+    #----
+    #
+    # Convert between ns (used by Python testbenches) & simulation ticks
+    
+    def nsToTicks(self, t):
+        return int(round(t * self.ticks_per_ns))
+                              
+    #----
+    
+    def timeNs(self):
+        return self.time / float(self.ticks_per_ns)
                               
     #----
         
@@ -360,7 +466,8 @@ class SimExe(object):
             f = open(file_name, 'w')
                       
         self.vcd_file_name = file_name            
-        self.vcd = VCD_File(self.hierarchy, self.signals, f)
+        self.hierarchy = self.serial.loadHierarchy()
+        self.vcd = VCD_File(self.hierarchy, self.signals, f, self.resolution)
         
         return self.vcd
                                                                 
@@ -398,19 +505,14 @@ class SimExe(object):
         
         print 'QUEUE DUMP (in pop order)'
         
-        dq = self.queue[:]
-        while True:
-            try:
-                evt = heappop(dq)
-                print '  %s' % evt
-            except:
-                break
+        for evt in self.next_delta + self.queue.events():
+            print '  %s' % evt
         print
                                        
     #----
         
     def listQueue(self):           
-        logging.info('SIM %.2f queue: %s' % (self.time, self.queue))
+        logging.info('SIM %d queue: %s' % (self.time, self.queue.events()))
 
 # For import by python testbench
 Simulation = SimExe
@@ -419,7 +521,25 @@ Simulation = SimExe
 
 class SimBuilder(object):
     
-    def __init__(self, design, project_path):
+    # resolution is the simulation time tick, one of 'fs', 'ps' or 'ns'
+    #
+    # optimize runs the IR optimizer passes on each process (see ir.py),
+    # dump_ir writes the optimized IR & the per pass stats to ir_dump.txt
+    #
+    # backend is 'bytecode' (byteplay) or 'source' (codegen.py), the source
+    # of each process is written to src_path
+    #
+    # The code of each process is saved in the object store at obj_path, a
+    # process is only compiled when its key changed (see object_store.py)
+    #
+    # tiered leaves bytecode processes unassembled, they are interpreted until
+    # activated hot_threshold times and then compiled (see tier.py)
+    #
+    # jobs > 1 compiles the processes with that many worker processes (see
+    # build_jobs.py)
+    
+    def __init__(self, design, project_path, resolution='ns', optimize=True, dump_ir=False,
+                 backend='bytecode', tiered=False, hot_threshold=tier.hot_threshold, jobs=1):
         
         self.design      = design                
         self.signals     = design.signals        
@@ -427,8 +547,33 @@ class SimBuilder(object):
         self.pyModules   = []           # List of PyModule objects       
         self.proj_path   = project_path         
         self.lib_dict    = {}        
+        self.inline_ops  = {}           # signature -> table, see ProcessBuilder.inlineScalarOps
         self.hierarchy   = None
         
+        self.resolution  = resolution
+        self.fs_per_tick = fsPerTick(resolution)
+        
+        self.optimize    = optimize
+        self.dump_ir     = dump_ir
+        
+        if backend not in ['bytecode', 'source']:
+            raise ValueError('Unknown backend %s' % backend)
+        self.backend     = backend
+        self.src_path    = 'sim_src'
+        self.obj_path    = 'sim_obj'
+        
+        self.tiered        = tiered
+        self.hot_threshold = hot_threshold
+        
+        if jobs > 1 and not build_jobs.available():
+            logging.warning('Build jobs need os.fork, compiling processes serially')
+            jobs = 1
+        self.jobs        = jobs
+        
+        self.shared      = {}           # code key -> ProcessBuilder, see ProcessBuilder.share
+        self.peephole    = {}           # peephole optimizer stats
+        self.objects     = {}           # process key -> (ProcessBuilder, entry), see ProcessBuilder.loadObject
+        
         self.log_file    = None
         
         #-----------------------------------------------------
@@ -460,6 +605,7 @@ class SimBuilder(object):
             reg = getattr(module, 'registerAll')
             lib_dict = reg(module)
             self.lib_dict = lib_dict
+            self.inline_ops.update(getattr(module, 'inline_ops', {}))
             
             # Add functions to interp module namespace           
             globals_dict = globals()
@@ -507,12 +653,110 @@ class SimBuilder(object):
                     vm = ProcessBuilder(self, inst, proc)
                     self.vm_list.append(vm)
                     
+        if self.jobs > 1:
+            self.buildJobs()
+                    
         # Setup the DesignHierarchy object for vcd_dump
         
         self.hierarchy = DesignHierarchy(self.design.instances[0], None)
+        
+        if self.optimize:
+            self.irReport()
+            
+            if self.peephole:
+                for line in peephole.report(self.peephole):
+                    logging.info(line)
+            
+        self.shareReport()
+        self.objectReport()
 
         #  self.hierarchy.listAll()      
                                         
+    #----
+    #
+    # Compile the processes that were not loaded from the object store with
+    # build jobs. A process with the key of a process compiled by a job loads
+    # its code afterwards, like a serial build
+    
+    def buildJobs(self):
+        
+        builders = [vm for vm in self.vm_list if not vm.cached]
+        
+        first = {}
+        for vm in builders:
+            first.setdefault(vm.key, vm)
+        jobs = [vm for vm in builders if first[vm.key] is vm]
+        
+        if len(jobs) == 0:
+            return
+            
+        for vm, result in zip(jobs, build_jobs.run(jobs, self.jobs)):
+            vm.applyJob(result)
+            for item, n in result['peephole'].items():
+                self.peephole[item] = self.peephole.get(item, 0) + n
+                
+        for vm in builders:
+            if first[vm.key] is not vm and not vm.loadObject(vm.key):
+                vm.compile()
+                
+        logging.info('JOBS: %d processes compiled by %d jobs' % (len(jobs), self.jobs))
+        
+    #----
+    #
+    # Log the processes that use the code of an instance of the same module
+    
+    def shareReport(self):
+        
+        builders = [vm for vm in self.vm_list if isinstance(vm, ProcessBuilder)]
+        shared   = [vm for vm in builders if vm.shared != None]
+        
+        args = (len(builders) - len(shared), len(builders))
+        logging.info('SHARED: %d code objects for %d processes' % args)
+        
+        for vm in shared:
+            logging.info('  %s uses %s' % (vm.vm_name(), vm.shared.vm_name()))
+        
+    #----
+    #
+    # Log the processes loaded from the object store and those compiled
+    
+    def objectReport(self):
+        
+        builders = [vm for vm in self.vm_list if isinstance(vm, ProcessBuilder)]
+        compiled = [vm for vm in builders if not vm.cached]
+        
+        args = (len(builders) - len(compiled), len(compiled))
+        logging.info('OBJECTS: %d hits, %d misses' % args)
+        
+        for vm in compiled:
+            logging.info('  compiled %s' % vm.vm_name())
+        
+    #----
+    #
+    # Log the IR optimizer stats, and write them with the IR if dump_ir is set
+    
+    def irReport(self):
+        
+        procs   = [vm.ir for vm in self.vm_list if vm.ir != None]
+        skipped = [vm.vm_name() for vm in self.vm_list if vm.ir == None and not vm.cached]
+        report  = ir.report(procs, skipped)
+        
+        for line in report:
+            logging.info(line)
+        
+        if self.dump_ir:
+            
+            lines = report[:]
+            for proc in procs:
+                lines.append('')
+                lines.extend(proc.dump())
+                
+            dump_file = open('ir_dump.txt', 'w')
+            dump_file.write('\n'.join(lines) + '\n')
+            dump_file.close()
+            
+            print '\n'.join(report)
+                                        
     #---- Serialize simulation objects
         
     def serialize(self):
@@ -521,18 +765,30 @@ class SimBuilder(object):
         self.serial.signals = self.signals        
         self.serial.modules = self.pyModules
         
-        testProcesses = {}
+        # BytecodeProcess objects in pid order
         vm_processes = [v for v in self.vm_list if isinstance(v, ProcessBuilder)]
+        self.serial.processes = sorted([vm.getProcess() for vm in vm_processes],
+                                       key=lambda p: p.pid)
+        
+        # Build the sid to process fan-out table for static sensitivity lists
+        sensitivity = {}
         for vm in vm_processes:
-            # Fill testProcesses with BytecodeProcess objects
-            testProcesses[vm.name] = vm.getProcess()
-        self.serial.processes = testProcesses
+            if vm.sensitivity != None:
+                for sid in vm.sensitivity:
+                    sensitivity.setdefault(sid, []).append(vm.id)
+        self.serial.sensitivity = sensitivity
         
         # Save library function info
         self.serial.functions = self.function_info
         
         # Save the design instance hierarchy
         self.serial.hierarchy = self.hierarchy 
+        
+        # Save the time resolution used for bytecode delay constants
+        self.serial.resolution = self.resolution
+        
+        # Save the activations before a tiered process is compiled
+        self.serial.hot_threshold = self.hot_threshold
 
         # Save the serializer object        
         self.serial.save() 
@@ -544,60 +800,21 @@ class SimBuilder(object):
 #  . Python testbench process
 
 class StartEvent(ComparableEvent):
+    
+    priority = 0
+    
+    __slots__ = ('vms', 'time')
         
     def __init__(self, vms):
         
         self.vms      = vms
-        self.time     = 0.0
-        self.priority = 0         
+        self.time     = 0
         
     #----
     
     def operate(self, cycle):
         return self.vms
        
-#------------------------------------------------------------------------------
-
-class MarkerEvent(ComparableEvent):
-
-    __slots__ = ('time', 'priority', 'operate', '__cmp__', '__str__')
-        
-    def __init__(self, time):
-               
-        self.time     = time
-        self.priority = 10003 # After signal and delay events
-        
-    #----
-    
-    def operate(self, cycle):
-        raise MarkerException
-     
-    #----
-    
-    def __str__(self):
-        return 'MarkerEvent: %.2f ns' % self.time
-       
-#------------------------------------------------------------------------------
-
-class StopEvent(ComparableEvent):
-        
-    def __init__(self, sim, when):       
-        self.time     = float(when) + sim.time
-        self.eid      = -1
-        self.name     = 'StopEvent'
-        self.sim      = sim
-        self.priority = 10004 # after all other events
-
-    #----
-    
-    def operate(self, cycle):
-        raise StopException
-
-    #----
-    
-    def __str__(self):
-        return 'StopEvent: %.2f ns' % self.time
-
 #------------------------------------------------------------------------------
 #
 # Emulates stackless.channel.send
@@ -612,6 +829,38 @@ class VMchannel(object):
     def send(self, message):
         self.vm.bc_iterator.next()
         
+#------------------------------------------------------------------------------
+#
+# Put in signal.waiting by a process waiting on a dynamic set of signals,
+# a new token for each wait, and in the DelayEvent of the wait's timeout.
+# Waking the process bumps its generation, which cancels the other tokens 
+# of the wait that are already in the resume set of the delta or still in
+# the queue, and removes its tokens from the waiting sets.
+
+class WaitToken(object):
+    
+    __slots__ = ('vm', 'gen', 'channel', 'wakeups')
+    
+    def __init__(self, vm):
+        self.vm      = vm
+        self.gen     = vm.gen
+        self.channel = self
+        self.wakeups = []
+        
+    # ----
+    
+    def send(self, message):
+        
+        vm = self.vm
+        if self.gen == vm.gen:
+            vm.gen += 1
+            
+            for sig, token in vm.tokens:
+                sig.waiting.discard(token)
+            vm.tokens = []
+            
+            vm.channel.send(message)
+        
 #------------------------------------------------------------------------------
 #
 # Prototype function containing vm bytecode
@@ -619,6 +868,11 @@ class VMchannel(object):
 def bytecode_vm(vm, signals, variables):    
     pass
 
+# Prototype for a tiered process, started at WAIT number entry (see tier.py)
+
+def tiered_vm(vm, signals, variables, entry=0):
+    pass
+
 #------------------------------------------------------------------------------
 #
 # equality function for including StdLogic & SLV in Python code.co_consts
@@ -632,6 +886,57 @@ def const_equality(existing, new):
     
 # Patch this into BytePlay
 bp.extended_eq = const_equality
+
+#------------------------------------------------------------------------------
+#
+# Keys for sharing code between processes (see ProcessBuilder.share). Consts
+# are compared by value like const_equality, a module level function by its
+# name, anything else only equals itself
+
+def constKey(const):
+    
+    if isinstance(const, (StdLogic, StdLogicVector)):
+        return (const.__class__.__name__, str(const.spec), tuple(const.getVal()))
+        
+    if isinstance(const, (tuple, list)):
+        return (const.__class__.__name__,) + tuple([constKey(c) for c in const])
+        
+    if isinstance(const, dict):
+        return ('dict',) + tuple(sorted([(constKey(k), constKey(v)) for k, v in const.items()]))
+        
+    if const == None or isinstance(const, (bool, int, long, float, str)):
+        return (const.__class__.__name__, const)
+        
+    # A module level function or class is the same in every build job
+    if isinstance(const, (types.FunctionType, types.ClassType, type)):
+        module = sys.modules.get(const.__module__)
+        if getattr(module, const.__name__, None) is const:
+            return ('global', const.__module__, const.__name__)
+            
+    return ('id', id(const))
+
+#----
+#
+# Labels are numbered in the order they are placed, several labels may
+# have the same zcode address
+
+def codeKey(text_bc):
+    
+    labels = {}
+    for op, arg in text_bc:
+        if isinstance(op, bp.Label):
+            labels[op] = len(labels)
+            
+    key = []
+    for op, arg in text_bc:
+        if isinstance(op, bp.Label):
+            key.append(('label', labels[op]))
+        elif isinstance(arg, bp.Label):
+            key.append((op, 'label', labels[arg]))
+        else:
+            key.append((op, constKey(arg)))
+            
+    return tuple(key)
                            
 #------------------------------------------------------------------------------
 #
@@ -736,7 +1041,10 @@ class ProcessBuilder(object):
     
     __slots__ = ('sim', 'inst', 'id', 'name', 'code', 'var_list', 'var_map',
                  'signals', 'bytecode', 'bc_labels', 'bc_iterator',
-                 'bytecode_vm', 'text_bc', 'f_names', 'called', 'ranges'
+                 'bytecode_vm', 'text_bc', 'f_names', 'called', 'ranges',
+                 'sensitivity', 'static_ops', 'int_ops', 'int_sids', 'ir',
+                 'source', 'sid_table', 'slots', 'shared', 'drivers', 'cached',
+                 'key', 'share_key'
                  )
                 
     def __init__(self, sim, inst, proc):
@@ -751,6 +1059,10 @@ class ProcessBuilder(object):
         self.code      = proc.code.code
         self.bytecode_vm = None
         self.bc_iterator = None
+        self.source      = None        # (file name, source, consts) for codegen
+        self.shared      = None        # ProcessBuilder whose code this process uses
+        self.share_key   = None        # code key of the process, see share
+        self.cached      = False       # code loaded from the object store
         
         # For bytecode assembler       
         self.signals     = sim.signals
@@ -771,9 +1083,6 @@ class ProcessBuilder(object):
                      
         links           = {}
         local_nodes     = self.inst.local_nodes
-        signal_ids      = set()
-        variable_ids    = set()
-        call_signatures = set() 
         
         # self.code is a list of vm_op classes
         for op in self.code:
@@ -783,7 +1092,6 @@ class ProcessBuilder(object):
                                                                     
                 node = local_nodes[op.key]    
                 sid  = node.sid
-                signal_ids.add(sid)
                     
                 # This is a Signal or LiteralConst object
                 op.object = self.sim.signals[sid]
@@ -799,13 +1107,7 @@ class ProcessBuilder(object):
                 sid       = var.sid
                 op.object = var
                 
-                variable_ids.add(sid)                
-                
-            # op is a CALL, keep track of signatures
-            elif op.__class__.__name__ == 'CallOp':
-                call_signatures.add(op.signature)
-                
-            # op is a RangeCreate, keep track of ranges
+            # op is a RangeCreate
             elif op.__class__.__name__ == 'RangeCreateOp':
                 
                 if op.klass == 'SIGNAL':
@@ -813,9 +1115,60 @@ class ProcessBuilder(object):
                     
                 elif op.klass == 'VARIABLE':
                     op.sid = self.var_map[op.target].sid
+        
+        # Use the code of a process built before with the same key
+        self.key = object_store.processKey(self, proc)
+        if self.loadObject(self.key):
+            return
+            
+        # Compiled by a build job, see SimBuilder.buildJobs
+        if self.sim.jobs > 1:
+            return
+            
+        self.compile()
+        
+    #----
+    #
+    # Optimize the code & generate the Python bytecode or source, the code
+    # is saved in the object store
+    
+    def compile(self):
+        
+        variable_ids    = set()
+        call_signatures = set() 
+        
+        keys, sids = object_store.signalKeys(self)
+        
+        # Optimize the code in the IR, see ir.py
+        if self.sim.optimize:
+            self.code, self.ir = ir.optimize(self)
+        else:
+            self.ir = None
+        
+        # Keep track of the variables & ranges used by the code, signals
+        # are bound by bindSignals
+        for op in self.code:
+            
+            if op.__class__.__name__ == 'PushVarOp':
+                variable_ids.add(op.object.sid)
                 
+            elif op.__class__.__name__ == 'RangeCreateOp':
                 self.ranges.add(op)
+                
+            elif op.__class__.__name__ == 'AssignOp' and op.target.__class__.__name__ == 'RangeCreateOp':
+                self.ranges.add(op.target)
+                
+        self.bindSignals()
                
+        self.prescaleDelays()
+        self.findSensitivity()
+        self.inlineScalarOps()
+        
+        # Keep track of signatures still called by the bytecode
+        for op in self.code:
+            if op.__class__.__name__ == 'CallOp' and not op.inline:
+                call_signatures.add(op.signature)
+                
         if len(call_signatures):
             self.called = [self.sim.lib_dict[fs].__name__ for fs in call_signatures]
             
@@ -824,17 +1177,326 @@ class ProcessBuilder(object):
         #----------------------------------------------------------------------
                                
         self.text_bc = None
-        self.buildBytecode(signal_ids, variable_ids)
+        
+        if self.sim.backend == 'source':
+            try:
+                self.buildSource(variable_ids)
+                
+            except codegen.CodegenError, msg:
+                logging.warning('%s built as bytecode: %s' % (self.vm_name(), msg))
+                self.buildBytecode(variable_ids)
+                
+        else:
+            self.buildBytecode(variable_ids)
+            
+        self.saveObject(self.key, dict(zip(sids, keys)))
+                         
+    #----
+    #
+    # The code refers to signals by slot, not by sid, so that every instance
+    # of a module has the same code and only its sid_table differs. Slots are
+    # numbered in the order signals are first used by the code.
+    #
+    # drivers are the (local, target local) of the fused assignments, the
+    # preamble binds each target's driver to its local
+    
+    def bindSignals(self):
+        
+        self.sid_table = []
+        self.slots     = {}
+        self.drivers   = []
+        
+        for op in self.code:
+            
+            name = op.__class__.__name__
+            if name == 'AssignOp':
+                target = op.target
+                name   = target.__class__.__name__
+            else:
+                target = op
+                
+            if name in ['PushSigOp', 'JumpNotRisingOp', 'ClockEdgeOp']:
+                sids = [target.object.sid]
+            elif name == 'RangeCreateOp' and target.klass != 'VARIABLE':
+                sids = [target.sid]
+            elif name == 'WaitSetOp':
+                sids = [sig.object.sid for sig in target.sigs]
+            else:
+                continue
+                
+            for sid in sids:
+                if sid not in self.slots:
+                    self.slots[sid] = len(self.sid_table)
+                    self.sid_table.append(sid)
+                    
+            if target is not op:
+                driver = (self.driverName(target), self.targetName(target))
+                if driver not in self.drivers:
+                    self.drivers.append(driver)
+                
+    #----
+    
+    def sigName(self, sid):
+        return 'sig__%d' % self.slots[sid]
+                
+    #----
+    #
+    # Fast locals of the target of a fused assignment & of its driver
+    
+    def targetName(self, target):
+        
+        if target.__class__.__name__ == 'RangeCreateOp':
+            return target.loc_name
+        return self.sigName(target.object.sid)
+    
+    #----
+    
+    def driverName(self, target):
+        return self.targetName(target) + '_drv'
+                
+    #----
+    #
+    # Delays in zcode are in femtoseconds. When a delay is a literal pushed
+    # just before the op that uses it, convert the literal to ticks here so
+    # that the bytecode needs no scaling at run time.
+    
+    def prescaleDelays(self):
+        
+        fs_per_tick = self.sim.fs_per_tick
+        
+        # A delay op that is a jump target may get its delay from elsewhere
+        targets = set()
+        for op in self.code:
+            targets.update(jumpTargets(op))
+        
+        prev = None
+        for op in self.code:
+            
+            name = op.__class__.__name__
+            if name == 'ScheduleDelayOp' or (name in ['PopOp', 'AssignOp'] and op.d_flag):
+                
+                op.prescaled = (prev.__class__.__name__ in ['PushLitOp', 'PushFoldedOp'] and 
+                                isinstance(prev.value, (int, long)) and
+                                int(op.label) not in targets)
+                
+                if op.prescaled:
+                    ticks, rem = divmod(prev.value, fs_per_tick)
+                    if rem:
+                        logging.warning('Delay of %d fs in %s truncated to %d %s' % 
+                                        (prev.value, self.name, ticks, self.sim.resolution))
+                    prev.delay_ticks = ticks
+                    
+            prev = op
                          
+    #----
+    #
+    # Detect a process with a static sensitivity list. This is a process with
+    # a single WAIT, preceded by PUSH SIGNAL / SCHEDULE EVENT pairs, and no
+    # other waits. Its signals are registered once by SimExe, and the pairs
+    # generate no bytecode. Other processes register with vm.waitOn() on 
+    # every activation. The IR optimizer fuses the pairs & the WAIT into a
+    # WaitSetOp, which is then only a yield.
+    
+    def findSensitivity(self):
+        
+        self.sensitivity = None
+        self.static_ops  = set()
+        
+        code  = self.code
+        names = [op.__class__.__name__ for op in code]
+        
+        if names.count('WaitSetOp') == 1:
+            
+            others = ['WaitOp', 'StopOp', 'ScheduleDelayOp', 'ScheduleEventOp']
+            if [name for name in names if name in others]:
+                return
+                
+            op = code[names.index('WaitSetOp')]
+            op.static = True
+            self.sensitivity = sorted(set([sig.object.sid for sig in op.sigs]))
+            return
+            
+        if 'WaitSetOp' in names:
+            return
+        
+        if names.count('WaitOp') != 1 or 'StopOp' in names or 'ScheduleDelayOp' in names:
+            return
+        
+        # Collect the PUSH SIGNAL / SCHEDULE EVENT pairs before the WAIT
+        i    = names.index('WaitOp')
+        sids = []
+        while i >= 2 and names[i-1] == 'ScheduleEventOp' and names[i-2] == 'PushSigOp':
+            sids.append(code[i-2].object.sid)
+            i -= 2
+        
+        if len(sids) != names.count('ScheduleEventOp'):
+            # There are other wakeups
+            return
+        
+        # A jump into the pairs would skip some registrations
+        first = int(code[i].label)
+        last  = int(code[names.index('WaitOp')].label)
+        for op in code:
+            for adrs in jumpTargets(op):
+                if first < adrs <= last:
+                    return
+        
+        self.sensitivity = sorted(set(sids))
+        self.static_ops  = set(range(i, names.index('WaitOp')))
+
+    #----
+    #
+    # Inline calls of the scalar std_ulogic functions in SimBuilder.inline_ops
+    # (AND/OR/XOR/NOT/=). An inlined ENTER CONTEXT pushes the look-up table
+    # and its CALL FUNCTION indexes it with the encoded operand values, so
+    # nested operations keep plain ints on the stack. A StdLogic result is
+    # only created where it is used by an op that is not inlined.
+    #
+    # Arguments are found by tracking the stack between ENTER CONTEXT and
+    # CALL FUNCTION. A call is not inlined if an op with an unknown stack
+    # effect is found.
+    #
+    #  int_ops  - indexes of ops whose std_ulogic result is converted to an int
+    #  int_sids - names of StdLogic signals & variables pushed as ints, and
+    #             of the clocks tested by a ClockEdgeOp
+
+    # (pops, pushes) for ops that can appear in function arguments
+    arg_effects = {
+        'PushSigOp'     : (0, 1),
+        'PushVarOp'     : (0, 1),
+        'PushLitOp'     : (0, 1),
+        'PushConstOp'   : (0, 1),
+        'IndexOp'       : (2, 1),
+        'AttributeOp'   : (1, 1),
+        'BinaryOp'      : (2, 1),
+        'BinaryEqualOp' : (2, 1),
+        'PushFoldedOp'  : (0, 1),
+        'LoadTempOp'    : (0, 1),
+        'StoreTempOp'   : (1, 1),
+    }
+
+    def inlineScalarOps(self):
+
+        self.int_ops  = set()
+        self.int_sids = set()
+
+        code       = self.code
+        names      = [op.__class__.__name__ for op in code]
+        inline_ops = self.sim.inline_ops
+
+        for i, name in enumerate(names):
+            if name == 'ClockEdgeOp':
+                self.int_sids.add(self.sigName(code[i].object.sid))
+
+        # Match each ENTER CONTEXT with its CALL FUNCTION
+        calls = {}
+        enter = []
+        for i, name in enumerate(names):
+            if name == 'EnterOp':
+                enter.append(i)
+            elif name == 'CallOp':
+                if not enter:
+                    return
+                calls[enter.pop()] = i
+
+        # Index of the op that produces each argument of the call at i
+        def arguments(i):
+
+            result = []
+            i += 1
+            while names[i] != 'CallOp':
+
+                if names[i] == 'EnterOp':
+                    # A nested call is a single argument
+                    i = calls[i]
+                    result.append(i)
+
+                elif names[i] in self.arg_effects:
+                    pops, pushes = self.arg_effects[names[i]]
+                    if len(result) < pops:
+                        return None
+                    result[len(result) - pops:] = [i] * pushes
+
+                else:
+                    return None
+
+                i += 1
+
+            return result
+
+        inlined = {}
+        for i, call in calls.items():
+
+            signature = code[call].signature
+            if signature not in inline_ops:
+                continue
+
+            args = arguments(i)
+            if args == None or len(args) != self.sim.lib_dict[signature].func_code.co_argcount:
+                continue
+
+            for op in (code[i], code[call]):
+                op.inline = True
+                op.table  = inline_ops[signature]
+
+            # A result that is not "=" is a StdLogic unless used by an inlined call
+            code[call].materialize = code[call].table != None
+            inlined[call] = args
+
+        # Convert the arguments of inlined calls to ints
+        for args in inlined.values():
+            for i in args:
+
+                op = code[i]
+                if i in inlined:
+                    op.materialize = False
+
+                elif names[i] == 'PushSigOp' and isinstance(op.object, StdLogic):
+                    op.as_int = True
+                    self.int_sids.add(self.sigName(op.object.sid))
+
+                elif names[i] == 'PushVarOp' and isinstance(op.object, StdLogic):
+                    op.as_int = True
+                    self.int_sids.add('var__%d' % op.object.sid)
+
+                elif names[i] in ['PushLitOp', 'PushConstOp', 'PushFoldedOp'] and isinstance(op.value, StdLogic):
+                    op.as_int = True
+
+                else:
+                    self.int_ops.add(i)
+
+    #----
+    #
+    # Generate the process as Python source (see codegen.py) and compile it.
+    # The source is written to SimBuilder.src_path
+    
+    def buildSource(self, var_ids):
+        
+        source, consts = codegen.generate(self, sorted(var_ids))
+        
+        # The header names the process, the function is shared
+        key = ('source', source[source.index('def vm_process'):], constKey(consts))
+        if self.share(key):
+            self.source = self.shared.source
+            return
+        
+        file_name = codegen.save(self.sim.src_path, self, source)
+        
+        self.source      = (file_name, source, consts)
+        self.bytecode_vm = codegen.compileSource(source, file_name, consts, globals())
+        
     #----
     
-    def buildBytecode(self, sig_ids, var_ids):
+    def buildBytecode(self, var_ids):
         
         #---- Local function to return a prototype bytecode_vm function
         
         def proto_func():
             
-            f = bytecode_vm
+            if self.sim.tiered:
+                f = tiered_vm
+            else:
+                f = bytecode_vm
             vm = types.FunctionType(f.func_code, f.func_globals, name = f.func_name,
                   argdefs = f.func_defaults,
                   closure = f.func_closure
@@ -849,6 +1511,14 @@ class ProcessBuilder(object):
         # Create a dict mapping jump targets to bytecode Label objects
         # Also, track ENTER and EXIT CONTEXT for python call optimization        
         for zc in self.code:
+            
+            if zc.__class__.__name__ == 'SwitchOp':
+                # Setup only label 1 for each arm of a SWITCH
+                for adrs in zc.targets:
+                    if not adrs in self.bc_labels.keys():
+                        self.bc_labels[adrs] = (bp.Label(adrs, 1), None)
+                continue
+                
             try:
                 # Only jump zcodes have a new_pc attribute
                 adrs = zc.new_pc
@@ -872,22 +1542,33 @@ class ProcessBuilder(object):
 
         text_bc = []
         
-        # Generate code for fast signal access
-        for sid in sig_ids:
+        # Generate code for fast signal access, signals are the instance's
+        # signals in slot order (see bindSignals)
+        for sid in self.sid_table:
             text_bc.append(('LOAD_FAST', 'signals'))
-            text_bc.append(('LOAD_CONST', sid))
+            text_bc.append(('LOAD_CONST', self.slots[sid]))
             text_bc.append(('BINARY_SUBSCR', None))
             # Signal is at TOS
-            text_bc.append(('STORE_FAST', 'sig__%d' % sid))
+            text_bc.append(('STORE_FAST', self.sigName(sid)))
         
         # Generate code for fast variable access
-        for sid in var_ids:
+        for sid in sorted(var_ids):
             text_bc.append(('LOAD_FAST', 'variables'))
             text_bc.append(('LOAD_CONST', sid))
             text_bc.append(('BINARY_SUBSCR', None))
             # Signal is at TOS
             text_bc.append(('STORE_FAST', 'var__%d' % sid))
 
+        # Generate code for fast access to the encoded value of StdLogic
+        # signals & variables used by inlined operations
+        for name in sorted(self.int_sids):
+            text_bc.append(('LOAD_FAST', name))
+            text_bc.append(('LOAD_ATTR', '_buf'))
+            text_bc.append(('STORE_FAST', name + '_buf'))
+            text_bc.append(('LOAD_FAST', name))
+            text_bc.append(('LOAD_ATTR', '_off'))
+            text_bc.append(('STORE_FAST', name + '_off'))
+
         # Generate code for fast function access
         for func_name in self.called:
             text_bc.append(('LOAD_GLOBAL', func_name))
@@ -911,10 +1592,11 @@ class ProcessBuilder(object):
                 
             if op.klass == 'VARIABLE': 
                 text_bc.append(('LOAD_FAST', 'variables'))                
+                text_bc.append(('LOAD_CONST', op.sid))
             else:
                 text_bc.append(('LOAD_FAST', 'signals'))
+                text_bc.append(('LOAD_CONST', self.slots[op.sid]))
             
-            text_bc.append(('LOAD_CONST', op.sid))
             text_bc.append(('BINARY_SUBSCR', None))
             # TOS = SLVRange target signal
             
@@ -926,13 +1608,37 @@ class ProcessBuilder(object):
             # TOS = SLVRange instance
             
             text_bc.append(('STORE_FAST', op.loc_name))
+            
+        # Generate code for the drivers of fused assignments
+        for name, target in self.drivers:
+            text_bc.append(('LOAD_FAST', 'vm'))
+            text_bc.append(('LOAD_ATTR', 'driver'))
+            text_bc.append(('LOAD_FAST', target))
+            text_bc.append(('CALL_FUNCTION', 1))
+            # TOS = assign method of the driver
+            text_bc.append(('STORE_FAST', name))
+            
+        # The simulator, for the delta cycle tested by ClockEdgeOp
+        if 'ClockEdgeOp' in [op.__class__.__name__ for op in self.code]:
+            text_bc.append(('LOAD_FAST', 'vm'))
+            text_bc.append(('LOAD_ATTR', 'sim'))
+            text_bc.append(('STORE_FAST', 'sim_lcl'))
+        
+        # A tiered process resumes after WAIT number entry, the entry code
+        # is inserted here once the WAITs have labels
+        entry_pc = len(text_bc)
+        resume   = []
         
         # Generate code for process loop             
         opc = 0
         for ad, op in enumerate(self.code):
             # Translate a single zcode op
             
-            if str(op.__class__.__name__) == 'CallOp':
+            if ad in self.static_ops:
+                # Static sensitivity, registered once by SimExe
+                adrs, text = int(op.label), []
+            
+            elif str(op.__class__.__name__) == 'CallOp':
                 adrs, text = op.newGenBytecode(self)
                 
             elif op.__class__.__name__ == 'EnterOp':
@@ -940,6 +1646,10 @@ class ProcessBuilder(object):
                                                 
             else:
                 adrs, text = op.genBytecode(self)
+                
+            if ad in self.int_ops:
+                # std_ulogic argument of an inlined operation
+                text = text + to_int_bc
             
             opc += 1
             
@@ -966,6 +1676,27 @@ class ProcessBuilder(object):
 
             # Append generated text bytecode to the text bytecode for this VM
             text_bc += text
+            
+            if self.sim.tiered and op.__class__.__name__ in ['WaitOp', 'WaitSetOp']:
+                label = bp.Label(int(op.label), 3)
+                text_bc.append((label, None))
+                resume.append(label)
+        
+        entry = []
+        for k, label in enumerate(resume):
+            entry.append(('LOAD_FAST', 'entry'))
+            entry.append(('LOAD_CONST', k + 1))
+            entry.append(('COMPARE_OP', '=='))
+            entry.append(('POP_JUMP_IF_TRUE', label))
+        text_bc[entry_pc:entry_pc] = entry
+        
+        if self.sim.optimize:
+            text_bc = peephole.optimize(text_bc, globals(), self.sim.peephole)
+        
+        if self.share(codeKey(text_bc)):
+            self.text_bc  = self.shared.text_bc
+            self.bytecode = self.shared.bytecode
+            return
                     
         # save a copy of the text_bc for persistance
         self.text_bc = text_bc[:]
@@ -974,8 +1705,154 @@ class ProcessBuilder(object):
         bytecode.code = bp.encode(text_bc)        
         self.bytecode = bytecode.code
         
-        self.bytecode_vm.func_code = bytecode.to_code()
+        # A tiered process is assembled when it is hot, BytecodeProcess.promote()
+        if not self.sim.tiered:
+            self.bytecode_vm.func_code = bytecode.to_code()
                
+    #----
+    #
+    # Use the code of an instance of the same module built earlier, key is
+    # equal for processes that compile to the same code. True if shared
+    
+    def share(self, key):
+        
+        self.share_key = key
+        
+        try:
+            self.shared = self.sim.shared[key]
+        except KeyError:
+            self.sim.shared[key] = self
+            return False
+            
+        self.bytecode_vm = self.shared.bytecode_vm
+        return True
+        
+    #----
+    #
+    # Load the code of the process with key from the object store, or from a
+    # process of this build. Signals are looked up by their zcode names in
+    # this instance. True if loaded
+    
+    def loadObject(self, key):
+        
+        try:
+            vm, entry = self.sim.objects[key]
+        except KeyError:
+            vm    = None
+            entry = object_store.load(self.sim.obj_path, key)
+            if entry == None:
+                return False
+            self.sim.objects[key] = (self, entry)
+                
+        local_nodes    = self.inst.local_nodes
+        self.sid_table = [local_nodes[name].sid for name in entry['slots']]
+        self.slots     = dict([(sid, i) for i, sid in enumerate(self.sid_table)])
+        
+        if entry['sensitivity'] != None:
+            self.sensitivity = sorted([self.sid_table[i] for i in entry['sensitivity']])
+        else:
+            self.sensitivity = None
+            
+        self.bytecode_vm = None
+        self.source      = entry['source']
+        self.text_bc     = entry['text_bc']
+        self.ir          = None
+        self.cached      = True
+        
+        # Share the code by its code key like a process just built, the
+        # design doesn't depend on what is in the store
+        if entry['share'] != None and self.share(entry['share']):
+            self.source  = self.shared.source
+            self.text_bc = self.shared.text_bc
+        elif vm != None:
+            self.shared      = vm.shared or vm
+            self.bytecode_vm = vm.bytecode_vm
+        elif entry['code'] != None:
+            self.bytecode_vm = artifact.loadFunction(entry['code'], globals())[0]
+            
+        return True
+        
+    #----
+    #
+    # Save the code of a process just built, names maps the sids of the
+    # slots to their zcode names
+    
+    def saveObject(self, key, names):
+        
+        entry = self.objectEntry(names)
+        if entry == None:
+            return
+            
+        self.sim.objects[key] = (self, entry)
+        object_store.save(self.sim.obj_path, key, entry)
+        
+    #----
+    #
+    # The object store entry of the process, None if its sensitivity list
+    # has signals the code doesn't use
+    
+    def objectEntry(self, names):
+        
+        sensitivity = None
+        if self.sensitivity != None:
+            if [sid for sid in self.sensitivity if sid not in self.slots]:
+                return None
+            sensitivity = [self.slots[sid] for sid in self.sensitivity]
+            
+        entry = {}
+        entry['slots']       = [names[sid] for sid in self.sid_table]
+        entry['sensitivity'] = sensitivity
+        entry['source']      = self.source
+        
+        # The code key, if it can be compared in another build
+        if self.share_key != None and build_jobs.portable(self.share_key):
+            entry['share'] = self.share_key
+        else:
+            entry['share'] = None
+        
+        # The code record of a bytecode process, a codegen process is rebuilt
+        # from its source
+        if self.source != None:
+            entry['code'] = None
+        else:
+            entry['code'] = artifact.dumpFunction(self.bytecode_vm)
+            
+        if self.sim.tiered and self.source == None:
+            entry['text_bc'] = self.text_bc
+        else:
+            entry['text_bc'] = None
+            
+        return entry
+        
+    #----
+    #
+    # Use the result of the build job that compiled the process (see
+    # build_jobs.py), the job saved it in the object store
+    
+    def applyJob(self, result):
+        
+        self.sid_table   = result['sid_table']
+        self.slots       = dict([(sid, i) for i, sid in enumerate(self.sid_table)])
+        self.sensitivity = result['sensitivity']
+        
+        if result['ir'] != None:
+            self.ir = ir.Summary(self, result['ir'])
+        else:
+            self.ir = None
+            
+        if result['share'] != None and self.share(result['share']):
+            self.source  = self.shared.source
+            self.text_bc = self.shared.text_bc
+        else:
+            self.bytecode_vm = artifact.loadFunction(result['code'], globals())[0]
+            self.source      = result['source']
+            self.text_bc     = result['text_bc']
+            
+        keys, sids = object_store.signalKeys(self)
+        entry = self.objectEntry(dict(zip(sids, keys)))
+        if entry != None:
+            self.sim.objects[self.key] = (self, entry)
+        
     #----                    
                    
     def listCode(self, force_zcode = False):
@@ -987,7 +1864,15 @@ class ProcessBuilder(object):
                 
     def getProcess(self):
                     
-        attributes = [self.id, self.name, self.bytecode_vm, self.var_list, self.inst.key]       
+        attributes = [self.id, self.name, self.bytecode_vm, self.var_list, self.inst.key, self.source]       
+        
+        if self.sim.tiered and self.source == None:
+            attributes.append(self.text_bc)
+        else:
+            attributes.append(None)
+            
+        attributes.append(self.sid_table)
+            
         return BytecodeProcess(attributes)
 
     #---------------------------------------------------------------------------
@@ -1016,49 +1901,164 @@ class ProcessBuilder(object):
 
 class BytecodeProcess(object):
     
-    __slots__ = ('sim', 'pid', 'name', 'queue', 'code', 'variables',
-                 'channel', 'signals',  'bc_iterator', 'key',
-                 'has_bc', 'bytecode_vm', 'wakeups',
-                 '__getstate__', '__setstate__' )
+    __slots__ = ('sim', 'pid', 'name', 'schedule', 'code', 'variables',
+                 'channel', 'signals',  'bc_iterator', 'key', 'drivers',
+                 'gen', 'tokens',
+                 'has_bc', 'bytecode_vm', 'wakeups', 'source',
+                 'text_bc', 'activations', 'sid_table', 'bound', 'loader' )
+    
+    # text_bc is the unassembled bytecode of a tiered process, None once the
+    # process is compiled
+    #
+    # bytecode_vm may be shared by the instances of a module, each process
+    # binds the signals in its sid_table & passes them to bytecode_vm
+    #
+    # loader is the artifact.Reader of a process not loaded from design.ser
+    # yet, see unloaded()
     
     def __init__(self, attributes):       
          
-        self.pid, self.name, self.bytecode_vm, self.variables, self.key = attributes
+        (self.pid, self.name, self.bytecode_vm, self.variables, self.key, self.source,
+         self.text_bc, self.sid_table) = attributes
+        
+        self.loader = None
+        
+    #----
+    #
+    # Process pid of design.ser, loaded by run_start
+    
+    @staticmethod
+    def unloaded(reader, pid):
+        
+        vm = BytecodeProcess([pid, None, None, [], None, None, None, []])
+        vm.loader = reader
+        
+        return vm
+        
+    #----
+    
+    def load(self):
+        
+        attributes = self.loader.process(self.pid, globals())
+        (self.pid, self.name, self.bytecode_vm, self.variables, self.key, self.source,
+         self.text_bc, self.sid_table) = attributes
         
-     #----
+        self.loader = None
+        
+    #----
         
     def run_start(self, sim):
 
+        if self.loader != None:
+            self.load()
+            
         self.sim         = sim
         self.signals     = sim.signals
-        self.queue       = sim.queue
+        self.schedule    = sim.schedule
         
         self.channel     = VMchannel(self)        
         self.wakeups     = []
+        self.drivers     = {}           # signal -> Driver, see driverKey
+        
+        # For dynamic wakeups
+        self.gen         = 0
+        self.tokens      = []           # (signal, WaitToken) of the wait
         
         # Can't trace variables using VCD
         for v in self.variables:
             v.vcd_mgr = None
+            
+        self.bound = [self.signals[sid] for sid in self.sid_table]
+        
+        if self.text_bc == None:
+            self.activations = None
+            self.bc_iterator = self.bytecode_vm(self, self.bound, self.variables)
+            return
+            
+        self.activations = 0
+        
+        try:
+            program = tier.prepare(self.text_bc, globals())
+        except tier.TierError, msg:
+            logging.warning('%s not interpreted: %s' % (self.vm_name(), msg))
+            self.promote(0)
+            return
+            
+        local = {'vm' : self, 'signals' : self.bound, 'variables' : self.variables, 'entry' : 0}
+        self.bc_iterator = tier.interpret(self, program, local)
+
+    #----
+    #
+    # Compile a tiered process & continue it after WAIT number entry, it
+    # runs when the process is next resumed
+    
+    def promote(self, entry):
         
-        self.bc_iterator = self.bytecode_vm(self, self.signals, self.variables)
+        # Another instance sharing bytecode_vm may have compiled it
+        if self.bytecode_vm.func_code.co_code == tiered_vm.func_code.co_code:
+            bytecode = bp.Code.from_code(self.bytecode_vm.func_code)
+            bytecode.code = bp.encode(self.text_bc)
+            self.bytecode_vm.func_code = bytecode.to_code()
+            
+            logging.info('%s compiled after %d activations' % (self.vm_name(), self.activations))
+            
+        self.text_bc = None
+        self.bc_iterator = self.bytecode_vm(self, self.bound, self.variables, entry)
 
     #---------------------------------------------------------------------------
     #
     # Methods called by bytecode
     
-    def scheduleAssignment(self, target, operand, delay, reject=False, inertial=False):
+    # The assign method of the process's driver of target, for the fast
+    # locals of fused assignments (see vm_op.AssignOp)
+    
+    def driver(self, target):
+        
+        key = driverKey(target)
+        try:
+            driver = self.drivers[key]
+        except KeyError:
+            driver = self.drivers[key] = Driver(self.sim, key)
+            
+        if target is key:
+            return driver.assign
+        return RangeDriver(driver, target).assign
+    
+    #----
+    
+    def scheduleAssignment(self, target, operand, delay, reject=None, inertial=True):
         
-        # reject & inertial are ignored for now
+        # delay & reject are in ticks
         
         if target.is_variable:
             target.setVal(operand.getVal())           
         else:
-            heappush(self.queue, SignalEvent(self, target, operand, delay/1000000.0))
+            key = driverKey(target)
+            try:
+                driver = self.drivers[key]
+            except KeyError:
+                driver = self.drivers[key] = Driver(self.sim, key)
+                
+            driver.assign(operand, delay, reject, inertial, target)
 
     #----
+    #
+    # The timeout of a wait resumes the process through a WaitToken, like its
+    # signal wakeups, so that whichever comes first cancels the others
     
     def scheduleDelay(self, delay):
-        heappush(self.queue, DelayEvent(self, delay))
+        self.schedule(DelayEvent(self, delay, WaitToken(self)))
+
+    #----
+    #
+    # Wake up on the next event on sig. All wakeups are cancelled 
+    # when the process resumes
+    
+    def waitOn(self, sig):
+        
+        token = WaitToken(self)
+        self.tokens.append((sig, token))
+        sig.waiting.add(token)
 
     #---------------------------------------------------------------------------
     #
@@ -1078,18 +2078,3 @@ class BytecodeProcess(object):
     
     def __repr__(self):
         return str(self)
-                                                     
-    #---------------------------------------------------------------------------
-    #
-    # Serialization methods
-    #
-    #---------------------------------------------------------------------------
-        
-    def __getstate__(self):            
-        return [self.pid, self.name, self.bytecode_vm, self.variables, self.key]
-    
-    #----
-    
-    def __setstate__(self, saved):            
-        self.pid, self.name, self.bytecode_vm, self.variables, self.key = saved
-        
\ No newline at end of file
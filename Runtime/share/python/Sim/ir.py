@@ -0,0 +1,998 @@
+#------------------------------------------------------------------------------
+#
+#   ir.py - 10/18/26
+#
+#   Expression tree IR between the vm_op list of a process and its Python
+#   bytecode.
+#
+#   The ops of a process are grouped into statements (POP, jumps, waits ...),
+#   each holding the expression trees it takes from the stack. A statement
+#   starts a new basic block if it is a jump target, or follows a jump or
+#   a WAIT. Values computed once & kept in a fast local (CSE temps) are
+#   single assignment.
+#
+#   Passes, run in this order by optimize():
+#
+#    fold   - library calls, BINARY ops & aggregates with constant operands
+#             are computed at build time. Jumps on a constant condition
+#             become unconditional or are removed
+#    ranges - RANGE APPLY (a no-op) is removed, a RANGE CREATE covering the
+#             whole object is replaced by the object
+#    switch - a chain of JUMP NC tests comparing one selector with constants
+#             (case statements, if/elsif chains) becomes a single SWITCH
+#    dse    - stores to variables that are never read, and assignments that
+#             are overwritten later in the same block are removed
+#    cse    - repeated expressions of signals & constants within a basic
+#             block are computed once
+#    fuse   - statements of the common zcode idioms become superinstructions
+#             (signal assignment, wait on a set of signals, event-or chains
+#             & rising edge tests)
+#
+#   Process.ops() lowers the IR back to a vm_op list that is translated to
+#   bytecode by ProcessBuilder.buildBytecode(). A process that can't be
+#   put in the IR (an unknown op, or a jump into an expression) is left
+#   as it is.
+#
+#------------------------------------------------------------------------------
+
+from vm_op import (PushSigOp, PushVarOp, JumpUOp, PushFoldedOp, LoadTempOp,
+                   StoreTempOp, SwitchOp, AssignOp, WaitSetOp, EventOrOp,
+                   ClockEdgeOp, jumpTargets)
+from std import StdLogic, StdLogicVector, Bool
+from builtin_op import binary_op
+
+# Pass names, in the order they are run
+passes = ['fold', 'ranges', 'switch', 'dse', 'cse', 'fuse']
+
+# Fewest arms, others included, for a chain of tests to become a SWITCH
+switch_arms = 4
+
+# (pops, pushes) of ops in expressions
+expr_effects = {
+    'PushSigOp'     : (0, 1),
+    'PushVarOp'     : (0, 1),
+    'PushLitOp'     : (0, 1),
+    'PushConstOp'   : (0, 1),
+    'RangeCreateOp' : (0, 1),
+    'IndexOp'       : (2, 1),
+    'AttributeOp'   : (1, 1),
+    'BinaryOp'      : (2, 1),
+    'BinaryEqualOp' : (2, 1),
+    'PushFoldedOp'  : (0, 1),
+    'LoadTempOp'    : (0, 1),
+    'StoreTempOp'   : (1, 1),
+}
+
+# Values popped by statement ops, POP & ASSIGN also pop a delay if they
+# have one
+stmt_pops = {
+    'PopOp'           : 2,
+    'AssignOp'        : 1,
+    'JumpNCOp'        : 1,
+    'JumpEOp'         : 1,
+    'JumpUOp'         : 0,
+    'JumpTOp'         : 0,
+    'JumpNotRisingOp' : 0,
+    'ScheduleDelayOp' : 1,
+    'ScheduleEventOp' : 1,
+    'WaitOp'          : 0,
+    'StopOp'          : 0,
+    'SwitchOp'        : 1,
+    'WaitSetOp'       : 0,
+    'EventOrOp'       : 0,
+    'ClockEdgeOp'     : 0,
+}
+
+# A basic block ends after these
+block_end = set(['JumpNCOp', 'JumpEOp', 'JumpUOp', 'JumpTOp', 'JumpNotRisingOp',
+                 'WaitOp', 'StopOp', 'SwitchOp', 'WaitSetOp', 'EventOrOp',
+                 'ClockEdgeOp'])
+
+# Types of values that can be bytecode constants
+const_types = (bool, int, long, str, Bool, StdLogic, StdLogicVector)
+
+#------------------------------------------------------------------------------
+#
+# An expression. op produces the value from the values of args, enter is
+# the ENTER CONTEXT op of a call. An aggregate also uses the value below
+# it on the stack (peek), the POP target.
+#
+# temp is the name of the fast local a CSE value is stored in
+
+class Node(object):
+
+    __slots__ = ('op', 'name', 'args', 'enter', 'peek', 'temp')
+
+    def __init__(self, op, args=(), enter=None, peek=None):
+
+        self.op    = op
+        self.name  = op.__class__.__name__
+        self.args  = list(args)
+        self.enter = enter
+        self.peek  = peek
+        self.temp  = None
+
+    #----
+
+    def ops(self, result):
+
+        if self.enter is not None:
+            result.append(self.enter)
+
+        for arg in self.args:
+            arg.ops(result)
+
+        result.append(self.op)
+
+        if self.temp is not None:
+            result.append(StoreTempOp(self.temp))
+
+    #----
+
+    def first(self):
+
+        if self.enter is not None:
+            return self.enter
+
+        if self.args:
+            return self.args[0].first()
+
+        return self.op
+
+    #----
+
+    def nodes(self):
+
+        # All nodes of the tree
+        result = [self]
+        for arg in self.args:
+            result.extend(arg.nodes())
+
+        return result
+
+    #----
+
+    def isConst(self):
+        return self.name in ('PushLitOp', 'PushConstOp', 'PushFoldedOp') and self.op.value is not None
+
+    #----
+    #
+    # Hashable key of a pure expression, None if it reads a variable or
+    # has no operands to share
+
+    def key(self):
+
+        if not self.args:
+            return None
+
+        return self.leafKey()
+
+    def leafKey(self):
+
+        name = self.name
+        op   = self.op
+
+        if name == 'PushSigOp':
+            return ('sig', op.object.sid)
+
+        if self.isConst():
+            value = op.value
+            return ('const', value.__class__.__name__, str(value))
+
+        if name == 'RangeCreateOp' and op.klass == 'SIGNAL':
+            return ('range', op.sid, op.left, op.ascending, op.right)
+
+        if name == 'CallOp' and self.enter is not None:
+            head = ('call', op.signature)
+        elif name in ('BinaryOp', 'BinaryEqualOp'):
+            head = ('binary', name) + tuple(op.line[3:])
+        elif name == 'IndexOp':
+            head = ('index',)
+        else:
+            return None
+
+        keys = [arg.leafKey() for arg in self.args]
+        if None in keys:
+            return None
+
+        return head + tuple(keys)
+
+    #----
+
+    def dump(self, indent, lines):
+        lines.append('%s%s' % (' ' * indent, describe(self.op)))
+        for arg in self.args:
+            arg.dump(indent + 2, lines)
+
+#------------------------------------------------------------------------------
+#
+# A statement, op with the expressions it pops from the stack
+
+class Stmt(object):
+
+    __slots__ = ('op', 'name', 'args')
+
+    def __init__(self, op, args):
+
+        self.op   = op
+        self.name = op.__class__.__name__
+        self.args = args
+
+    #----
+
+    def ops(self, result):
+        for arg in self.args:
+            arg.ops(result)
+        result.append(self.op)
+
+    #----
+
+    def first(self):
+        if self.args:
+            return self.args[0].first()
+        return self.op
+
+    #----
+
+    def nodes(self):
+        result = []
+        for arg in self.args:
+            result.extend(arg.nodes())
+        return result
+
+    #----
+    #
+    # Whole signal or variable assigned by a POP, e.g. ('var', sid)
+
+    def target(self):
+
+        if self.name != 'PopOp':
+            return None
+
+        node = self.args[0]
+        if node.name == 'PushVarOp':
+            return ('var', node.op.object.sid)
+
+        if node.name == 'PushSigOp':
+            sig = node.op.object
+            # SLV(0 DOWNTO 0) is pushed as a new SLVRange, each one has a driver
+            if isinstance(sig, StdLogicVector) and len(sig) == 1:
+                return None
+            return ('sig', sig.sid)
+
+        return None
+
+    #----
+    #
+    # sids of the variables read, all variables of a range are read
+
+    def reads(self):
+
+        nodes = self.nodes()
+        if self.name == 'PopOp' and self.args[0].name == 'PushVarOp':
+            nodes = nodes[1:]
+
+        result = set()
+        for node in nodes:
+            if node.name == 'PushVarOp':
+                result.add(node.op.object.sid)
+            elif node.name == 'RangeCreateOp' and node.op.klass == 'VARIABLE':
+                result.add(node.op.sid)
+
+        return result
+
+    #----
+
+    def dump(self, lines):
+        lines.append('    %s' % describe(self.op))
+        for arg in self.args:
+            arg.dump(8, lines)
+
+#------------------------------------------------------------------------------
+#
+# The IR of one process
+
+class Process(object):
+
+    __slots__ = ('vm', 'blocks', 'stats', 'n_ops', 'n_temps')
+
+    def __init__(self, vm, blocks, n_ops):
+
+        self.vm      = vm           # ProcessBuilder
+        self.blocks  = blocks       # lists of Stmt
+        self.n_ops   = n_ops
+        self.n_temps = 0
+
+        self.stats   = dict([(name, {}) for name in passes])
+
+    #----
+
+    def count(self, pass_name, item, n=1):
+        stats = self.stats[pass_name]
+        stats[item] = stats.get(item, 0) + n
+
+    #----
+
+    def statements(self):
+        for block in self.blocks:
+            for stmt in block:
+                yield stmt
+
+    #----
+    #
+    # Lower the IR to a list of vm_ops
+
+    def ops(self):
+
+        result = []
+        for stmt in self.statements():
+            stmt.ops(result)
+
+        # Jumps to removed statements go to the next op
+        labels = sorted(set([int(op.label) for op in result]) - set([-1]))
+
+        def present(target):
+            if target not in labels:
+                later = [label for label in labels if label > target]
+                if not later:
+                    raise ValueError('No op after removed jump target %d' % target)
+                return later[0]
+            return target
+
+        for op in result:
+            if op.__class__.__name__ == 'SwitchOp':
+                op.targets = [present(target) for target in op.targets]
+            elif jumpTargets(op):
+                op.new_pc = present(op.new_pc)
+
+        return result
+
+    #----
+
+    def dump(self):
+
+        lines = ['PROCESS %s %d - %s' % (self.vm.name, self.vm.id, self.vm.inst.key)]
+        for i, block in enumerate(self.blocks):
+            if block:
+                lines.append('  BLOCK %d' % i)
+            for stmt in block:
+                stmt.dump(lines)
+
+        return lines
+
+    #----
+    #
+    # Number of vm_ops after lowering
+
+    def size(self):
+        return len(self.vm.code)
+
+    #----
+    #
+    # The stats & dump of the Process, for a Summary
+
+    def summary(self, dump_ir):
+
+        if dump_ir:
+            lines = self.dump()
+        else:
+            lines = None
+
+        return (self.stats, self.n_ops, self.size(), lines)
+
+#------------------------------------------------------------------------------
+#
+# The report & dump of a Process optimized by a build job, see
+# SimBuilder.buildJobs
+
+class Summary(object):
+
+    __slots__ = ('vm', 'stats', 'n_ops', 'n_after', 'lines')
+
+    def __init__(self, vm, summary):
+
+        self.vm = vm
+        self.stats, self.n_ops, self.n_after, self.lines = summary
+
+    #----
+
+    def size(self):
+        return self.n_after
+
+    #----
+
+    def dump(self):
+        return self.lines
+
+#------------------------------------------------------------------------------
+#
+# One line description of an op for IR dumps
+
+def describe(op):
+
+    name = op.__class__.__name__
+
+    if name == 'PushSigOp':
+        return 'SIGNAL %s (%d)' % (op.key, op.object.sid)
+
+    if name == 'PushVarOp':
+        return 'VARIABLE %s (%d)' % (op.key, op.object.sid)
+
+    if name in ('PushLitOp', 'PushConstOp', 'PushFoldedOp'):
+        return 'CONSTANT %s' % (op.value,)
+
+    if name == 'CallOp':
+        return 'CALL %s' % op.signature
+
+    try:
+        return ' '.join(op.line[1:])
+    except AttributeError:
+        return str(op)
+
+#------------------------------------------------------------------------------
+#
+# Build the IR of a ProcessBuilder's vm_op list, None if it can't be built
+
+def build(vm):
+
+    code    = vm.code
+    targets = set()
+    for op in code:
+        targets.update(jumpTargets(op))
+
+    blocks = [[]]
+    stack  = []             # Nodes & ENTER CONTEXT ops
+
+    for op in code:
+
+        name = op.__class__.__name__
+
+        if not stack and int(op.label) in targets and blocks[-1]:
+            # A jump target starts a new block
+            blocks.append([])
+
+        elif stack and int(op.label) in targets:
+            # Jump into an expression
+            return None
+
+        if name == 'RangeApplyOp':
+            # A no-op
+            continue
+
+        if name == 'EnterOp':
+            stack.append(op)
+
+        elif name == 'CallOp':
+            args = []
+            while stack and isinstance(stack[-1], Node):
+                args.insert(0, stack.pop())
+            if not stack:
+                return None
+            stack.append(Node(op, args, enter=stack.pop()))
+
+        elif name == 'AggregateOp':
+            # TOS = initializer, NOS = target, the target is left on the stack
+            if len(stack) < 2 or not isinstance(stack[-2], Node):
+                return None
+            ini = stack.pop()
+            stack.append(Node(op, [ini], peek=stack[-1]))
+
+        elif name in expr_effects:
+            pops, pushes = expr_effects[name]
+            if len(stack) < pops:
+                return None
+            args = stack[len(stack) - pops:]
+            del stack[len(stack) - pops:]
+            if [arg for arg in args if not isinstance(arg, Node)]:
+                return None
+            stack.append(Node(op, args))
+
+        elif name in stmt_pops:
+            pops = stmt_pops[name]
+            if name in ('PopOp', 'AssignOp') and op.d_flag:
+                pops += 1
+            if len(stack) != pops or [arg for arg in stack if not isinstance(arg, Node)]:
+                # Statements are only found with an empty stack
+                return None
+            blocks[-1].append(Stmt(op, stack))
+            stack = []
+
+            if name in block_end:
+                blocks.append([])
+
+        else:
+            return None
+
+    if stack:
+        return None
+
+    return Process(vm, blocks, len(code))
+
+#------------------------------------------------------------------------------
+#
+# Constant folding
+
+def foldNode(proc, node):
+
+    node.args = [foldNode(proc, arg) for arg in node.args]
+
+    name = node.name
+    if not node.args or [arg for arg in node.args if not arg.isConst()]:
+        return node
+
+    values = [arg.op.value for arg in node.args]
+
+    try:
+        if name == 'CallOp' and node.enter is not None:
+            f = proc.vm.sim.lib_dict.get(node.op.signature)
+            if f is None:
+                return node
+            value = f(*values)
+
+        elif name == 'BinaryOp':
+            value = binary_op(values[0], values[1], node.op.op)
+
+        elif name == 'BinaryEqualOp':
+            value = str(values[0]) == str(values[1])
+
+        elif name == 'AggregateOp':
+            value = aggregate(node, values[0])
+
+        else:
+            return node
+
+    except Exception:
+        # Leave it to run time
+        return node
+
+    if not isinstance(value, const_types):
+        return node
+
+    proc.count('fold', 'constants folded')
+    return Node(PushFoldedOp(node.first().label, value, describe(node.op)))
+
+#----
+#
+# The string built by an AggregateOp, (OTHERS => ini) of the width of
+# the target
+
+def aggregate(node, ini):
+
+    if node.op.args.get('HAVEOTHERS') != 'TRUE':
+        return None
+
+    target = node.peek
+    if target.name in ('PushSigOp', 'PushVarOp'):
+        obj = target.op.object
+        width = obj._max - obj._min + 1
+    elif target.name == 'RangeCreateOp':
+        width = abs(target.op.left - target.op.right) + 1
+    else:
+        return None
+
+    return str(ini) * width
+
+#----
+
+def fold(proc):
+
+    for block in proc.blocks:
+        for stmt in block[:]:
+
+            stmt.args = [foldNode(proc, arg) for arg in stmt.args]
+
+            if stmt.name == 'JumpNCOp' and stmt.args[0].isConst():
+                op = stmt.op
+                if stmt.args[0].op.value:
+                    # Never jumps
+                    block.remove(stmt)
+                else:
+                    # Always jumps
+                    block[block.index(stmt)] = Stmt(JumpUOp([op.label, 'JUMP', str(op.new_pc)]), [])
+                proc.count('fold', 'branches folded')
+
+#------------------------------------------------------------------------------
+#
+# Redundant range elimination
+
+def ranges(proc):
+
+    vm = proc.vm
+
+    for stmt in proc.statements():
+        for node in stmt.nodes():
+
+            if node.name != 'RangeCreateOp':
+                continue
+
+            op = node.op
+            if op.klass == 'SIGNAL':
+                obj, cls = vm.signals[op.sid], PushSigOp
+            else:
+                obj, cls = vm.var_map[op.target], PushVarOp
+
+            if not isinstance(obj, StdLogicVector) or len(obj) == 1:
+                continue
+
+            if op.ascending:
+                whole = obj._dir > 0 and (op.left, op.right) == (obj._min, obj._max)
+            else:
+                whole = obj._dir < 0 and (op.left, op.right) == (obj._max, obj._min)
+
+            if whole:
+                push = cls([op.label, 'PUSH', 'OBJECT', op.klass, op.target])
+                push.object = obj
+                node.op   = push
+                node.name = push.__class__.__name__
+                proc.count('ranges', 'full ranges replaced')
+
+    n = len([op for op in proc.vm.code if op.__class__.__name__ == 'RangeApplyOp'])
+    if n:
+        proc.count('ranges', 'RANGE APPLY removed', n)
+
+#------------------------------------------------------------------------------
+#
+# Case statements & if/elsif chains on one selector. The tests, in order:
+#
+#    PUSH selector, PUSH constant, BINARY OP EQUAL [, ... BINARY OP OR], JUMP NC next
+#
+# each jump to the next test when false, and the arm that follows a test
+# ends with a JUMP.
+# The chain becomes a SWITCH that gets the selector's packed value once and
+# looks its arm up in a dict. A key that isn't found, as for a selector
+# with metavalues, takes the last test's false branch, the others arm.
+#
+# BINARY OP EQUAL of a constant without metavalues is true only for a
+# selector of the same width with the same packed value, chains with
+# other constants are left as they are
+
+# Key of a selector that can be read more than once, None for others
+
+def selectorKey(node):
+
+    op = node.op
+    if node.name == 'PushSigOp':
+        return ('sig', op.object.sid)
+
+    if node.name == 'PushVarOp':
+        return ('var', op.object.sid)
+
+    if node.name == 'RangeCreateOp':
+        return ('range', op.klass, op.sid, op.left, op.ascending, op.right)
+
+    return None
+
+#----
+#
+# (selector, constants) of a test expression, None if it isn't a choice
+
+def choices(node):
+
+    if node.name != 'BinaryOp':
+        return None
+
+    if node.op.op == 'EQUAL':
+        sel, value = node.args
+        if sel.isConst():
+            sel, value = value, sel
+        if value.isConst() and selectorKey(sel) is not None:
+            return sel, [value.op.value]
+
+    elif node.op.op == 'OR':
+        left  = choices(node.args[0])
+        right = choices(node.args[1])
+        if left and right and selectorKey(left[0]) == selectorKey(right[0]):
+            return left[0], left[1] + right[1]
+
+    return None
+
+#----
+#
+# Number of bits of a selector, None if unknown
+
+def selectorWidth(node):
+
+    op = node.op
+    if node.name == 'RangeCreateOp':
+        return abs(op.left - op.right) + 1
+
+    if isinstance(op.object, StdLogicVector):
+        return len(op.object)
+
+    return None
+
+#----
+#
+# dict of packed value -> arm index for the constants of each arm, None
+# if a constant isn't a vector without metavalues. The first arm with a
+# value wins
+
+def switchTable(sel, arms):
+
+    width = selectorWidth(sel)
+    if width is None:
+        return None
+
+    table = {}
+    for i, values in enumerate(arms):
+        for value in values:
+
+            if not isinstance(value, StdLogicVector):
+                return None
+
+            key = value.packed()
+            if key[1]:
+                return None
+
+            if len(value) == width and key not in table:
+                table[key] = i
+
+    return table
+
+#----
+
+def switch(proc):
+
+    # Block index by the label of its first op, jumps to each label
+    starts = {}
+    jumps  = {}
+    for i, block in enumerate(proc.blocks):
+        if block:
+            starts[int(block[0].first().label)] = i
+        for stmt in block:
+            for target in jumpTargets(stmt.op):
+                jumps[target] = jumps.get(target, 0) + 1
+
+    blocks = proc.blocks
+
+    # First label of the arm after the test ending block i, None if empty
+    def arm(i):
+        if i + 1 < len(blocks) and blocks[i + 1]:
+            return int(blocks[i + 1][0].first().label)
+        return None
+
+    for h, block in enumerate(blocks):
+
+        if not block or block[-1].name != 'JumpNCOp':
+            continue
+
+        head = choices(block[-1].args[0])
+        if head is None or arm(h) is None:
+            continue
+
+        sel, values = head
+        key     = selectorKey(sel)
+        tests   = [block[-1]]
+        arms    = [values]
+        targets = [arm(h)]
+        later   = []
+
+        # Follow the false branches while they are tests of the same
+        # selector that nothing else jumps to
+        while True:
+            target = tests[-1].op.new_pc
+            i = starts.get(target)
+            if i is None or i == h + 1 or jumps[target] != 1 or len(blocks[i]) != 1:
+                break
+
+            stmt = blocks[i][0]
+            if stmt.name != 'JumpNCOp' or arm(i) is None:
+                break
+
+            # The arm before the test must not fall through into it
+            if not blocks[i - 1] or blocks[i - 1][-1].name != 'JumpUOp':
+                break
+
+            test = choices(stmt.args[0])
+            if test is None or selectorKey(test[0]) != key:
+                break
+
+            tests.append(stmt)
+            arms.append(test[1])
+            targets.append(arm(i))
+            later.append(i)
+
+        if len(tests) + 1 < switch_arms:
+            continue
+
+        table = switchTable(sel, arms)
+        if table is None:
+            continue
+
+        targets.append(tests[-1].op.new_pc)
+
+        block[-1] = Stmt(SwitchOp(tests[0].op.label, table, targets), [sel])
+        for i in later:
+            blocks[i] = []
+
+        proc.count('switch', 'chains replaced')
+        proc.count('switch', 'tests replaced', len(tests))
+
+#------------------------------------------------------------------------------
+#
+# Dead store elimination
+
+def dse(proc):
+
+    # Variables that are read anywhere
+    read = set()
+    for stmt in proc.statements():
+        read |= stmt.reads()
+
+    for block in proc.blocks:
+
+        # Walk back, killed holds the targets assigned later in the block
+        # without a read in between
+        killed = set()
+        for stmt in block[::-1]:
+
+            target = stmt.target()
+
+            if target != None and target[0] == 'var' and target[1] not in read:
+                block.remove(stmt)
+                proc.count('dse', 'unread variable stores removed')
+                continue
+
+            if target != None and target in killed:
+                block.remove(stmt)
+                proc.count('dse', 'overwritten assignments removed')
+                continue
+
+            # A signal assignment with a delay doesn't remove earlier ones
+            if target != None and (target[0] == 'var' or not stmt.op.d_flag):
+                killed.add(target)
+
+            killed -= set([('var', sid) for sid in stmt.reads()])
+
+#------------------------------------------------------------------------------
+#
+# Common subexpression elimination, within a basic block. The first
+# occurrence is stored in a temp, the others load it
+
+def cseNode(proc, node, seen):
+
+    key = node.key()
+    if key is not None:
+
+        first = seen.get(key)
+        if first is not None:
+            if first.temp is None:
+                first.temp = 'cse__%d' % proc.n_temps
+                proc.n_temps += 1
+                proc.count('cse', 'values kept')
+            proc.count('cse', 'values reused')
+            return Node(LoadTempOp(first.temp))
+
+        seen[key] = node
+
+    node.args = [cseNode(proc, arg, seen) for arg in node.args]
+    return node
+
+#----
+
+def cse(proc):
+
+    for block in proc.blocks:
+        seen = {}
+        for stmt in block:
+            stmt.args = [cseNode(proc, arg, seen) for arg in stmt.args]
+
+#------------------------------------------------------------------------------
+#
+# Superinstructions. Each fused statement replaces the zcode ops below
+# with one op (see vm_op.py):
+#
+#    ASSIGN         - PUSH SIGNAL or RANGE CREATE of a signal, POP inertial
+#    WAIT ON        - PUSH SIGNAL, SCHEDULE EVENT ... before a WAIT, & the WAIT
+#    JUMP EVENT OR  - PUSH SIGNAL, JUMP EVENT
+#    CLOCK EDGE     - JUMP NOT RISING of a StdLogic
+#
+# An aggregate uses its POP target on the stack, so its POP is not fused.
+# SLV(0 DOWNTO 0) signals are pushed as a new SLVRange and are left alone.
+# The stats count the zcode ops replaced
+
+fused = 'zcode ops fused'
+
+def leafSignal(node):
+
+    if node.name != 'PushSigOp':
+        return False
+
+    sig = node.op.object
+    return not (isinstance(sig, StdLogicVector) and len(sig) == 1)
+
+#----
+
+def fuse(proc):
+
+    for block in proc.blocks:
+
+        for i, stmt in enumerate(block):
+
+            op = stmt.op
+
+            if stmt.name == 'PopOp' and op.i_flag:
+                target = stmt.args[0]
+                signal = leafSignal(target) or (target.name == 'RangeCreateOp' and
+                                                target.op.klass == 'SIGNAL')
+                if not signal or [node for node in stmt.nodes() if node.name == 'AggregateOp']:
+                    continue
+                block[i] = Stmt(AssignOp(op, target.op), stmt.args[1:])
+                proc.count('fuse', fused, 2)
+
+            elif stmt.name == 'JumpEOp' and leafSignal(stmt.args[0]):
+                block[i] = Stmt(EventOrOp(stmt.first().label, op), [])
+                proc.count('fuse', fused, 2)
+
+            elif stmt.name == 'JumpNotRisingOp' and isinstance(op.object, StdLogic):
+                block[i] = Stmt(ClockEdgeOp(op.label, op), [])
+                proc.count('fuse', fused)
+
+        # SCHEDULE EVENTs of signals before a WAIT at the end of the block
+        if not block or block[-1].name != 'WaitOp':
+            continue
+
+        k = len(block) - 1
+        while k and block[k-1].name == 'ScheduleEventOp' and leafSignal(block[k-1].args[0]):
+            k -= 1
+
+        if k < len(block) - 1:
+            sigs = [stmt.args[0].op for stmt in block[k:-1]]
+            block[k:] = [Stmt(WaitSetOp(block[k].first().label, sigs), [])]
+            proc.count('fuse', fused, 2 * len(sigs) + 1)
+
+#------------------------------------------------------------------------------
+#
+# Build, optimize & lower the code of a ProcessBuilder. Returns the new
+# vm_op list & the Process, or the original code & None
+
+pass_funcs = {
+    'fold'   : fold,
+    'ranges' : ranges,
+    'switch' : switch,
+    'dse'    : dse,
+    'cse'    : cse,
+    'fuse'   : fuse,
+}
+
+def optimize(vm):
+
+    proc = build(vm)
+    if proc is None:
+        return vm.code, None
+
+    for name in passes:
+        pass_funcs[name](proc)
+
+    return proc.ops(), proc
+
+#----
+#
+# Text report of the per pass stats of a list of Process objects
+
+def report(procs, skipped):
+
+    lines = ['IR optimizer: %d processes optimized, %d left as zcode' % (len(procs), len(skipped))]
+
+    for name in passes:
+        totals = {}
+        for proc in procs:
+            for item, n in proc.stats[name].items():
+                totals[item] = totals.get(item, 0) + n
+
+        items = ', '.join(['%d %s' % (totals[item], item) for item in sorted(totals)])
+        lines.append('  %-6s : %s' % (name, items or 'nothing'))
+
+    before = sum([proc.n_ops for proc in procs])
+    after  = sum([proc.size() for proc in procs])
+    lines.append('  %-6s : %d -> %d' % ('ops', before, after))
+
+    for proc in procs:
+        n = proc.stats['fuse'].get(fused, 0)
+        if n:
+            lines.append('  fused %s/%s : %d zcode ops' % (proc.vm.inst.key, proc.vm.name, n))
+
+    for name in skipped:
+        lines.append('  not optimized: %s' % name)
+
+    return lines
@@ -8,6 +8,8 @@
 
 from Sim.std import StdLogic, StdLogicVector
 
+new_packed = StdLogicVector.fromPacked
+
 # Character to enumeration id
 encode = {'U':0, 'X':1, '0':2, '1':3, 'Z':4, 'W':5, 'L':6, 'H':7, '-':8,
           'u':0, 'x':1, 'z':4, 'w':5, 'l':6, 'h':7
@@ -215,12 +217,28 @@ def arith_op(table, a, b):
     
     return result
 
+#----
+#
+# Encoded value of vector v with its rightmost bit, the LSB, first. A TO
+# vector is stored leftmost bit first, like its intVal()
+
+def lsb_first(v):
+    
+    val = v.getVal()
+    if getattr(v, 'slv', v)._dir > 0:
+        val.reverse()
+        
+    return val
+
 #-------------------------------------------------------------------------------
 #
 # Subset of functions as defined in std_logic_1164
 #
 # The function doc-string is the unique signature of the function that follows 
 # "CALL FUNCTION" in the design.txt file.      
+#
+# Vector functions use the packed (bits, mask) values when both masks are 0,
+# otherwise the 9-value tables.
 
 
 def func0(a, b):
@@ -235,6 +253,12 @@ def func1(a, b):
 def func2(L, R):
     """"="(CONSTANT L : STD_LOGIC_VECTOR, CONSTANT R : STD_LOGIC_VECTOR) RETURN BOOLEAN"""
     """"="(CONSTANT A : STD_LOGIC_VECTOR, CONSTANT B : STD_LOGIC_VECTOR) RETURN BOOLEAN"""
+    
+    l, lm = L.packed()
+    r, rm = R.packed()
+    if not (lm | rm) and len(L) == len(R):
+        return l == r
+    
     return L.getVal() == R.getVal()
 
 def func3(a, b):
@@ -244,47 +268,87 @@ def func3(a, b):
 def func4(L, R):
     """"+"(CONSTANT L : STD_LOGIC_VECTOR, CONSTANT R : INTEGER) RETURN STD_LOGIC_VECTOR"""
     
+    # Integer add modulo 2**width when L only has 0/1 bits
+    l = L.intVal()
+    if l is not None:
+        width = len(L)
+        return new_packed(width, (l + R) & ((1 << width) - 1))
+    
     sum = []
     c = 2   # Equivalent to encode('0')         
     result = L.new()
     
-    for x, y in zip(L.int2SLV(R), L._val):
+    # int2SLV is ordered like L
+    r = L.int2SLV(R)
+    if L._dir > 0:
+        r.reverse()
+        
+    for x, y in zip(r, lsb_first(L)):
         q,c = add_table[add_table_index[x]][add_table_index[y]][add_table_index[c]]
         sum.append(q)
     
-    result._val = sum 
+    result.setVal(sum)
     return result
 
 def func5(L, R):
     """"+"(CONSTANT L : STD_LOGIC_VECTOR, CONSTANT R : STD_LOGIC_VECTOR) RETURN STD_LOGIC_VECTOR"""
     
+    # Integer arithmetic modulo 2**width when both only have 0/1 bits
+    width = len(L)
+    if width == len(R):
+        l = L.intVal()
+        r = R.intVal()
+        if l is not None and r is not None:
+            return new_packed(width, (l + r) & ((1 << width) - 1))
+    
     sum = []
     c = 2   # Equivalent to encode('0')         
     result = L.new()
     
-    for x, y in zip(R._val, L._val):
+    for x, y in zip(lsb_first(R), lsb_first(L)):
         q,c = add_table[add_table_index[x]][add_table_index[y]][add_table_index[c]]
         sum.append(q)
     
-    result._val = sum 
+    result.setVal(sum)
     return result
 
+def concat(a, b):
+    
+    # a & b, b is in the low bits
+    l, lm = a.packed()
+    r, rm = b.packed()
+    if not (lm | rm):
+        return new_packed(len(a) + len(b), (l << len(b)) | r)
+    
+    return StdLogicVector([str(len(a)+len(b)-1), 'DOWNTO', '0']).setVal(b.getVal() + a.getVal())
+
 def func6(a, b):
     """"&"(CONSTANT A : STD_LOGIC_VECTOR, CONSTANT B : STD_LOGIC_VECTOR) RETURN STD_LOGIC_VECTOR"""
-    return StdLogicVector([str(len(a)+len(b)-1), 'DOWNTO', '0']).setVal(b.getVal() + a.getVal())
+    return concat(a, b)
 
 def func7(a, b):
     """"&"(CONSTANT A : STD_LOGIC_VECTOR, CONSTANT B : STD_LOGIC) RETURN STD_LOGIC_VECTOR"""
-    return StdLogicVector([str(len(a)), 'DOWNTO', '0']).setVal(b.getVal() + a.getVal())
+    return concat(a, b)
 
 def func8(L):
     """"NOT"(CONSTANT L : STD_LOGIC_VECTOR) RETURN STD_LOGIC_VECTOR"""
+    
+    l, lm = L.packed()
+    if not lm:
+        return new_packed(len(L), ~l & ((1 << len(L)) - 1))
+    
     result = L.new()
     result.setVal(unary_op(not_table, L.getVal()))
     return result
 
 def func9(L, R):
     """"OR"(CONSTANT L : STD_LOGIC_VECTOR, CONSTANT R : STD_LOGIC_VECTOR) RETURN STD_LOGIC_VECTOR"""
+    
+    l, lm = L.packed()
+    r, rm = R.packed()
+    if not (lm | rm):
+        return new_packed(len(L), l | r)
+    
     result = L.new()    
     result.setVal([or_table[x][y] for x,y in zip(L.getVal(), R.getVal())])
     return result
@@ -315,14 +379,20 @@ def func13(L):
 
 def func14(a, b):
     """"&"(CONSTANT A : STD_LOGIC, CONSTANT B : STD_LOGIC_VECTOR) RETURN STD_LOGIC_VECTOR"""
-    return StdLogicVector([str(len(a)), 'DOWNTO', '0']).setVal(b.getVal() + a.getVal())
+    return concat(a, b)
 
 def func15(a, b):
     """"&"(CONSTANT A : STD_LOGIC, CONSTANT B : STD_LOGIC) RETURN STD_LOGIC_VECTOR"""
-    return StdLogicVector(['1', 'DOWNTO', '0']).setVal(b.getVal() + a.getVal())
+    return concat(a, b)
 
 def func16(L, R):
     """"AND"(CONSTANT L : STD_LOGIC_VECTOR, CONSTANT R : STD_LOGIC_VECTOR) RETURN STD_LOGIC_VECTOR"""
+    
+    l, lm = L.packed()
+    r, rm = R.packed()
+    if not (lm | rm):
+        return new_packed(len(L), l & r)
+    
     result = L.new()    
     result.setVal([and_table[x][y] for x,y in zip(L.getVal(), R.getVal())])
     return result
@@ -330,6 +400,12 @@ def func16(L, R):
 
 def func17(L, R):
     """"NOR"(CONSTANT L : STD_LOGIC_VECTOR, CONSTANT R : STD_LOGIC_VECTOR) RETURN STD_LOGIC_VECTOR"""
+    
+    l, lm = L.packed()
+    r, rm = R.packed()
+    if not (lm | rm):
+        return new_packed(len(L), ~(l | r) & ((1 << len(L)) - 1))
+    
     temp = L.new()    
     temp.setVal([or_table[x][y] for x,y in zip(L.getVal(), R.getVal())])
     
@@ -339,10 +415,16 @@ def func17(L, R):
 
 def func18(L, R):
     """"/="(CONSTANT L : STD_LOGIC_VECTOR, CONSTANT R : STD_LOGIC_VECTOR) RETURN BOOLEAN"""
-    return not L.getVal() == R.getVal()
+    return not func2(L, R)
 
 def func19(L, R):
     """"XOR"(CONSTANT L : STD_LOGIC_VECTOR, CONSTANT R : STD_LOGIC_VECTOR) RETURN STD_LOGIC_VECTOR"""
+    
+    l, lm = L.packed()
+    r, rm = R.packed()
+    if not (lm | rm):
+        return new_packed(len(L), l ^ r)
+    
     result = L.new()    
     result.setVal([xor_table[x][y] for x,y in zip(L.getVal(), R.getVal())])
     return result
@@ -350,15 +432,23 @@ def func19(L, R):
 def func20(L, R):
     """"-"(CONSTANT L : STD_LOGIC_VECTOR, CONSTANT R : STD_LOGIC_VECTOR) RETURN STD_LOGIC_VECTOR"""
     
+    # Integer arithmetic modulo 2**width when both only have 0/1 bits
+    width = len(L)
+    if width == len(R):
+        l = L.intVal()
+        r = R.intVal()
+        if l is not None and r is not None:
+            return new_packed(width, (l - r) & ((1 << width) - 1))
+    
     sum = []
     c = 3   # Equivalent to encode('1')         
     result = L.new()
     
-    for x, y in zip(R._val, L._val):
+    for x, y in zip(lsb_first(R), lsb_first(L)):
         q,c = sub_table[add_table_index[x]][add_table_index[y]][add_table_index[c]]
         sum.append(q)
     
-    result._val = sum 
+    result.setVal(sum)
     return result
 
 def func21(L, R):
@@ -375,11 +465,25 @@ def func23(L, R):
 
 def func24(L, R):
     """"="(CONSTANT A : STD_LOGIC_VECTOR, CONSTANT B : STD_LOGIC_VECTOR) RETURN BOOLEAN"""
-    return L.getVal() == R.getVal()
+    return func2(L, R)
 
 def func25(L, R):
     """"/="(CONSTANT A : STD_LOGIC_VECTOR, CONSTANT B : STD_LOGIC_VECTOR) RETURN BOOLEAN"""
-    return not L.getVal() == R.getVal()
+    return not func2(L, R)
+
+#------------------------------------------------------------------------------
+#
+# Scalar std_ulogic functions that ProcessBuilder inlines in process bytecode
+# as table look-ups on encoded values, signature -> table. The "=" compare
+# needs no table
+
+inline_ops = {
+    func10.__doc__ : xor_table,
+    func11.__doc__ : and_table,
+    func12.__doc__ : or_table,
+    func13.__doc__ : not_table,
+    func0.__doc__  : None,
+}
 
 #------------------------------------------------------------------------------
 
@@ -0,0 +1,131 @@
+#------------------------------------------------------------------------------
+#
+#   object_store.py - 10/18/26
+#
+#   On-disk store of compiled process code, one file per key in the
+#   directory SimBuilder.obj_path. A process is only compiled when no
+#   process with its key was built before (see ProcessBuilder.loadObject).
+#
+#   The key is a hash of:
+#
+#    - the zcode of the process, its variables & the instance constants
+#    - the signals it uses, their types and which of them are the same net
+#    - the build options, the simulator source & the Python version
+#
+#   Signals are bound by slot, so the code doesn't depend on the sids of an
+#   instance. An entry keeps the zcode name of the signal in each slot and
+#   the slots of a static sensitivity list, the sids are looked up in the
+#   instance that loads it. The code is kept as the marshalled record of
+#   artifact.dumpFunction, or as its source for the codegen backend.
+#
+#------------------------------------------------------------------------------
+
+import os, sys, logging
+import pickle
+from hashlib import sha1
+
+import build_cache
+
+#------------------------------------------------------------------------------
+#
+# zcode names of the signals used by the code of a ProcessBuilder, in the
+# order they are first used, and the sid of each
+
+def signalKeys(vm):
+
+    keys = []
+    sids = []
+    for op in vm.code:
+
+        name = op.__class__.__name__
+        if name in ['PushSigOp', 'JumpNotRisingOp']:
+            key, sid = op.key, op.object.sid
+        elif name == 'RangeCreateOp' and op.klass != 'VARIABLE':
+            key, sid = op.target, op.sid
+        else:
+            continue
+
+        if key not in keys:
+            keys.append(key)
+            sids.append(sid)
+
+    return keys, sids
+
+#----
+#
+# Key of the linked ProcessBuilder vm of design process proc
+
+def processKey(vm, proc):
+
+    sim = vm.sim
+    h   = sha1()
+
+    h.update(build_cache.sourceDigest())
+    h.update(sys.version)
+    h.update(repr((sim.backend, sim.tiered, sim.optimize, sim.fs_per_tick)))
+
+    for line in proc.code.code_buf:
+        h.update(' '.join(line) + '\n')
+
+    for var in vm.var_list:
+        args = (var.name, var.__class__.__name__, str(var), getattr(var, '_min', None),
+                getattr(var, '_max', None), getattr(var, '_dir', None))
+        h.update(repr(args))
+
+    h.update(repr(sorted(vm.inst.constants.items())))
+
+    keys, sids = signalKeys(vm)
+    for key, sid in zip(keys, sids):
+        sig = vm.signals[sid]
+        h.update(repr((key, sids.index(sid), sig.__class__.__name__, str(getattr(sig, 'spec', None)))))
+
+    return h.hexdigest()
+
+#------------------------------------------------------------------------------
+#
+# The entry of key in the store at path, None if there is none
+
+def load(path, key):
+
+    file_name = os.path.join(path, key + '.obj')
+    if not os.path.exists(file_name):
+        return None
+
+    obj_file = open(file_name, 'rb')
+    try:
+        try:
+            return pickle.load(obj_file)
+        except Exception, msg:
+            logging.warning('Object %s not loaded: %s' % (file_name, msg))
+            return None
+    finally:
+        obj_file.close()
+
+#----
+
+#
+# Save the entry of key in the store at path. The entry is written to a
+# temporary file that is renamed into place, a build that fails doesn't
+# leave a partial entry. An entry that can't be saved is skipped
+
+def save(path, key, entry):
+
+    file_name = os.path.join(path, key + '.obj')
+    temp_name = '%s.%d.tmp' % (file_name, os.getpid())
+
+    try:
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        obj_file = open(temp_name, 'wb')
+        try:
+            pickle.dump(entry, obj_file, 2)
+        finally:
+            obj_file.close()
+
+        os.rename(temp_name, file_name)
+
+    except Exception, msg:
+        logging.warning('Object %s not saved: %s' % (file_name, msg))
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
@@ -0,0 +1,156 @@
+#------------------------------------------------------------------------------
+#
+#   peephole.py - 10/18/26
+#
+#   Peephole optimizer for the text bytecode of a process, run by
+#   ProcessBuilder.buildBytecode() before the code is encoded. Patterns
+#   are matched in straight line code, a label ends them.
+#
+#    methods   - vm.scheduleAssignment, vm.scheduleDelay & vm.waitOn are
+#                bound to fast locals by the preamble
+#    globals   - the std helpers & builtins used by vm_ops are loaded as
+#                constants
+#    rotations - a ROT_TWO/THREE/FOUR of values pushed just before it by
+#                loads becomes a different order of the loads, ROT_TWO
+#                pairs cancel
+#    constants - BINARY_FLOOR_DIVIDE of int constants, a delay converted
+#                from fs to ticks, is computed
+#
+#------------------------------------------------------------------------------
+
+import __builtin__
+from opcode import opmap, HAVE_ARGUMENT
+
+from byteplay import Label
+
+# Methods of the process bound to <name>_lcl
+methods = ['scheduleAssignment', 'scheduleDelay', 'waitOn']
+
+# Globals loaded as constants
+helpers = ['SLVRange', 'SLVRange_bc', 'SLVRange_bc2', 'SLVRange_bc3', 'binary_op',
+           'str', 'float']
+
+# Loads with no side effects that can be reordered
+loads = set(['LOAD_FAST', 'LOAD_CONST'])
+
+# Values moved by a rotation
+rotations = {'ROT_TWO' : 2, 'ROT_THREE' : 3, 'ROT_FOUR' : 4}
+
+#------------------------------------------------------------------------------
+#
+# Size in bytes of the encoded text bytecode
+
+def size(text_bc):
+
+    n = 0
+    for op, arg in text_bc:
+        if isinstance(op, Label):
+            continue
+        if opmap[op] >= HAVE_ARGUMENT:
+            n += 3
+        else:
+            n += 1
+
+    return n
+
+#----
+
+def count(stats, item, n=1):
+    stats[item] = stats.get(item, 0) + n
+
+#------------------------------------------------------------------------------
+#
+# Optimize text_bc, globals are looked up in g. Returns the new text
+# bytecode, the number of each change is added to stats
+
+def optimize(text_bc, g, stats):
+
+    result = []
+    bound  = []
+    run    = 0          # loads at the end of result
+
+    for op, arg in text_bc:
+
+        if isinstance(op, Label):
+            result.append((op, arg))
+            run = 0
+            continue
+
+        if op == 'LOAD_ATTR' and arg in methods and run and result[-1] == ('LOAD_FAST', 'vm'):
+            result[-1] = ('LOAD_FAST', arg + '_lcl')
+            if arg not in bound:
+                bound.append(arg)
+            count(stats, 'method lookups bound')
+            continue
+
+        if op == 'LOAD_GLOBAL' and arg in helpers:
+            try:
+                value = g[arg]
+            except KeyError:
+                value = getattr(__builtin__, arg)
+            op, arg = 'LOAD_CONST', value
+            count(stats, 'globals loaded as constants')
+
+        if op == 'ROT_TWO' and result and result[-1] == ('ROT_TWO', None):
+            result.pop()
+            run = 0
+            count(stats, 'rotations removed')
+            continue
+
+        if op in rotations and run >= rotations[op]:
+            # Load TOS before the values it is rotated under
+            result.insert(len(result) - rotations[op], result.pop())
+            count(stats, 'rotations removed')
+            continue
+
+        if op == 'BINARY_FLOOR_DIVIDE' and run >= 2 and constInt(result[-2]) and constInt(result[-1]):
+            right = result.pop()[1]
+            left  = result.pop()[1]
+            result.append(('LOAD_CONST', left // right))
+            run -= 1
+            count(stats, 'constants folded')
+            continue
+
+        result.append((op, arg))
+
+        if op in loads:
+            run += 1
+        else:
+            run = 0
+
+    preamble = []
+    for name in bound:
+        preamble.append(('LOAD_FAST', 'vm'))
+        preamble.append(('LOAD_ATTR', name))
+        preamble.append(('STORE_FAST', name + '_lcl'))
+
+    result = preamble + result
+
+    count(stats, 'bytes before', size(text_bc))
+    count(stats, 'bytes after', size(result))
+
+    return result
+
+#----
+#
+# A non zero int constant
+
+def constInt(instr):
+
+    op, arg = instr
+    return op == 'LOAD_CONST' and type(arg) in (int, long) and arg != 0
+
+#------------------------------------------------------------------------------
+#
+# Text report of the stats of all processes
+
+def report(stats):
+
+    lines = ['PEEPHOLE: %d -> %d bytes of bytecode' % (stats.get('bytes before', 0),
+                                                      stats.get('bytes after', 0))]
+
+    for item in sorted(stats):
+        if not item.startswith('bytes'):
+            lines.append('  %s : %d' % (item, stats[item]))
+
+    return lines
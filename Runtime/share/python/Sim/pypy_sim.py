@@ -63,6 +63,6 @@ sim.run()
     
 end_time = clock()    
 print 'Elapsed time = %.4f' % (end_time - start_time)
-print 'Simulation time = %.2f ns' % sim.time
+print 'Simulation time = %.2f ns' % sim.timeNs()
 print
     
\ No newline at end of file
@@ -0,0 +1,369 @@
+#------------------------------------------------------------------------------
+#
+#   scheduler.py - 10/18/26
+#
+#   Event schedulers used for sim.queue
+#
+#   HeapScheduler  - a heapq queue of (time, priority, sequence, event) 
+#                    tuples, compared natively. Kept as a reference mode.
+#
+#   WheelScheduler - a bucketed timing wheel keyed on integer tick time.
+#                    Each slot maps an exact event time to a bucket holding
+#                    plain FIFO lists, so no event comparisons are done.
+#                    Events too far in the future wait in an overflow heap
+#                    keyed on (time, sequence) until the wheel reaches them.
+#
+#------------------------------------------------------------------------------
+
+from heapq import heappush, heappop
+
+# DelayEvent priority, these are merged & run after all other events at a time
+DELAY_PRIORITY = 10002
+
+#------------------------------------------------------------------------------
+#
+# Reference scheduler, uses a heap of event tuples. The sequence number 
+# keeps events with the same time & priority in FIFO order
+
+class HeapScheduler(object):
+
+    __slots__ = ('heap', 'seq')
+
+    def __init__(self):
+        self.heap = []
+        self.seq  = 0
+
+    #----
+
+    def push(self, evt):
+        self.seq += 1
+        heappush(self.heap, (evt.time, evt.priority, self.seq, evt))
+
+    #----
+
+    def pop(self):
+        # Raises IndexError when empty, like heappop
+        return heappop(self.heap)[3]
+
+    #----
+
+    def peek(self):
+        return self.heap[0][3]
+
+    #----
+
+    def popTime(self):
+        
+        # Pop all events at the earliest time, in pop order
+        heap   = self.heap
+        entry  = heappop(heap)
+        time   = entry[0]
+        result = [entry[3]]
+        
+        while heap and heap[0][0] == time:
+            result.append(heappop(heap)[3])
+            
+        return result
+
+    #----
+
+    def events(self):
+        # All queued events in pop order
+        return [entry[3] for entry in sorted(self.heap)]
+
+    #----
+
+    def __len__(self):
+        return len(self.heap)
+
+#------------------------------------------------------------------------------
+#
+# All events scheduled for one exact time.
+#
+#  . events: all events except DelayEvents, in FIFO order
+#  . delay:  a single DelayEvent, other DelayEvents at this time are merged in
+
+class _Bucket(object):
+
+    __slots__ = ('time', 'events', 'pos', 'delay')
+
+    def __init__(self, time):
+
+        self.time   = time
+        self.events = []
+        self.pos    = 0
+        self.delay  = None
+
+    #----
+    # Returns False if evt was merged with an event already in the bucket
+
+    def add(self, evt):
+
+        if evt.priority != DELAY_PRIORITY:
+            self.events.append(evt)
+
+        elif self.delay is None:
+            self.delay = evt
+            
+        else:
+            self.delay.vm_list.extend(evt.vm_list)
+            return False
+
+        return True
+
+    #----
+
+    def pop(self):
+
+        events = self.events
+        pos    = self.pos
+
+        if pos < len(events):
+            evt = events[pos]
+            pos += 1
+            if pos == len(events):
+                # FIFO exhausted, start a new list
+                self.events = []
+                pos = 0
+            self.pos = pos
+            return evt
+
+        evt = self.delay
+        self.delay = None
+        return evt
+
+    #----
+
+    def first(self):
+
+        if self.pos < len(self.events):
+            return self.events[self.pos]
+
+        return self.delay
+
+    #----
+
+    def pending(self):
+
+        result = self.events[self.pos:]
+        if self.delay is not None:
+            result.append(self.delay)
+
+        return result
+
+    #----
+    # Remove & return all events
+
+    def drain(self):
+        
+        result = self.pending()
+        
+        self.events = []
+        self.pos    = 0
+        self.delay  = None
+        
+        return result
+
+    #----
+
+    def empty(self):
+        return self.pos >= len(self.events) and self.delay is None
+
+#------------------------------------------------------------------------------
+#
+# Timing wheel scheduler
+#
+#  slots: number of wheel slots, rounded up to a power of 2
+#  width: integer number of ticks covered by each slot
+
+class WheelScheduler(object):
+
+    __slots__ = ('slots', 'mask', 'size', 'width', 'base', 'current',
+                 'overflow', 'count', 'seq')
+
+    def __init__(self, slots=1024, width=1):
+
+        size = 1
+        while size < slots:
+            size <<= 1
+
+        self.slots    = [None] * size   # each entry is None or {time: _Bucket}
+        self.size     = size
+        self.mask     = size - 1
+        self.width    = int(width)
+
+        self.base     = 0               # absolute slot number of wheel position
+        self.current  = None            # bucket being drained
+        self.overflow = []              # heap of (time, seq, evt)
+        self.count    = 0
+        self.seq      = 0
+
+    #----
+
+    def push(self, evt):
+
+        time    = evt.time
+        current = self.current
+
+        if current is not None and time == current.time:
+            if current.add(evt):
+                self.count += 1
+            return
+
+        n = time // self.width
+
+        if n - self.base >= self.size:
+            # Too far in the future for the wheel
+            self.seq += 1
+            heappush(self.overflow, (time, self.seq, evt))
+            self.count += 1
+            return
+
+        if self._insert(n, evt):
+            self.count += 1
+
+    #----
+
+    def _insert(self, n, evt):
+
+        index = n & self.mask
+        slot  = self.slots[index]
+
+        if slot is None:
+            slot = self.slots[index] = {}
+
+        time = evt.time
+        try:
+            bucket = slot[time]
+        except KeyError:
+            bucket = slot[time] = _Bucket(time)
+
+        return bucket.add(evt)
+
+    #----
+    # Return the bucket with the next event, advancing the wheel if needed
+
+    def _next(self):
+
+        current = self.current
+        if current is not None and not current.empty():
+            return current
+
+        if self.count == 0:
+            raise IndexError('pop from empty scheduler')
+
+        slots = self.slots
+        mask  = self.mask
+        size  = self.size
+        width = self.width
+
+        while True:
+
+            # Slot numbers can exceed a C long (waitFor() waits sys.maxint ns),
+            # so xrange can't be used here
+            n     = self.base
+            limit = n + size
+            while n < limit:
+
+                slot = slots[n & mask]
+                if slot:
+                    time   = min(slot)
+                    bucket = slot.pop(time)
+                    if not slot:
+                        slots[n & mask] = None
+
+                    self._advance(n)
+                    self.current = bucket
+                    return bucket
+
+                n += 1
+
+            # Wheel is empty, jump to the first overflow event
+            self._advance(self.overflow[0][0] // width)
+
+    #----
+    # Move the wheel to absolute slot n, pulling in overflow events
+    # that now fall within the wheel
+
+    def _advance(self, n):
+
+        self.base = n
+        limit     = n + self.size
+        overflow  = self.overflow
+        width     = self.width
+
+        while overflow and overflow[0][0] // width < limit:
+            time, seq, evt = heappop(overflow)
+            if not self._insert(time // width, evt):
+                # Merged with a DelayEvent already in the wheel
+                self.count -= 1
+
+    #----
+
+    def pop(self):
+
+        evt = self._next().pop()
+        self.count -= 1
+
+        return evt
+
+    #----
+
+    def popTime(self):
+        
+        # Pop all events at the earliest time, in pop order
+        result = self._next().drain()
+        self.count -= len(result)
+        
+        return result
+
+    #----
+
+    def peek(self):
+        return self._next().first()
+
+    #----
+
+    def events(self):
+
+        # All queued events in (approximate) pop order, for debugging
+        result = []
+
+        if self.current is not None:
+            result.extend(self.current.pending())
+
+        buckets = []
+        for slot in self.slots:
+            if slot:
+                buckets.extend(slot.itervalues())
+
+        buckets.sort(key=lambda bucket: bucket.time)
+        for bucket in buckets:
+            result.extend(bucket.pending())
+
+        result.extend([evt for _, _, evt in sorted(self.overflow)])
+
+        return result
+
+    #----
+
+    def __len__(self):
+        return self.count
+
+#------------------------------------------------------------------------------
+#
+# Create a scheduler by name
+
+schedulers = {
+    'heap'  : HeapScheduler,
+    'wheel' : WheelScheduler,
+}
+
+def makeScheduler(kind='wheel', **options):
+
+    try:
+        cls = schedulers[kind]
+    except KeyError:
+        raise ValueError('Unknown scheduler %s, use one of: %s' % (kind, ', '.join(sorted(schedulers))))
+
+    return cls(**options)
@@ -2,68 +2,364 @@
 #
 #  event_compare.py - 2/5/16
 #
-#  Superclass of objects used with sim.queue. Facilitates priority sorting 
+#  Superclass of objects used with sim.queue. 
+#
+#  Events have a time (integer ticks) and a priority. The schedulers order 
+#  events by (time, priority, sequence), see scheduler.py, so events are
+#  never compared with each other.
 #   
 #------------------------------------------------------------------------------
 
 import logging
 
+from std import StdLogic, StdLogicVector, decode
+
 #------------------------------------------------------------------------------
 
 class ComparableEvent(object):
-            
-    def __lt__(self, other):
-        
-        if self.time == other.time:
-            return self.priority < other.priority
-        
-        if self.time < other.time:
-            return True
-        
-        if self.time > other.time:
-            return False
+    
+    __slots__ = ()
                 
 #------------------------------------------------------------------------------
+#
+# A kernel entry for the transactions of a Driver at time. SignalEvents are
+# recycled, use SignalEvent.new() to get one.
 
 class SignalEvent(ComparableEvent):
     
-    evt_id = 1
+    # Free list of SignalEvents
+    pool = []
     
-    __slots__ = ('target', 'operand', 'time', 'priority', 'operate', '__str__', 'vm')
+    priority = 1
+    
+    __slots__ = ('driver', 'time')
                          
-    def __init__(self, vm, target, operand, delay):
+    def __init__(self, driver, time):
         
-        self.target  = target
-        self.operand = operand
-        self.time    = float(delay) + vm.sim.time
+        self.driver  = driver
+        self.time    = time                        # integer ticks
         
-        self.priority = SignalEvent.evt_id # Before all but stop
+    #----
+    
+    @staticmethod
+    def new(driver, time):
+        
+        pool = SignalEvent.pool
+        if pool:
+            evt = pool.pop()
+            evt.driver = driver
+            evt.time   = time
+            return evt
         
-        # Increment value used to keep SignalEvents in FIFO order in event queue
-        SignalEvent.evt_id += 1
+        return SignalEvent(driver, time)
             
     #----
     
     def operate(self, cycle):
+        
+        # Nothing refers to this event after operate, recycle it
+        driver = self.driver
+        self.driver = None
+        SignalEvent.pool.append(self)
+        
         # Return a list of processes to resume 
-        return self.target.updateValue(self.operand, cycle, self.time)
+        return driver.update(self.time, cycle)
     
     #----
     
     def __str__(self):
-        return 'SignalEvent at %.2f, %s <= %s, priority = %d' % (self.time, self.target.name, self.operand, self.priority)
+        return 'SignalEvent at %d ticks, %s' % (self.time, self.driver)
 
 #------------------------------------------------------------------------------
+#
+# The driver of a signal by one process. The driver holds the projected
+# waveform, a time ordered list of [time, value, target] transactions, the
+# values are copies of the operands when they were assigned (see snapshot).
+# target is None for an assignment to the whole signal, or the SLVRange of
+# an indexed or sliced assignment. Transactions at the same time are applied
+# in assignment order, so a later assignment overrides an earlier one.
+#
+# A new transaction deletes the transactions at or after its time of the
+# elements it drives (transport), see covers. An inertial transaction also 
+# deletes the earlier transactions of those elements within the pulse 
+# rejection limit, except for a run of transactions with the same value 
+# just before it. A transaction of a range that only overlaps the new one 
+# is kept. The driver has at most one SignalEvent in the kernel for each 
+# time in the waveform.
+#
+# drivers are all the drivers of the signal. The only driver of a signal 
+# drops a zero delay assignment of the target's value when it has no 
+# transactions, it would not be an event.
+#
+# A process has one Driver per signal, see driverKey.
+
+class Driver(object):
+    
+    # Free list of [time, value, target] transactions
+    pool = []
+    
+    __slots__ = ('sim', 'target', 'waveform', 'pending', 'drivers')
+    
+    def __init__(self, sim, target):
+        
+        self.sim      = sim
+        self.target   = target  # the signal
+        self.waveform = []      # projected transactions
+        self.pending  = set()   # times with a SignalEvent in the kernel
+        
+        self.drivers = sim.drivers.setdefault(id(target), [])
+        self.drivers.append(self)
+        
+    #----
+    #
+    # Add a transaction. delay & reject are in ticks, a reject of None 
+    # makes the pulse rejection limit equal to delay. target is the signal
+    # or a range of it
+    
+    def assign(self, operand, delay=0, reject=None, inertial=True, target=None):
+        
+        if target is self.target:
+            target = None
+            
+        wave = self.waveform
+        
+        if not delay and not wave and len(self.drivers) == 1:
+            if unchanged(self.target if target is None else target, operand):
+                self.sim.dropped += 1
+                return
+        
+        time  = self.sim.time + delay
+        value = snapshot(operand)
+        
+        n = len(wave)
+        if n:
+            n = self.cut(time, target)
+            if inertial and n:
+                if reject == None:
+                    reject = delay
+                n = self.reject(time - reject, value, target, n)
+        
+        pool = Driver.pool
+        if pool:
+            trans = pool.pop()
+            trans[0] = time
+            trans[1] = value
+            trans[2] = target
+        else:
+            trans = [time, value, target]
+        
+        if n == len(wave):
+            wave.append(trans)
+        else:
+            wave.insert(n, trans)
+        
+        if time not in self.pending:
+            self.pending.add(time)
+            self.sim.schedule(SignalEvent.new(self, time))
+            
+    #----
+    #
+    # Delete the transactions of target's elements at or after time. A
+    # transaction at the same time is superseded, its SignalEvent is reused.
+    # Return the index of the new transaction, after the remaining ones at
+    # time
+    
+    def cut(self, time, target):
+        
+        wave = self.waveform
+        
+        n = len(wave)
+        while n and wave[n-1][0] >= time:
+            n -= 1
+            
+        if target is None:
+            del wave[n:]
+            return n
+            
+        wave[n:] = [trans for trans in wave[n:] if not self.covers(target, trans[2])]
+        
+        while n < len(wave) and wave[n][0] == time:
+            n += 1
+        return n
+        
+    #----
+    #
+    # Inertial delay pulse rejection for the transactions of target's 
+    # elements at or after limit, before index n. Return the new index n
+            
+    def reject(self, limit, value, target, n):
+        
+        wave = self.waveform
+        keep = True
+        
+        k = n
+        while k and wave[k-1][0] >= limit:
+            k -= 1
+            trans = wave[k]
+            if not self.covers(target, trans[2]):
+                continue
+                
+            # Keep transactions with the new value just before the new one
+            if keep and sameValue(trans[1], value):
+                continue
+            
+            # Delete the rest of the transactions in the rejection window
+            keep = False
+            del wave[k]
+            n -= 1
+            
+        return n
+        
+    #----
+    #
+    # True if the elements driven by target include those of other, None is
+    # the whole signal
+    
+    def covers(self, target, other):
+        
+        if target is None:
+            return True
+        
+        if other is None:
+            other = self.target
+        
+        return target._min <= other._min and other._max <= target._max
+        
+    #----
+    #
+    # Called by SignalEvent.operate, apply the transactions at time in 
+    # assignment order
+    
+    def update(self, time, cycle):
+        
+        self.pending.discard(time)
+        
+        wave    = self.waveform
+        pool    = Driver.pool
+        waiting = ()
+        
+        while wave and wave[0][0] == time:
+            trans   = wave.pop(0)
+            operand = trans[1]
+            target  = trans[2]
+            
+            # Recycle the transaction
+            trans[1] = None
+            trans[2] = None
+            pool.append(trans)
+            
+            if target is None:
+                target = self.target
+            
+            # The waiting set of the signal, or () if unchanged
+            result = target.updateValue(operand, cycle, time)
+            if result != None and result != ():
+                waiting = result
+        
+        return waiting
+    
+    #----
+    
+    def __str__(self):
+        return 'Driver of %s: %s' % (self.target.name, self.waveform)
+
+#------------------------------------------------------------------------------
+#
+# The assign method of a Driver for a range of its signal, bound to the fast
+# local of a fused assignment to the range (see BytecodeProcess.driver)
+
+class RangeDriver(object):
+    
+    __slots__ = ('driver', 'target')
+    
+    def __init__(self, driver, target):
+        
+        self.driver = driver
+        self.target = target
+        
+    #----
+    
+    def assign(self, operand, delay=0, reject=None, inertial=True):
+        self.driver.assign(operand, delay, reject, inertial, self.target)
+
+#------------------------------------------------------------------------------
+#
+# The key of the Driver of target in a process, its signal. An indexed or
+# sliced target is an SLVRange of the signal
+
+def driverKey(target):
+    return getattr(target, 'slv', target)
+    
+#----
+#
+# The value of operand when it is assigned, the operand may be a signal or
+# variable that changes before the transaction is applied. A vector without
+# metavalues is copied as its packed value, a bit is one of bit_values.
+# Strings & integers from a testbench are not copied
+
+bit_values = [StdLogic(c) for c in decode]
+
+def snapshot(operand):
+    
+    if isinstance(operand, StdLogic):
+        return bit_values[operand.getVal()[0]]
+    
+    try:
+        bits, mask = operand.packed()
+    except AttributeError:
+        return operand
+    
+    if mask:
+        return operand.new().setVal(operand.getVal())
+    
+    return StdLogicVector.fromPacked(len(operand), bits)
+    
+#----
+#
+# True if the transaction values a & b are equal, by their packed bits or
+# their encoded values when they have metavalues
+
+def sameValue(a, b):
+    
+    try:
+        pa = a.packed()
+        pb = b.packed()
+    except AttributeError:
+        return str(a) == str(b)
+    
+    if pa[1] or pb[1]:
+        return a.getVal() == b.getVal()
+    
+    return pa == pb and len(a) == len(b)
+
+#----
+#
+# True if operand is the value of target. Only values without metavalues
+# are compared, by their packed bits, others are left to updateValue
+
+def unchanged(target, operand):
+    
+    try:
+        pk = operand.packed()
+        return not pk[1] and pk == target.packed() and len(operand) == len(target)
+    except AttributeError:
+        return False
+
+#------------------------------------------------------------------------------
+
+# Resumes vm after delay, or its WaitToken token when the delay is the 
+# timeout of a wait that also has signal wakeups
 
 class DelayEvent(ComparableEvent):
 
-    __slots__ = ('vm_list', 'time', 'priority', 'operate', '__cmp__', '__str__')
+    priority = 10002 # After signal events
+
+    __slots__ = ('vm_list', 'time')
         
-    def __init__(self, vm, delay=0.0):
+    def __init__(self, vm, delay=0, token=None):
                
-        self.vm_list  = [vm]
-        self.time     = float(delay) + vm.sim.time
-        self.priority = 10002 # After signal events
+        self.vm_list  = [vm if token == None else token]
+        self.time     = delay + vm.sim.time         # integer ticks
         
     #----
     
@@ -73,5 +369,5 @@ class DelayEvent(ComparableEvent):
     #----
     
     def __str__(self):
-        return 'DelayEvent: %.2f ns' % self.time
+        return 'DelayEvent at %d ticks' % self.time
        
\ No newline at end of file
@@ -6,7 +6,7 @@
 #
 #   Run a simulation of the design in the named project directory
 #
-# Command: python sim_exec.py <project_directory_name>
+# Command: python sim_exec.py <project_directory_name> [--rebuild] [--jobs N]
 #
 #------------------------------------------------------------------------------
 #-                        This is a Python file                               -
@@ -114,7 +114,9 @@ py_path = os.path.dirname(location)
 # Simulator python source file imports
 from Sim.design_parser import Design, Parsing_Exception
 from Sim.interp import SimBuilder, SimExe
-from Sim.vcd_dump import VCD_Filefrom Sim.PyModule import Process, waitFor, waitOn
+from Sim.vcd_dump import VCD_File
+from Sim import build_cache, design_ir
+from Sim.PyModule import Process, waitFor, waitOn
  
 #-------------------------------------------------------------------------------
 #
@@ -126,44 +128,66 @@ def runSim(sim, start_time):
 	
 	end_time = clock()	
 	print 'Elapsed time = %.4f' % (end_time - start_time)
-	print 'Simulation time = %.2f ns' % sim.time
+	print 'Simulation time = %.2f ns' % sim.timeNs()
 	print
 
 #-------------------------------------------------------------------------------
 #
-# If design.ser is more recent than design.txt,
+# If design.ser was built from the same design file, simulator source &
+# options (see build_cache.py),
 # 	then load design.ser
 # Else,
 #	run design parser & create design.ser 
 #  
 
 ser_path  = 'design.ser'
-dsn_path  = 'design.txt'
-
-   
-dsn_ts    = os.path.getmtime(dsn_path)
-print 'dsn_ts: %s' % strftime('%a %b. %d, %H:%M', localtime(dsn_ts))
-
-try:
-	ser_ts = os.path.getmtime(ser_path)
-	print 'ser_ts: %s' % strftime('%a %b. %d, %H:%M', localtime(ser_ts))
-	if ser_ts > dsn_ts:
-        # design.ser is up to date
-		serialize = False
-	else:
-        # design.txt is more recent than design.ser
-		serialize = True
-		 
-except WindowsError:
-    # design.ser does not exist
-	print 'design.ser does not exist'
-	serialize = True
+# design.bin, or design.txt if it is newer (see design_ir.py)
+dsn_path  = design_ir.designPath()
+
+#################################################
+# Write the optimized IR to ir_dump.txt if True #
+#################################################
+
+dump_ir = False
+
+############################################################
+# Process code generator, 'bytecode' or 'source' (sim_src) #
+############################################################
+
+backend = 'bytecode'
+
+###########################################################################
+# Interpret processes until they are hot, then compile them (see tier.py) #
+###########################################################################
 
-###############################
-# Force serialization if True #
-###############################
+tiered = False
 
-serialize = True
+######################################################
+# Force serialization with --rebuild after the path  #
+######################################################
+
+rebuild = '--rebuild' in sys.argv[2:]
+
+###########################################################################
+# Compile the processes with N worker processes with --jobs N, the design #
+# is the same for any N (see build_jobs.py)                               #
+###########################################################################
+
+jobs = 1
+if '--jobs' in sys.argv[2:-1]:
+	jobs = int(sys.argv[sys.argv.index('--jobs') + 1])
+
+build_key = build_cache.designKey(dsn_path, {'backend' : backend, 'tiered' : tiered})
+
+if rebuild:
+	print 'Rebuild forced'
+	serialize = True
+elif build_cache.isCurrent(build_key):
+	# design.ser is up to date
+	serialize = False
+else:
+	# The design file, the simulator or the options changed
+	serialize = True
 
 print 'serialize = %s' % serialize
 
@@ -174,7 +198,7 @@ if serialize:
         
 	print
 	print 'Starting design_parser'
-	des = Design('design.txt')
+	des = Design(dsn_path)
 	print 'Design parsing done'
 	
 	try:
@@ -200,8 +224,11 @@ else:
 if status:
     # Design parsing successful
    	if serialize:   		    	       
-	    build = SimBuilder(des, project_path)
+	    build_cache.clear()
+	    build = SimBuilder(des, project_path, dump_ir=dump_ir, backend=backend, tiered=tiered,
+	                       jobs=jobs)
 	    build.serialize()
+	    build_cache.save(build_key)
 	    
 	start_time = clock()
 	sim = SimExe()
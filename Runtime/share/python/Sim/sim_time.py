@@ -0,0 +1,33 @@
+#------------------------------------------------------------------------------
+#
+#   sim_time.py - 10/18/26
+#
+#   Simulation time base. Time is an integer number of ticks, where the
+#   tick size (the resolution) is selected when the design is built.
+#
+#   zcode delays are in femtoseconds, the Python testbench API is in ns.
+#
+#------------------------------------------------------------------------------
+
+# Femtoseconds per tick for each supported resolution
+resolutions = {
+    'fs' : 1,
+    'ps' : 1000,
+    'ns' : 1000000,
+}
+
+FS_PER_NS = 1000000
+
+#----
+
+def fsPerTick(resolution):
+
+    try:
+        return resolutions[resolution]
+    except KeyError:
+        raise ValueError('Unknown time resolution %s, use one of: fs, ps, ns' % resolution)
+
+#----
+
+def ticksPerNs(resolution):
+    return FS_PER_NS // fsPerTick(resolution)
@@ -8,8 +8,9 @@
 
 import logging
 
-from array import *
-from types import StringType
+from array  import *
+from types  import StringType
+from string import maketrans
 
 #------------------------------------------------------------------------------
 
@@ -146,6 +147,9 @@ X01Z_table = to_x01z
 #------------------------------------------------------------------------------
 #
 # Functions for the unified interface for StdLogic, StdLogicVector, SLVRange 
+#
+# getVal() returns an array('B') copy of the encoded value, LSB first. 
+# setVal() accepts an array or a list.
 
 def unary_op(table, a):
     # encode, decode, to_X01Z, not        
@@ -168,6 +172,56 @@ def arith_op(table, a, b):
     
     return result
 
+#----
+#
+# Fit an encoded value to width bits, aligned on the LSB. A value that is
+# too short is extended with its MSB, one that is too long is truncated.
+# Signal storage has a fixed width, so the zcode's occasional odd width
+# literal can't replace the signal's value list like it used to.
+
+def fit_width(val, width):
+    
+    if len(val) < width:
+        pad = array('B', val[-1:] or [encode['U']])
+        return val + pad * (width - len(val))
+    
+    return val[:width]
+
+#------------------------------------------------------------------------------
+#
+# Packed representation of std_logic_vector values, a (bits, mask) pair of 
+# integers where bit i of each is for bit i of the vector. A mask bit is set
+# for a metavalue (U X Z W L H -), its value bit is 0. When the mask is 0, 
+# logical operations & compares are single integer operations, otherwise
+# they use the per-bit 9-value tables.
+
+_pack_bits   = ''.join(['1' if c == 3 else '0' for c in range(256)])
+_pack_mask   = ''.join(['0' if c in (2, 3) else '1' for c in range(256)])
+_unpack_bits = maketrans('01', '\x02\x03')
+
+# Packed value of each encoded StdLogic value
+packed_bit = tuple([(int(c == 3), int(c not in (2, 3))) for c in range(9)])
+
+#----
+# Pack an array('B') of encoded values, LSB first
+
+def pack(val):
+    
+    s    = val.tostring()
+    bits = int(s.translate(_pack_bits)[::-1], 2)
+    mask = s.translate(_pack_mask)
+    
+    if '1' in mask:
+        return bits, int(mask[::-1], 2)
+    
+    return bits, 0
+
+#----
+# Encoded array('B') of width bits for a packed value with a 0 mask
+
+def unpack(bits, width):
+    return array('B', bin(bits)[2:].rjust(width, '0')[::-1].translate(_unpack_bits))
+
 #------------------------------------------------------------------------------
 #
 # Superclass to implement common operations of unified interface objects 
@@ -179,7 +233,7 @@ def arith_op(table, a, b):
 class Operations(object):
     
     __slots__ = ('And', 'Or', 'Nor', 'Xor', 'Not', 'Add', 'Concat', 'Equal',
-                 'sim', 'current', 'last', 'waiting', 'vcd_mgr', 'vcd_nodes',
+                 'sim', 'waiting', 'vcd_mgr', 'vcd_nodes',
                  )
     
     def And(self, other):        
@@ -238,18 +292,27 @@ class Operations(object):
 
 class StdLogic(Operations):
 
-    __slots__ = ('name', 'spec', '_val', 'sid', 'inst', 'current', 'sim', '_min',
+    # The encoded value is _buf[_off], a private one byte buffer until
+    # the signal is attached to the design's ValueStore
+    #
+    # Each event records the encoded value before the event (last_val),
+    # the event time (evt_time) and the delta cycle (evt_cycle), see
+    # SimExe.processEvents
+
+    __slots__ = ('name', 'spec', '_buf', '_off', 'sid', 'inst', 'sim', '_min',
                  '_literal_to_Std', '__len__', 'first', 'getVal', 'setVal', '__getstate__',
-                 'new', 'rising_op', '__le__', 'setValue', 'is_equal', 'last', '__repr__',
+                 'new', 'rising_op', '__le__', 'setValue', 'is_equal', '__repr__',
                  'waiting', 'vcd_mgr', 'vcd_nodes', 'initialize', 'updateValue',
-                 '__setstate__', 'is_variable', 'evt_cycle', 'not_rising_op'
+                 '__setstate__', 'is_variable', 'evt_cycle', 'not_rising_op',
+                 'last_val', 'evt_time'
                 )
 
     def __init__(self, initializer='U'):
     
         Operations.__init__(self)
         
-        self._val  = self._literal_to_Std(initializer)
+        self._buf  = array('B', [self._literal_to_Std(initializer)])
+        self._off  = 0
         self._min  = 0
                 
         self.name  = '??'     # set by DesignParser
@@ -260,6 +323,8 @@ class StdLogic(Operations):
         
         self.is_variable = False
         
+        self.last_val    = self._buf[0]
+        self.evt_time    = 0
         self.evt_cycle   = -1
 
     #----
@@ -268,26 +333,48 @@ class StdLogic(Operations):
                
         self.sim        = sim
          
-        self.current    = [self._val, 0.0]
-        self.last       = [self._val, 0.0]        
-        self.waiting    = set()
+        self.last_val   = self._buf[self._off]
+        self.evt_time   = 0
         self.evt_cycle  = -1
+        self.waiting    = set()
         
 #         # VCD attributes
         self.vcd_mgr  = None 
         self.vcd_nodes    = []
         
+    #----
+    #
+    # Make this signal a view on buf[offset], used by ValueStore
+    
+    def attach(self, buf, offset):
+        self._buf = buf
+        self._off = offset
+        
+    #----
+    
+    @property
+    def _val(self):
+        return self._buf[self._off]
+    
+    @_val.setter
+    def _val(self, value):
+        self._buf[self._off] = value
+        
     #----
     
     def updateValue(self, other, cycle, time):
+        
+        try:
+            new = other.getVal()[0]                
+        except AttributeError:
+            new = encode[str(other)]
+        
+        buf = self._buf
+        old = buf[self._off]
                                 
-        if str(other) != str(self):
+        if new != old:
             # Value has changed
-            try:
-                self._val = other.getVal()[0]                
-            except AttributeError:
-                self._val = encode[str(other)]
-                
+            buf[self._off] = new
                 
             # Process transitions for VDC file
                 
@@ -299,20 +386,20 @@ class StdLogic(Operations):
                             self.vcd_mgr.VCD_transition(self, node, time)
                 except AttributeError:
                     
-                    print '@@@ No vcd_mgr for >%s< @ %0.3f' % (self.name, time)
+                    print '@@@ No vcd_mgr for >%s< @ %d' % (self.name, time)
                     print '@@@   self.spec: %s' % self.spec                    
                     raise AttributeError
 
             
-            self.last = self.current
-            self.current = (decode[self._val], time)
+            self.last_val  = old
+            self.evt_time  = time
             self.evt_cycle = cycle
 
             # Return set of waiting VMs & processes
             return self.waiting
             
-        # Value hasn't changed, return empty waiting set
-        return set()
+        # Value hasn't changed, nothing to wake up
+        return ()
         
     #----
            
@@ -346,13 +433,18 @@ class StdLogic(Operations):
     #----
     
     def getVal(self):         
-        return [self._val]
+        return self._buf[self._off:self._off + 1]
     
     #----
     
     def setVal(self, val):
-        self._val = val[0]        
+        self._buf[self._off] = val[0]        
         return self
+    
+    #----
+    
+    def packed(self):
+        return packed_bit[self._buf[self._off]]
         
     #----
     
@@ -362,32 +454,39 @@ class StdLogic(Operations):
    
     #----
     
+    #
+    # 'EVENT, 'LAST_VALUE & edges, encoded compares against the event stamps
+    
     def event_op(self):
-        raise Exception
-        return Bool(self.current[1] == self.sim.time)
+        return Bool(self.evt_cycle == self.sim.current_cycle)
+    
+    #----
+    
+    def last_value_op(self):
+        return StdLogic().setVal([self.last_val])
     
     #----
     
     def rising_op(self):
                 
-        if self.current[0] != '1':
+        if self._buf[self._off] != 3 or self.last_val == 3:     # '1'
             return False        
-        if self.last[0] == '1':
-            return False
         
-        return self.current[1] == self.sim.time
+        return self.evt_cycle == self.sim.current_cycle
     
     #----
     
-    def not_rising_op(self):
+    def falling_op(self):
                 
-        if self.current[0] != '1':
-            return True 
-               
-        if self.evt_cycle != self.sim.current_cycle:
-            return True
-         
-        return self.current[1] != self.sim.time
+        if self._buf[self._off] != 2 or self.last_val == 2:     # '0'
+            return False        
+        
+        return self.evt_cycle == self.sim.current_cycle
+    
+    #----
+    
+    def not_rising_op(self):
+        return self._buf[self._off] != 3 or self.evt_cycle != self.sim.current_cycle
                
     #--------------------------------------------------------------------------
     #
@@ -419,10 +518,10 @@ class StdLogic(Operations):
     # representation 
     
     def __str__(self):
-        return decode[self._val]
+        return decode[self._buf[self._off]]
     
     def VCD_str(self):
-        return to_x01z[self._val]
+        return to_x01z[self._buf[self._off]]
     
     def __repr__(self):
         return "%s: StdLogic('%s')" % (self.name, decode[self._val])
@@ -450,29 +549,38 @@ class StdLogic(Operations):
     
     def __setstate__(self, dict):
          
-        self._val        = dict['_val']                
+        self._buf        = array('B', [dict['_val']])
+        self._off        = 0
         self.name        = dict['name']
         self.spec        = dict['spec']
         self.sid         = dict['sid']
         self.is_variable = dict['is_variable']
         
-        self.current    = [self._val, 0.0]
-        self.last       = [self._val, 0.0]        
+        self.last_val   = self._buf[0]
+        self.evt_time   = 0
+        self.evt_cycle  = -1
         self.waiting    = set()
 
 #------------------------------------------------------------------------------
 
 class StdLogicVector(Operations):
        
-    # internal representation (self._val) is a list of ecoded indices with 
-    # the LSB in _val[0]
+    # internal representation is the slice _buf[_off:_end] of ecoded indices
+    # with the LSB in _buf[_off]. _buf is private until the signal is 
+    # attached to the design's ValueStore. _val is a list copy of the value
+    #
+    # _pk caches the packed (bits, mask) value, None when it must be
+    # recomputed. Results of packed operations are created by fromPacked()
+    # with only a packed value, _buf is None until the encoded value is used
+    #
+    # Events are stamped like StdLogic, last_val is an array('B') copy
     
-    __slots__ = ('_min', '_max', '_dir', '_val', 'name', 'inst', 'vcd_nodes', 'spec',
-                 'const', 'enc_val', 'sid', 'current', 'last', '__le__', 'first',
+    __slots__ = ('_min', '_max', '_dir', '_buf', '_off', '_end', '_pk', 'name', 'inst', 'vcd_nodes', 'spec',
+                 'const', 'enc_val', 'sid', '__le__', 'first',
                  'getVal', 'setVal', 'new', 'int2SLV', 'add_int_op', 'setValue',
                  'is_equal', '__str__', '__repr__', 'VCD_str', 'updateValue',
                  'waiting', 'vcd_mgr', 'initialize', '__getstate__', '__setstate__',
-                 'is_variable', 'evt_cycle'
+                 'is_variable', 'evt_cycle', 'last_val', 'evt_time'
                 )
     
     #----
@@ -497,26 +605,117 @@ class StdLogicVector(Operations):
         self.spec  = []     # set by DesignParser
         self.inst  = None     # set by DesignParser
              
-        # Initialize _val as undefined
-        self._val = [encode['u']] * (self._max - self._min + 1)
+        # Initialize value as undefined
+        self._buf = array('B', [encode['u']]) * (self._max - self._min + 1)
+        self._off = 0
+        self._end = len(self._buf)
+        self._pk  = None
         
         self.sid        = -1
         
         self.is_variable = False
                 
+    #----
+    #
+    # A DOWNTO 0 vector with a packed value, mask is 0
+    
+    @staticmethod
+    def fromPacked(width, bits):
+        
+        slv = object.__new__(StdLogicVector)
+        
+        slv._dir  = -1
+        slv._min  = 0
+        slv._max  = width - 1
+        slv._buf  = None
+        slv._off  = 0
+        slv._end  = width
+        slv._pk   = (bits, 0)
+        
+        slv.name  = 'new'
+        slv.spec  = []
+        slv.inst  = None
+        slv.sid   = -1
+        
+        slv.is_variable = False
+        slv.vcd_nodes   = []
+        
+        return slv
+        
     #----
         
     def initialize(self, sim):
                 
         self.sim        = sim                
-        self.current    = [self._val, 0.0]
-        self.last       = [self._val, 0.0]        
+        self.last_val   = self.getVal()
+        self.evt_time   = 0
+        self.evt_cycle  = -1
         self.waiting    = set()
         
         # VCD attributes
         self.vcd_mgr  = None 
         self.vcd_nodes    = []
         
+    #----
+    #
+    # Make this signal a view on buf[offset:offset+len(self)], used by ValueStore
+    
+    def attach(self, buf, offset):
+        
+        # The buffer of a packed only vector is created by getVal()
+        self.getVal()
+        
+        self._buf = buf
+        self._off = offset
+        self._end = offset + len(self)
+        self._pk  = None
+        
+    #----
+    #
+    # Encoded value buffer, created from the packed value if needed
+    
+    def buffer(self):
+        
+        if self._buf is None:
+            self._buf = unpack(self._pk[0], self._end)
+        
+        return self._buf
+    
+    #----
+    
+    def packed(self):
+        
+        pk = self._pk
+        if pk is None:
+            pk = self._pk = pack(self._buf[self._off:self._end])
+            
+        return pk
+        
+    #----
+    #
+    # Unsigned integer value, None if there are metavalues. Reuses the
+    # packed value cache, for a DOWNTO vector the packed bits are the value
+    
+    def intVal(self):
+        
+        bits, mask = self.packed()
+        if mask:
+            return None
+        
+        if self._dir < 0:
+            return bits
+        
+        return int(bin(bits)[2:].rjust(len(self), '0')[::-1], 2)
+        
+    #----
+    
+    @property
+    def _val(self):
+        return self.getVal().tolist()
+    
+    @_val.setter
+    def _val(self, value):
+        self.setVal(value)
 
     #--------------------------------------------------------------------------
     #
@@ -533,17 +732,32 @@ class StdLogicVector(Operations):
     #----
     
     def getVal(self):
-        return self._val
+        
+        buf = self._buf
+        if buf is None:
+            buf = self.buffer()
+            
+        return buf[self._off:self._end]
     
     #----
     
     def setVal(self, val):
-                
-        # * * * VERY IMPORTANT * * *
-        # The code below insures that assignment COPIES the value
-        # rather than creating a reference to the value
         
-        self._val = val[:]
+        # Assignment copies the value into the buffer, which may be shared 
+        # with other signals, so the width can't change
+        
+        if type(val) is not array:
+            val = array('B', val)
+            
+        if len(val) != self._end - self._off:
+            val = fit_width(val, self._end - self._off)
+        
+        if self._buf is None:
+            self._buf = val[:]
+        else:
+            self._buf[self._off:self._end] = val
+            
+        self._pk = None
         return self
         
     #----
@@ -558,15 +772,15 @@ class StdLogicVector(Operations):
     
     def int2SLV(self, i):
 
-        # Convert integer value i to std_logic_vector string
-        s = bin(i)[2:]
-        s = '0' * (len(self) - len(s)) + s
+        # Encoded value of integer i modulo 2**len(self), LSB first
+        # for DOWNTO vectors
+        width = len(self)
+        val = unpack(i & ((1 << width) - 1), width)
 
-        if self._dir < 0:
-            # Reverse order of bits
-            s = s[::-1]
+        if self._dir > 0:
+            val.reverse()
             
-        return [encode[c] for c in s]
+        return val
 
     #----
     #
@@ -588,7 +802,7 @@ class StdLogicVector(Operations):
                 if self._dir < 0:
                     v = reversed(value)
                 else:
-                    v = valu
+                    v = value
                     
                 exp_len = self._max - self._min + 1
                 if len(value) == exp_len:
@@ -613,22 +827,48 @@ class StdLogicVector(Operations):
     #----
         
     def updateValue(self, other, cycle, time):
+        
+        buf = self._buf
+        off = self._off
+        end = self._end
                 
         try:
-            o = other.getVal()
-            if o != self.getVal():                
-                self.setVal(other.getVal()[:])
-            else:
-                # Value has not changed
-                return set()
-                
+            pk = other.packed()
+            
         except AttributeError:
             
-            if str(other) != str(self):
-                 self.__le__(other)
-            else:
+            # A string or integer, from a testbench
+            old = buf[off:end]
+            self.__le__(other)
+            if buf[off:end] == old:
                 # Value has not changed
-                return set()
+                return ()
+            
+        else:
+            if pk[1] == 0 and len(other) == end - off:
+                
+                # Compare & update the packed value
+                if pk == self.packed():
+                    # Value has not changed
+                    return ()
+                
+                old = buf[off:end]
+                buf[off:end] = unpack(pk[0], end - off)
+                self._pk = pk
+                
+            else:
+                # Value has metavalues, compare encoded values 
+                old = buf[off:end]
+                o   = other.getVal()
+                if len(o) != len(old):
+                    o = fit_width(o, len(old))
+                
+                if o == old:
+                    # Value has not changed
+                    return ()
+                
+                buf[off:end] = o
+                self._pk = None
 
         # Process transitions for VDC file
             
@@ -638,18 +878,41 @@ class StdLogicVector(Operations):
                 for node in self.vcd_nodes:
                     self.vcd_mgr.VCD_transition(self, node, time)
             
-        self.last = self.current
-        self.current = (str(self), time)
+        self.last_val  = old
+        self.evt_time  = time
+        self.evt_cycle = cycle
                                          
         # Return set of waiting VMs & processes
         return self.waiting
         
     #----
+    
+    def event_op(self):
+        return Bool(self.evt_cycle == self.sim.current_cycle)
+    
+    #----
+    
+    def last_value_op(self):
+        return self.new().setVal(self.last_val)
+        
+    #----
      
     def add_int_op(self, other):
 
+        val = self.intVal()
+        if val is not None:
+            width = len(self)
+            return StdLogicVector.fromPacked(width, (val + other) & ((1 << width) - 1))
+
+        # The tables add LSB first, a TO vector is stored MSB first
+        val   = self.getVal()
+        other = self.int2SLV(other)
+        if self._dir > 0:
+            val.reverse()
+            other.reverse()
+            
         result = self.new()
-        result.setVal(arith_op(sum_table, self.getVal(), self.int2SLV(other)))
+        result.setVal(arith_op(sum_table, val, other))
         return result 
                     
     #--------------------------------------------------------------------------
@@ -664,26 +927,23 @@ class StdLogicVector(Operations):
         if other.spec != self.spec:
             return False
         
-        return self._val == other._val
+        return self.getVal() == other.getVal()
 
     #---- representation 
     
     def __str__(self):
          
         if self._dir < 0:
-            return ''.join(map(decoder, self._val))[::-1]
+            return ''.join(map(decoder, self.getVal()))[::-1]
             
-        return ''.join(map(decoder, self._val))
+        return ''.join(map(decoder, self.getVal()))
     
     #---------------------------
     #
     # return a string with LSB at index 0
     
     def VCD_str(self):
-        s = '' 
-        for c in self._val:
-            s += to_x01z[c]            
-        return s
+        return ''.join([to_x01z[c] for c in self.getVal()])
     
     #----
 
@@ -701,7 +961,7 @@ class StdLogicVector(Operations):
         
     def __getstate__(self):
         result = {}
-        result['_val']  = self._val                
+        result['_val']  = self.getVal()                
         result['name']  = self.name
         result['spec']  = self.spec
         result['sid']   = self.sid
@@ -718,7 +978,10 @@ class StdLogicVector(Operations):
     
     def __setstate__(self, dict):
          
-        self._val  = dict['_val']                
+        self._buf  = array('B', dict['_val'])
+        self._off  = 0
+        self._end  = len(self._buf)
+        self._pk   = None
         self.name  = dict['name']
         self.spec  = dict['spec']
         self.sid   = dict['sid']
@@ -729,8 +992,9 @@ class StdLogicVector(Operations):
         
         self.is_variable = dict['is_variable']       
         
-        self.current    = [self._val, 0.0]
-        self.last       = [self._val, 0.0]        
+        self.last_val   = self.getVal()
+        self.evt_time   = 0
+        self.evt_cycle  = -1
         self.waiting    = set()
 
 #------------------------------------------------------------------------------
@@ -770,7 +1034,7 @@ class SLVRange(Operations):
                  'setVal', 'new', 'updateValue', '__len__', 'name', 'inst',
                  'val_left', 'val_right', 'initialize', 'rng_node', 'rng_name',
                  'rng_id', 'tid', 'spec', 'vcd_nodes', 'VCD_str', 'vcd_mgr',
-                 'is_variable', '__str__', 'evt_cycle'
+                 'is_variable', '__str__'
                 )
     
     def __init__(self, slv, asc, left, right, rng_node=None):
@@ -812,14 +1076,23 @@ class SLVRange(Operations):
 
     #----
         
+ 
+    # Events are recorded on the wrapped SLV
+                
     def updateValue(self, other, cycle, time):
+        
+        old = self.slv.getVal()
          
         try:
-            if other.getVal() != self.getVal():
-                self.setVal(other.getVal())
+            o = other.getVal()
+            if len(o) != len(self):
+                o = fit_width(o, len(self))
+                
+            if o != self.getVal():
+                self.setVal(o)
             else:
                 # Value has not changed
-                return set()
+                return ()
                 
         except AttributeError:
             # self or other is a string, int, etc            
@@ -829,7 +1102,7 @@ class SLVRange(Operations):
 
             else:
                 # Value has not changed
-                return set()
+                return ()
                 
         # Process transitions for VDC file
             
@@ -838,12 +1111,25 @@ class SLVRange(Operations):
             for node in self.vcd_nodes:
                 self.vcd_mgr.VCD_transition(self, node, time)
         
-        self.last = self.current
-        self.current = (str(self), time)
+        slv = self.slv
+        slv.last_val  = old
+        slv.evt_time  = time
+        slv.evt_cycle = cycle
                                          
         # Return set of waiting VMs & processes
         return self.waiting
                                   
+    #----
+    
+    def event_op(self):
+        return self.slv.event_op()
+    
+    #----
+    
+    def last_value_op(self):
+        slv = self.slv
+        return self.new().setVal(slv.last_val[self.val_left : self.val_right])
+                                  
     #----
     #
     # Methods to implement unified interface
@@ -859,13 +1145,52 @@ class SLVRange(Operations):
     #----
     
     def getVal(self):
-        return self.slv.getVal()[ self.val_left : self.val_right]
+        # Slice the parent's buffer directly, no copy of the whole parent
+        slv = self.slv
+        off = slv._off
+        return (slv._buf or slv.buffer())[off + self.val_left : off + self.val_right]
+    
+    #----
+    
+    def packed(self):
+        
+        bits, mask = self.slv.packed()
+        
+        left = self.val_left
+        ones = (1 << (self.val_right - left)) - 1
+        
+        return (bits >> left) & ones, (mask >> left) & ones
+    
+    #----
+    #
+    # Unsigned integer value, None if there are metavalues. Bit order
+    # follows the parent's buffer
+    
+    def intVal(self):
+        
+        bits, mask = self.packed()
+        if mask:
+            return None
+        
+        if self.slv._dir < 0:
+            return bits
+        
+        return int(bin(bits)[2:].rjust(len(self), '0')[::-1], 2)
     
     #----
     
     def setVal(self, val):
+        
+        if type(val) is not array:
+            val = array('B', val)
+            
+        if len(val) != self.val_right - self.val_left:
+            val = fit_width(val, self.val_right - self.val_left)
+        
         slv = self.slv
-        self.slv._val[self.val_left : self.val_right] = val
+        off = slv._off
+        slv.buffer()[off + self.val_left : off + self.val_right] = val
+        slv._pk = None
         return self
         
     #----
@@ -904,30 +1229,23 @@ class SLVRange(Operations):
     #----
     
     @property    
-    def current(self):
-        # getter property method for self.current
-        return self.slv.current
+    def evt_time(self):
+        # getter property method for self.evt_time
+        return self.slv.evt_time
 
     #----
-
-    @current.setter
-    def current(self, value):
-        # Setter property method for self.current
-        self.slv.current = value        
+    
+    @property    
+    def evt_cycle(self):
+        # getter property method for self.evt_cycle
+        return self.slv.evt_cycle
                 
     #----
     
     @property
-    def last(self):
-        # getter property method for self.last
-        return self.slv.last
-
-    #----
-
-    @last.setter
-    def last(self, value):
-        # Setter property method for self.current
-        self.slv.last = value
+    def last_val(self):
+        # getter property method for self.last_val, the range of the SLV's
+        return self.slv.last_val[self.val_left : self.val_right]
                
     #----
     
@@ -1016,8 +1334,6 @@ class SLVRange(Operations):
         
         self.is_variable = False
          
-        self.current  = [self.getVal(), 0.0]
-        self.last     = [self.getVal(), 0.0]        
         self.waiting  = set()
        
 #------------------------------------------------------------------------------
@@ -1087,6 +1403,7 @@ method_map = {
     '"="(CONSTANT A : STD_ULOGIC, CONSTANT B : STD_ULOGIC) RETURN BOOLEAN' : (2, StdLogic.Equal),
     
     'RISING_EDGE(SIGNAL S : STD_ULOGIC) RETURN BOOLEAN'                    : (1, StdLogic.rising_op),    
+    'FALLING_EDGE(SIGNAL S : STD_ULOGIC) RETURN BOOLEAN'                   : (1, StdLogic.falling_op),    
 
     '"NOT"(CONSTANT L : STD_LOGIC_VECTOR) RETURN STD_LOGIC_VECTOR'                              : (1, StdLogicVector.Not),
     '"&"(CONSTANT A : STD_LOGIC_VECTOR, CONSTANT B : STD_LOGIC_VECTOR) RETURN STD_LOGIC_VECTOR' : (2, StdLogicVector.Concat),
@@ -0,0 +1,200 @@
+#------------------------------------------------------------------------------
+#
+#   tier.py - 10/18/26
+#
+#   Tiered execution of bytecode processes. Assembling the text bytecode
+#   of a process with byteplay is most of the build time, so a tiered build
+#   keeps the text bytecode and a process starts in interpret(), a small
+#   interpreter for it.
+#
+#   Each time the interpreted process waits is an activation. When a
+#   process has been activated hot_threshold times it is assembled by
+#   BytecodeProcess.promote() at that wait, and the compiled function is
+#   started at the same wait: its entry argument selects the WAIT to
+#   resume after (see ProcessBuilder.buildBytecode). Nothing but signals &
+#   variables lives across a wait, so the compiled process takes over
+#   where the interpreter stopped.
+#
+#------------------------------------------------------------------------------
+
+import operator
+import __builtin__
+
+from byteplay import Label
+
+# Activations before a process is compiled
+hot_threshold = 20
+
+# Opcodes of the text bytecode, in the order the interpreter tests them
+opcodes = ['LOAD_FAST', 'LOAD_CONST', 'CALL_FUNCTION', 'LOAD_ATTR', 'ROT_TWO',
+           'POP_TOP', 'STORE_FAST', 'BINARY_SUBSCR', 'POP_JUMP_IF_FALSE',
+           'JUMP_ABSOLUTE', 'ROT_THREE', 'LOAD_GLOBAL', 'DUP_TOP', 'COMPARE_OP',
+           'POP_JUMP_IF_TRUE', 'ROT_FOUR', 'YIELD_VALUE', 'BINARY_FLOOR_DIVIDE',
+           'BINARY_ADD', 'BINARY_SUBTRACT', 'JUMP_FORWARD', 'RETURN_VALUE']
+
+(LOAD_FAST, LOAD_CONST, CALL_FUNCTION, LOAD_ATTR, ROT_TWO, POP_TOP, STORE_FAST,
+ BINARY_SUBSCR, POP_JUMP_IF_FALSE, JUMP_ABSOLUTE, ROT_THREE, LOAD_GLOBAL,
+ DUP_TOP, COMPARE_OP, POP_JUMP_IF_TRUE, ROT_FOUR, YIELD_VALUE,
+ BINARY_FLOOR_DIVIDE, BINARY_ADD, BINARY_SUBTRACT, JUMP_FORWARD,
+ RETURN_VALUE) = range(len(opcodes))
+
+compare_ops = {
+    '==' : operator.eq,
+    '!=' : operator.ne,
+    '<'  : operator.lt,
+    '<=' : operator.le,
+    '>'  : operator.gt,
+    '>=' : operator.ge,
+}
+
+jump_ops = set([POP_JUMP_IF_FALSE, JUMP_ABSOLUTE, POP_JUMP_IF_TRUE, JUMP_FORWARD])
+
+#------------------------------------------------------------------------------
+
+class TierError(Exception):
+    pass
+
+#------------------------------------------------------------------------------
+#
+# Convert text bytecode to a list of (opcode number, arg) for interpret().
+# Labels are removed and jumps get the index of their label, globals are
+# looked up in g and a YIELD gets the number of its WAIT. Raises TierError for an opcode interpret() doesn't know
+
+def prepare(text_bc, g):
+
+    index = {}
+    n = 0
+    for op, arg in text_bc:
+        if isinstance(op, Label):
+            index[op] = n
+        else:
+            n += 1
+
+    program = []
+    wait = 0
+    for op, arg in text_bc:
+
+        if isinstance(op, Label):
+            continue
+
+        try:
+            code = opcodes.index(op)
+        except ValueError:
+            raise TierError('%s is not interpreted' % op)
+
+        if code in jump_ops:
+            arg = index[arg]
+
+        elif code == LOAD_GLOBAL:
+            try:
+                arg = g[arg]
+            except KeyError:
+                arg = getattr(__builtin__, arg)
+
+        elif code == COMPARE_OP:
+            arg = compare_ops[arg]
+
+        elif code == YIELD_VALUE:
+            # Entry of the compiled process resuming after this WAIT
+            wait += 1
+            arg = wait
+
+        program.append((code, arg))
+
+    return program
+
+#------------------------------------------------------------------------------
+#
+# Run a process from its prepared program, locals are the function's
+# arguments. Promotes the process at a wait once it is hot
+
+def interpret(vm, program, local):
+
+    threshold = vm.sim.hot_threshold
+    stack = []
+    push  = stack.append
+    pop   = stack.pop
+
+    pc = 0
+    while True:
+
+        code, arg = program[pc]
+        pc += 1
+
+        if code == LOAD_FAST:
+            push(local[arg])
+
+        elif code == LOAD_CONST:
+            push(arg)
+
+        elif code == CALL_FUNCTION:
+            if arg:
+                args = stack[-arg:]
+                del stack[-arg:]
+                push(pop()(*args))
+            else:
+                push(pop()())
+
+        elif code == LOAD_ATTR:
+            push(getattr(pop(), arg))
+
+        elif code == ROT_TWO:
+            stack[-1], stack[-2] = stack[-2], stack[-1]
+
+        elif code == POP_TOP:
+            pop()
+
+        elif code == STORE_FAST:
+            local[arg] = pop()
+
+        elif code == BINARY_SUBSCR:
+            key = pop()
+            push(pop()[key])
+
+        elif code == POP_JUMP_IF_FALSE:
+            if not pop():
+                pc = arg
+
+        elif code == JUMP_ABSOLUTE or code == JUMP_FORWARD:
+            pc = arg
+
+        elif code == ROT_THREE:
+            stack.insert(-2, pop())
+
+        elif code == LOAD_GLOBAL:
+            push(arg)
+
+        elif code == DUP_TOP:
+            push(stack[-1])
+
+        elif code == COMPARE_OP:
+            right = pop()
+            push(arg(pop(), right))
+
+        elif code == POP_JUMP_IF_TRUE:
+            if pop():
+                pc = arg
+
+        elif code == ROT_FOUR:
+            stack.insert(-3, pop())
+
+        elif code == YIELD_VALUE:
+            vm.activations += 1
+            if vm.activations >= threshold:
+                vm.promote(arg)
+            push((yield pop()))
+
+        elif code == BINARY_FLOOR_DIVIDE:
+            right = pop()
+            push(pop() // right)
+
+        elif code == BINARY_ADD:
+            right = pop()
+            push(pop() + right)
+
+        elif code == BINARY_SUBTRACT:
+            right = pop()
+            push(pop() - right)
+
+        elif code == RETURN_VALUE:
+            return
@@ -0,0 +1,108 @@
+#------------------------------------------------------------------------------
+#
+#   value_store.py - 10/18/26
+#
+#   Design-wide signal value store. The encoded values of all signals are
+#   held in one contiguous array('B'), one byte per bit with the LSB of a
+#   vector first. Per-sid offset & width tables locate each signal.
+#
+#   StdLogic & StdLogicVector signals are views on their slice of the store
+#   once attached, SLVRange objects slice their parent's view in place.
+#   The whole simulation state can be saved & restored with one copy.
+#
+#------------------------------------------------------------------------------
+
+from array import array
+
+#------------------------------------------------------------------------------
+
+class ValueStore(object):
+
+    __slots__ = ('data', 'offset', 'width', 'signals')
+
+    def __init__(self, signals=()):
+
+        self.data    = array('B')
+        self.offset  = []           # sid -> index of the signal's LSB in data
+        self.width   = []           # sid -> number of bits
+        self.signals = []           # the attached signals
+
+        for sig in signals:
+            self.add(sig)
+
+    #----
+    #
+    # Store of the initial values of a design.ser signal table (see
+    # artifact.py), offset & width are indexed by sid. Signals are attached
+    # when they are created
+
+    @staticmethod
+    def fromTable(values, offset, width):
+
+        store = ValueStore()
+        store.data.fromstring(values)
+        store.offset = offset
+        store.width  = width
+
+        return store
+
+    #----
+    #
+    # Copy the signal's value into the store and make the signal a view on it
+
+    def add(self, sig):
+
+        if sig.sid != len(self.offset):
+            raise ValueError('Signal %s has sid %d, expected %d' % (sig.name, sig.sid, len(self.offset)))
+
+        offset = len(self.data)
+        self.data.extend(sig.getVal())
+        self.offset.append(offset)
+        self.width.append(len(sig))
+
+        self.attach(sig)
+
+    #----
+    #
+    # Make the signal a view on its value in the store
+
+    def attach(self, sig):
+
+        sig.attach(self.data, self.offset[sig.sid])
+        self.signals.append(sig)
+
+    #----
+
+    def getVal(self, sid):
+        offset = self.offset[sid]
+        return self.data[offset : offset + self.width[sid]]
+
+    #----
+    #
+    # Whole state snapshot, a string that can be saved or sent to
+    # another process
+
+    def snapshot(self):
+        return self.data.tostring()
+
+    #----
+
+    def restore(self, state):
+
+        data = array('B')
+        data.fromstring(state)
+
+        if len(data) != len(self.data):
+            raise ValueError('Snapshot has %d values, store has %d' % (len(data), len(self.data)))
+
+        # Copy in place, signals keep their reference to self.data. They
+        # are attached again to drop the packed values they cached
+        self.data[:] = data
+
+        for sig in self.signals:
+            sig.attach(self.data, self.offset[sig.sid])
+
+    #----
+
+    def __len__(self):
+        return len(self.offset)
@@ -66,11 +66,14 @@ class IDchar(object):
 
 class VCD_File(object):
         
-    def __init__(self, hierarchy, signals, f):
+    # resolution is the simulation tick, used as the VCD timescale
+        
+    def __init__(self, hierarchy, signals, f, resolution='ns'):
         
         self.f           = f
         self.top         = hierarchy
         self.signals     = signals
+        self.resolution  = resolution
         
         # a list of SL_var or SLArray_var objects
         self.vcd_nodes = []
@@ -293,7 +296,7 @@ class VCD_File(object):
         print >> self.f, '$end'
         
         print >> self.f, '$timescale'
-        print >> self.f, '  1 ns'
+        print >> self.f, '  1 %s' % self.resolution
         print >> self.f, '$end'
         
         # Generate $scope and $var statements starting at top instance
@@ -26,6 +26,17 @@ print 'python_version: %s' % '.'.join(str(x) for x in sys.version_info[:3])
 class VM_Exception(Exception):
     pass
 
+#------------------------------------------------------------------------------
+#
+# Scalar std_ulogic operations inlined by ProcessBuilder work on encoded
+# values. Results are turned back into shared StdLogic values only where
+# they are used by other ops
+
+std_values = tuple([StdLogic(c) for c in 'UX01ZWLH-'])
+
+# Replace the std_ulogic object at TOS with its encoded value
+to_int_bc = [('LOAD_ATTR', 'getVal'), ('CALL_FUNCTION', 0), ('LOAD_CONST', 0), ('BINARY_SUBSCR', None)]
+
 
 #------------------------------------------------------------------------------
     
@@ -112,6 +123,12 @@ class AssertOp(object):
 
 class AttributeOp(object):
     
+    # Signal attribute name to signal method
+    methods = {
+        'EVENT'      : 'event_op',
+        'LAST_VALUE' : 'last_value_op',
+    }
+    
     def __init__(self, line):
         self.attr_name = line[-1]
         self.line = line
@@ -121,12 +138,12 @@ class AttributeOp(object):
         
     def execute(self, vm):
         
-        if self.attr_name == 'EVENT':
+        if self.attr_name in self.methods:
             
             # pop the operand
             operand = vm.stack.pop()
             # Put result on stack 
-            vm.stack.append(Bool(operand.current[1] == operand.sim.time))
+            vm.stack.append(getattr(operand, self.methods[self.attr_name])())
             
             vm.pc += 1
             return False
@@ -140,13 +157,13 @@ class AttributeOp(object):
     def genBytecode(self, vm):
         
         bc = []       
-        if self.attr_name == 'EVENT':
+        if self.attr_name in self.methods:
             logging.info('AttributeOp.attr: %s' % self.attr_name)
                                     
             # Signal is at TOS            
-            bc.append(('LOAD_ATTR', 'event_op'))
+            bc.append(('LOAD_ATTR', self.methods[self.attr_name]))
             bc.append(('CALL_FUNCTION', 0))
-            # Result of event_op (True/False) is at TOS
+            # Result of the attribute method is at TOS
             return (int(self.label), bc)
 
     #----
@@ -298,11 +315,19 @@ class CallOp(object):
         self.signature = ' '.join(self.line[3:]) 
                
         self.converted = None
+        
+        # Set by ProcessBuilder for an inlined scalar std_ulogic operation
+        self.inline      = False
+        self.table       = None
+        self.materialize = False
     
     #----
     # For new-style calls
     def newGenBytecode(self, vm):
         
+        if self.inline:
+            return self.inlineBytecode()
+        
         if self.signature not in lib_dict:
             return self.genBytecode(vm)
         
@@ -316,6 +341,38 @@ class CallOp(object):
             bc = []
             bc.append(('CALL_FUNCTION', argc))
             return (int(self.label), bc)
+        
+    #----
+    #
+    # Operands are encoded values, the table was pushed by ENTER CONTEXT
+    
+    def inlineBytecode(self):
+        
+        bc = []
+        if self.table is None:
+            # "=", TOS & NOS are the operands
+            bc.append(('COMPARE_OP', '=='))
+            # TOS = True/False
+            return (int(self.label), bc)
+        
+        if isinstance(self.table[0], tuple):
+            # TOS = right, NOS = left, ... = table
+            bc.append(('ROT_THREE', None))
+            bc.append(('BINARY_SUBSCR', None))
+            # TOS = table[left], NOS = right
+            bc.append(('ROT_TWO', None))
+            
+        bc.append(('BINARY_SUBSCR', None))
+        # TOS = encoded result
+        
+        if self.materialize:
+            bc.append(('LOAD_CONST', std_values))
+            bc.append(('ROT_TWO', None))
+            bc.append(('BINARY_SUBSCR', None))
+            # TOS = StdLogic result
+            
+        return (int(self.label), bc)
+        
     #----
     
     def genBytecode(self, vm):
@@ -396,6 +453,10 @@ class EnterOp(object):
         self.line = line
 
         self.signature = ' '.join(self.line[3:]).upper()
+        
+        # Set by ProcessBuilder for an inlined scalar std_ulogic operation
+        self.inline = False
+        self.table  = None
 
      #----
     
@@ -408,6 +469,12 @@ class EnterOp(object):
     
     def newGenBytecode(self, vm):
         
+        if self.inline:
+            # Push the look-up table, none for "="
+            if self.table is None:
+                return (int(self.label), [])
+            return (int(self.label), [('LOAD_CONST', self.table)])
+        
         if self.signature not in lib_dict:
             return self.genBytecode(vm)
         
@@ -720,7 +787,7 @@ class JumpNotRisingOp(object):
         label2  = vm.bc_labels[self.new_pc][1]
         text_bc = []
         
-        text_bc.append( ('LOAD_FAST', 'sig__%d' % self.object.sid) )
+        text_bc.append( ('LOAD_FAST', vm.sigName(self.object.sid)) )
         # Signal is at TOS
         
         text_bc.append(('LOAD_ATTR', 'not_rising_op'))
@@ -781,6 +848,9 @@ class PushSigOp(object):
         self.value    = None        
         self.object   = "object uninitialized"        
         self.key      = line[4]                
+        
+        # Set by ProcessBuilder to push the encoded value of a StdLogic
+        self.as_int   = False
      
     #----
     
@@ -789,7 +859,15 @@ class PushSigOp(object):
         # Generate python bytecode in a text format
         text_bc = []
         
-        text_bc.append( ('LOAD_FAST', 'sig__%d' % self.object.sid) )
+        if self.as_int:
+            # _buf & _off are loaded by the process preamble
+            name = vm.sigName(self.object.sid)
+            text_bc.append( ('LOAD_FAST', name + '_buf') )
+            text_bc.append( ('LOAD_FAST', name + '_off') )
+            text_bc.append( ('BINARY_SUBSCR', None) )
+            return (int(self.label), text_bc)
+        
+        text_bc.append( ('LOAD_FAST', vm.sigName(self.object.sid)) )
 
         if isinstance(self.object, StdLogicVector) and len(self.object) == 1:
             
@@ -818,6 +896,9 @@ class PushVarOp(object):
         self.value    = None        
         self.object   = "object uninitialized"        
         self.key      = line[4]                
+         
+        # Set by ProcessBuilder to push the encoded value of a StdLogic
+        self.as_int   = False
       
     #----
      
@@ -825,6 +906,14 @@ class PushVarOp(object):
          
         # Generate python bytecode in a text format
         text_bc = []
+        
+        if self.as_int:
+            # _buf & _off are loaded by the process preamble
+            name = 'var__%d' % self.object.sid
+            text_bc.append( ('LOAD_FAST', name + '_buf') )
+            text_bc.append( ('LOAD_FAST', name + '_off') )
+            text_bc.append( ('BINARY_SUBSCR', None) )
+            return (int(self.label), text_bc)
          
         text_bc.append( ('LOAD_FAST', 'var__%d' % self.object.sid) )
  
@@ -890,10 +979,17 @@ class PushConstOp(object):
             raise Exception
 
         self.run_count = 0
+        
+        # Set by ProcessBuilder to push the encoded value of a StdLogic
+        self.as_int = False
                    
     #----
     
     def genBytecode(self, vm):
+        
+        if self.as_int:
+            return (int(self.label), [('LOAD_CONST', self.value.getVal()[0])])
+            
         return (int(self.label), [('LOAD_CONST', self.value)])
              
     #----
@@ -933,6 +1029,12 @@ class PushLitOp(object):
         self.value = None
         self.key   = ''
         
+        # Set by ProcessBuilder when this literal is a delay, in ticks
+        self.delay_ticks = None
+        
+        # Set by ProcessBuilder to push the encoded value of a StdLogic
+        self.as_int = False
+        
         if self.type == 'LITERAL':
             arg = line[3]
             if arg[0] == '"':
@@ -964,6 +1066,13 @@ class PushLitOp(object):
     #----
     
     def genBytecode(self, vm):
+        
+        if self.delay_ticks != None:
+            return (int(self.label), [('LOAD_CONST', self.delay_ticks)])
+        
+        if self.as_int:
+            return (int(self.label), [('LOAD_CONST', self.value.getVal()[0])])
+            
         return (int(self.label), [('LOAD_CONST', self.value)])
                                                
     #----
@@ -998,6 +1107,9 @@ class PopOp(object):
         
         self.i_flag, self.d_flag, self.r_flag = [f == 'T' for f in line[2:]]
         
+        # Set by ProcessBuilder if the delay is a literal already in ticks
+        self.prescaled = False
+        
         if self.r_flag:
             raise Exception, 'Concurrent signal assignment with REJECT not implemented'
                    
@@ -1008,9 +1120,14 @@ class PopOp(object):
         bc = []
                
         if not self.d_flag:
-            # Put a delay value of 0.0 on stack
+            # Put a delay value of 0 on stack
             bc.append(('LOAD_CONST', 0))
             
+        elif not self.prescaled:
+            # Convert delay at TOS from fs to ticks
+            bc.append(('LOAD_CONST', vm.sim.fs_per_tick))
+            bc.append(('BINARY_FLOOR_DIVIDE', None))
+            
         # Put vm.ScheduleAssignment func object on stack
         bc.append(('LOAD_FAST', 'vm'))
         bc.append(('LOAD_ATTR', 'scheduleAssignment'))
@@ -1018,8 +1135,17 @@ class PopOp(object):
         # func, target, value & delay are on stack
         # Move func object to proper place on stack            
         bc.append(('ROT_FOUR', None))
+        
+        if self.i_flag:
+            # Inertial delay is the default
+            bc.append(('CALL_FUNCTION', 3))
+            
+        else:
+            # Transport delay, reject = None & inertial = False
+            bc.append(('LOAD_CONST', None))
+            bc.append(('LOAD_CONST', False))
+            bc.append(('CALL_FUNCTION', 5))
             
-        bc.append(('CALL_FUNCTION', 3))
         bc.append(('POP_TOP', None))
           
         return (int(self.label), bc)
@@ -1028,19 +1154,16 @@ class PopOp(object):
     
     def execute(self, vm):
                 
-        # Process delay
+        # Process delay, convert from fs to ticks
         if self.d_flag:
-            delay = vm.stack.pop()
+            delay = vm.stack.pop() // vm.sim.fs_per_tick
         else:
-            delay = 0.0
+            delay = 0
 
-        # Process Inertial (i_flag) not implemented yet
-        # Default of True is assumed
-                                  
         operand = vm.stack.pop()
         target = vm.stack.pop()
         
-        vm.scheduleAssignment(target, operand, delay, 0, True)
+        vm.scheduleAssignment(target, operand, delay, None, self.i_flag)
         
         vm.pc += 1
         return False
@@ -1220,6 +1343,9 @@ class ScheduleDelayOp(object):
     
     def __init__(self, line):
         self.label = line[0]
+        
+        # Set by ProcessBuilder if the delay is a literal already in ticks
+        self.prescaled = False
                    
     #----
     
@@ -1227,16 +1353,11 @@ class ScheduleDelayOp(object):
 #         print 'ScheduleDelayOp.genBytecode'
         bc = []
         
-        #TOS = delay value in picoseconds
-        bc.append(('LOAD_GLOBAL', 'float'))
-        # Move func object to proper place on stack            
-        bc.append(('ROT_TWO', None))                           
-        # Convert int to float
-        bc.append(('CALL_FUNCTION', 1))
-
-        # Convert TOS from picoseconds to nanoseconds
-        bc.append(('LOAD_CONST', 1000000.0))
-        bc.append(('BINARY_DIVIDE', None))
+        #TOS = delay value in femtoseconds, or ticks if prescaled
+        if not self.prescaled:
+            # Convert TOS from femtoseconds to ticks
+            bc.append(('LOAD_CONST', vm.sim.fs_per_tick))
+            bc.append(('BINARY_FLOOR_DIVIDE', None))
                         
         # Setup vm.ScheduleDelay()            
         bc.append(('LOAD_FAST', 'vm'))
@@ -1254,8 +1375,8 @@ class ScheduleDelayOp(object):
     
     def execute(self, vm):
 
-        # Get delay and scale from fs to ns
-        t = float(vm.stack.pop()) / 1000000.0
+        # Get delay and scale from fs to ticks
+        t = vm.stack.pop() // vm.sim.fs_per_tick
         
         vm.scheduleDelay(t)
         vm.pc += 1
@@ -1283,10 +1404,10 @@ class ScheduleEventOp(object):
         bc = []
         
         # TOS = signal object        
-        # signal.waiting.add(vm)
-        bc.append(('LOAD_ATTR', 'waiting'))
-        bc.append(('LOAD_ATTR', 'add'))
+        # vm.waitOn(signal)
         bc.append(('LOAD_FAST', 'vm'))
+        bc.append(('LOAD_ATTR', 'waitOn'))
+        bc.append(('ROT_TWO', None))
 
         # Call method    
         bc.append(('CALL_FUNCTION', 1))
@@ -1395,4 +1516,397 @@ class WaitOp(object):
         
     def __repr__(self):
         return str(self)
-    
\ No newline at end of file
+    
+#------------------------------------------------------------------------------
+#
+# Ops created by the IR optimizer, see ir.py. These have no zcode line
+#
+# A constant computed at build time from constant operands, source is
+# a description of the op it replaces
+
+class PushFoldedOp(object):
+    
+    def __init__(self, label, value, source):
+        
+        self.label  = label
+        self.value  = value
+        self.source = source
+        
+        # Set by ProcessBuilder when this constant is a delay, in ticks
+        self.delay_ticks = None
+        
+        # Set by ProcessBuilder to push the encoded value of a StdLogic
+        self.as_int = False
+        
+    #----
+    
+    def genBytecode(self, vm):
+        
+        if self.delay_ticks != None:
+            return (int(self.label), [('LOAD_CONST', self.delay_ticks)])
+        
+        if self.as_int:
+            return (int(self.label), [('LOAD_CONST', self.value.getVal()[0])])
+            
+        return (int(self.label), [('LOAD_CONST', self.value)])
+    
+    #----
+    
+    def __str__(self):
+        return '%s PUSH FOLDED %s = %s' % (self.label, self.source, self.value)
+    
+    #----
+        
+    def __repr__(self):
+        return str(self)
+
+#------------------------------------------------------------------------------
+#
+# Keep the value at TOS in a fast local, it stays on the stack. Temp ops
+# are never jump targets, their label is -1
+
+class StoreTempOp(object):
+    
+    def __init__(self, name):
+        self.label = '-1'
+        self.name  = name
+        
+    #----
+    
+    def genBytecode(self, vm):
+        return (int(self.label), [('DUP_TOP', None), ('STORE_FAST', self.name)])
+    
+    #----
+    
+    def __str__(self):
+        return 'STORE TEMP %s' % self.name
+    
+    #----
+        
+    def __repr__(self):
+        return str(self)
+
+#------------------------------------------------------------------------------
+#
+# Push a value kept by StoreTempOp
+
+class LoadTempOp(object):
+    
+    def __init__(self, name):
+        self.label = '-1'
+        self.name  = name
+        
+    #----
+    
+    def genBytecode(self, vm):
+        return (int(self.label), [('LOAD_FAST', self.name)])
+    
+    #----
+    
+    def __str__(self):
+        return 'LOAD TEMP %s' % self.name
+    
+    #----
+        
+    def __repr__(self):
+        return str(self)
+
+#------------------------------------------------------------------------------
+#
+# Jump to one of several arms on the value of the selector at TOS, built
+# by the IR optimizer from a chain of JUMP NC tests (see ir.switch)
+#
+#  table   - selector.packed() -> arm index, a value that isn't found
+#            selects the last arm
+#  targets - zcode address of each arm, the last is the others arm
+#
+# There is no computed jump in Python bytecode. The arm index is kept in
+# a fast local and the jump found with a binary search of compares
+
+class SwitchOp(object):
+    
+    def __init__(self, label, table, targets):
+        
+        self.label   = label
+        self.table   = table
+        self.targets = targets
+        
+        self.conditional = False
+        
+    #----
+    
+    def genBytecode(self, vm):
+        
+        bc = []
+        
+        bc.append(('LOAD_ATTR', 'packed'))
+        bc.append(('CALL_FUNCTION', 0))
+        # TOS = (bits, mask)
+        
+        bc.append(('LOAD_CONST', self.table))
+        bc.append(('LOAD_ATTR', 'get'))
+        bc.append(('ROT_TWO', None))
+        bc.append(('LOAD_CONST', len(self.targets) - 1))
+        bc.append(('CALL_FUNCTION', 2))
+        # TOS = arm index
+        
+        bc.append(('STORE_FAST', 'switch__arm'))
+        self.dispatch(vm, 0, len(self.targets), bc)
+        
+        return (int(self.label), bc)
+    
+    #----
+    #
+    # Jump to the arm of index lo <= switch__arm < hi
+    
+    def dispatch(self, vm, lo, hi, bc):
+        
+        if hi - lo == 1:
+            bc.append(('JUMP_ABSOLUTE', vm.bc_labels[self.targets[lo]][0]))
+            return
+        
+        mid   = (lo + hi) // 2
+        upper = Label()
+        
+        bc.append(('LOAD_FAST', 'switch__arm'))
+        bc.append(('LOAD_CONST', mid))
+        bc.append(('COMPARE_OP', '<'))
+        
+        if python_version == '2.7':
+            bc.append(('POP_JUMP_IF_FALSE', upper))
+            self.dispatch(vm, lo, mid, bc)
+            bc.append((upper, None))
+            
+        else:
+            bc.append(('JUMP_IF_FALSE', upper))
+            bc.append(('POP_TOP', None))
+            self.dispatch(vm, lo, mid, bc)
+            bc.append((upper, None))
+            bc.append(('POP_TOP', None))
+            
+        self.dispatch(vm, mid, hi, bc)
+        
+    #----
+    
+    def __str__(self):
+        return '%s SWITCH %s' % (self.label, ' '.join([str(t) for t in self.targets]))
+    
+    #----
+        
+    def __repr__(self):
+        return str(self)
+
+#------------------------------------------------------------------------------
+#
+# Superinstructions, fused by the IR optimizer from statements of the
+# common zcode idioms (see ir.fuse). Each one replaces several zcode ops
+# with a shorter bytecode sequence
+#
+# Inertial assignment to a signal or a range of a signal, the value (and
+# delay) are on the stack. The target is not pushed, its Driver's assign
+# method is bound to a fast local by the process preamble
+
+class AssignOp(object):
+    
+    def __init__(self, pop, target):
+        
+        self.label  = pop.label
+        self.target = target        # PushSigOp or RangeCreateOp
+        self.d_flag = pop.d_flag
+        
+        if target.__class__.__name__ == 'RangeCreateOp':
+            self.line = [self.label, 'ASSIGN'] + target.line[3:8]
+        else:
+            self.line = [self.label, 'ASSIGN'] + target.line[3:5]
+        
+        # Set by ProcessBuilder if the delay is a literal already in ticks
+        self.prescaled = False
+        
+    #----
+    
+    def genBytecode(self, vm):
+        
+        bc = []
+        
+        if self.d_flag and not self.prescaled:
+            # Convert delay at TOS from fs to ticks
+            bc.append(('LOAD_CONST', vm.sim.fs_per_tick))
+            bc.append(('BINARY_FLOOR_DIVIDE', None))
+            
+        # assign(value[, delay])
+        bc.append(('LOAD_FAST', vm.driverName(self.target)))
+        
+        if self.d_flag:
+            bc.append(('ROT_THREE', None))
+            bc.append(('CALL_FUNCTION', 2))
+        else:
+            bc.append(('ROT_TWO', None))
+            bc.append(('CALL_FUNCTION', 1))
+            
+        bc.append(('POP_TOP', None))
+        
+        return (int(self.label), bc)
+        
+    #----
+    
+    def __str__(self):
+        return ' '.join(self.line)
+    
+    #----
+        
+    def __repr__(self):
+        return str(self)
+
+#------------------------------------------------------------------------------
+#
+# WAIT on a set of signals, the PUSH SIGNAL / SCHEDULE EVENT pairs before
+# a WAIT. A static set is registered once by SimExe and is only a yield
+# (see ProcessBuilder.findSensitivity)
+
+class WaitSetOp(object):
+    
+    def __init__(self, label, sigs):
+        
+        self.label  = label
+        self.sigs   = sigs          # PushSigOps
+        self.static = False
+        
+        self.line   = [label, 'WAIT', 'ON'] + [sig.key for sig in sigs]
+        
+    #----
+    
+    def genBytecode(self, vm):
+        
+        bc = []
+        
+        if not self.static:
+            for sig in self.sigs:
+                bc.append(('LOAD_FAST', 'vm'))
+                bc.append(('LOAD_ATTR', 'waitOn'))
+                bc.append(('LOAD_FAST', vm.sigName(sig.object.sid)))
+                bc.append(('CALL_FUNCTION', 1))
+                bc.append(('POP_TOP', None))
+                
+        bc += [('LOAD_FAST', 'vm'),('YIELD_VALUE', None),('POP_TOP', None)]
+        
+        return (int(self.label), bc)
+        
+    #----
+    
+    def __str__(self):
+        return ' '.join(self.line)
+    
+    #----
+        
+    def __repr__(self):
+        return str(self)
+
+#------------------------------------------------------------------------------
+#
+# PUSH SIGNAL / JUMP EVENT of the chain testing the events of a WAIT's
+# signals. The process is only resumed by one of them, so the jump is
+# always taken and the signal needn't be pushed
+
+class EventOrOp(object):
+    
+    def __init__(self, label, jump):
+        
+        self.label  = label
+        self.new_pc = jump.new_pc
+        
+        self.conditional = False
+        
+    #----
+    
+    def genBytecode(self, vm):
+        bc_label = vm.bc_labels[self.new_pc][0]
+        return (int(self.label), [('JUMP_ABSOLUTE', bc_label)])
+        
+    #----
+    
+    def __str__(self):
+        return '%s JUMP EVENT OR %d' % (self.label, self.new_pc)
+    
+    #----
+        
+    def __repr__(self):
+        return str(self)
+
+#------------------------------------------------------------------------------
+#
+# JUMP NOT RISING of a StdLogic clock, the test of not_rising_op() on the
+# encoded value without a call. The signal's _buf & _off are fast locals
+# (see ProcessBuilder.inlineScalarOps), sim_lcl is the simulator
+
+class ClockEdgeOp(object):
+    
+    def __init__(self, label, jump):
+        
+        self.label  = label
+        self.key    = jump.key
+        self.object = jump.object
+        self.new_pc = jump.new_pc
+        
+        self.conditional = True
+        
+    #----
+    
+    def genBytecode(self, vm):
+        
+        label2 = vm.bc_labels[self.new_pc][1]
+        name   = vm.sigName(self.object.sid)
+        bc     = []
+        
+        # Not '1'
+        bc.append(('LOAD_FAST', name + '_buf'))
+        bc.append(('LOAD_FAST', name + '_off'))
+        bc.append(('BINARY_SUBSCR', None))
+        bc.append(('LOAD_CONST', 3))
+        bc.append(('COMPARE_OP', '!='))
+        
+        if python_version == '2.7':
+            bc.append(('POP_JUMP_IF_TRUE', label2))
+        else:
+            bc.append(('JUMP_IF_TRUE', label2))
+            bc.append(('POP_TOP', None))
+            
+        # No event in this delta cycle
+        bc.append(('LOAD_FAST', name))
+        bc.append(('LOAD_ATTR', 'evt_cycle'))
+        bc.append(('LOAD_FAST', 'sim_lcl'))
+        bc.append(('LOAD_ATTR', 'current_cycle'))
+        bc.append(('COMPARE_OP', '!='))
+        
+        if python_version == '2.7':
+            bc.append(('POP_JUMP_IF_TRUE', label2))
+        else:
+            bc.append(('JUMP_IF_TRUE', label2))
+            bc.append(('POP_TOP', None))
+            
+        return (int(self.label), bc)
+        
+    #----
+    
+    def __str__(self):
+        return '%s CLOCK EDGE %s %d' % (self.label, self.key, self.new_pc)
+    
+    #----
+        
+    def __repr__(self):
+        return str(self)
+
+#------------------------------------------------------------------------------
+#
+# zcode addresses an op can jump to
+
+def jumpTargets(op):
+    
+    try:
+        return op.targets
+    except AttributeError:
+        pass
+    
+    try:
+        return [op.new_pc]
+    except AttributeError:
+        return []
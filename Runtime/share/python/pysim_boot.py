@@ -38,6 +38,14 @@ process_id  = 1
 py_interpreter = 'python'
 # py_interpreter = 'pypy'
 
+#------------------------------------------------------------------------------
+#
+# The design is exported to design.bin, set write_text to also write the
+# design.txt debug rendering
+
+write_text = False
+# write_text = True
+
 #------------------------------------------------------------------------------
 #
 # For printing to Zamia Console
@@ -998,18 +1006,18 @@ def proj_error_chk():
 
 #------------------------------------------------------------------------------
 #
-# Return True if ig_export.py has changed since design.text was last created,
-# or if design.txt does not exist 
+# Return True if ig_export.py has changed since design.bin was last created,
+# or if design.bin does not exist 
 
 def ig_exp_changed():
 	
-    # Get timestamp of design.txt
+    # Get timestamp of design.bin
     try:
-        design_timestamp = os.path.getmtime(dsnPath)
+        design_timestamp = os.path.getmtime(irPath)
     except:
-        # design.txt does not exist
+        # design.bin does not exist
         design_timestamp = 0
-        printf('Rebuilding since design.txt does not exist\n')
+        printf('Rebuilding since design.bin does not exist\n')
         return False 
            
     try:
@@ -1025,15 +1033,15 @@ def ig_exp_changed():
 
 #------------------------------------------------------------------------------
 #
-# Return True if any design .vhd file is more recent than design.txt
+# Return True if any design .vhd file is more recent than design.bin
 
 def design_file_obsolete():
 
-    # Get timestamp of design.txt
+    # Get timestamp of design.bin
     try:
-        design_ts = os.path.getmtime(dsnPath)
+        design_ts = os.path.getmtime(irPath)
     except:
-        # design.txt does not exist
+        # design.bin does not exist
         design_ts = 0
  
     # Compare with time stamp of source files
@@ -1062,12 +1070,17 @@ printf ('')
 # Initialize globals
 proj_path = project.fBasePath.toString()
 dsnPath   = proj_path + r'\design.txt'
+irPath    = proj_path + r'\design.bin'
 printf('Project path: %s', proj_path)
 
 dir1, base = os.path.split(proj_path) 
 dir2, base = os.path.split(dir1)
 share_path = dir2 + r'\Runtime\share\python'
 
+# design.bin writer
+sys.path.append(share_path)
+from Sim import design_ir
+
 # Not used!!
 plugin_path = dir2 + r'\Runtime\plugins\org.zamia.plugin_0.11.3.jar'
 
@@ -1100,9 +1113,12 @@ if proj_error_chk() == True:
 
 elif ig_exp_changed() or design_file_obsolete() or force_build:
 
-    # Rebuild design.txt
+    # Rebuild design.bin, design.txt is written as well if write_text is set
 
-    design_file = open(dsnPath, 'w')
+    text = None
+    if write_text:
+        text = open(dsnPath, 'w')
+    design_file = design_ir.Writer(open(irPath, 'wb'), text)
     
     igm = project.getIGM()
     IGManager = igm